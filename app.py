@@ -1,10 +1,34 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from io import BytesIO
-import base64
 import datetime
-import re
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+
+from recon import engine, export
+from recon.amounts import decimals, from_cents
+from recon.carry_forward import CarryForwardStore
+from recon.diagnostics import RunDiagnostics, stage, write_record
+from recon.jobs import QUEUED, JobManager
+from recon.parse_cache import DEFAULT_CACHE_DIR, ParseCache, content_hash, read_upload_bytes
+
+# Open items kept between days when carry-forward is on
+CARRY_FORWARD_DB = os.environ.get('RECON_CARRY_FORWARD_DB', 'carry_forward.sqlite')
+
+# One JSON record per run (stage timings, rows, memory) is written here
+RUN_RECORD_DIR = os.environ.get('RECON_RUN_RECORD_DIR', 'run_records')
+
+# Processed runs kept in the session, keyed by upload content and options
+RESULT_CACHE_SIZE = int(os.environ.get('RECON_RESULT_CACHE_SIZE', '2'))
+
+# Worker processes reading the uploads in parallel (1 reads them one after another)
+LOAD_WORKERS = int(os.environ.get('RECON_LOAD_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# How often the page checks on a queued or running job
+JOB_POLL_SECONDS = float(os.environ.get('RECON_JOB_POLL_SECONDS', '1'))
 
 # Page configuration
 st.set_page_config(
@@ -45,270 +69,450 @@ with st.sidebar:
     # Date selector
     report_date = st.date_input("Report Date", datetime.date.today())
     
+    # Large Aspire exports can be streamed in chunks instead of loaded whole
+    stream_aspire = st.checkbox(
+        "Low-memory Aspire ingestion",
+        help="Read the Aspire CSV in chunks; the full Aspire sheet is left out of the report"
+    )
+    
+    # Residual amounts pair with the nearest amount at the same branch within this margin
+    amount_tolerance = st.number_input(
+        "Amount tolerance (KES)", min_value=0.0, value=engine.AMOUNT_TOLERANCE / 100,
+        step=0.5, format="%.2f",
+        help="Largest Aspire vs bank difference accepted when matching on branch and amount"
+    )
+    
+    # Card fingerprint + amount pairs must be this close in time (0 turns the pass off)
+    card_window_minutes = st.number_input(
+        "Card match window (minutes)", min_value=0,
+        value=int(engine.CARD_WINDOW.total_seconds() // 60), step=5,
+        help="Largest gap between the bank transaction time and the Aspire receipt time "
+             "when matching on card and amount"
+    )
+    
+    # The cascade pairs rows one-to-one; the notebook flagged each side from its own pool
+    amount_matching = st.radio(
+        "Amount matching", engine.AMOUNT_MATCHING, horizontal=True,
+        help="cascade: pair Aspire and bank rows one-to-one (card, branch, tolerance passes); "
+             "notebook: flag each side as the original notebook did"
+    )
+    
+    # Unmatched items are matched again on later days (the Report Date labels the day)
+    carry_forward = st.checkbox(
+        "Carry forward unmatched items",
+        help="Match today's exceptions against open items from earlier days and keep the rest open"
+    )
+    
+    # Stage timings are always recorded; memory tracing and profiling slow the run down
+    with st.expander("Diagnostics"):
+        trace_memory = st.checkbox(
+            "Track peak memory per stage",
+            help="Uses tracemalloc; processing takes noticeably longer"
+        )
+        profile_run = st.checkbox(
+            "Capture a cProfile dump",
+            help="Profile the whole run and offer the dump as a download"
+        )
+    
     # Process button
     process_btn = st.button("Process Statements")
 
-# Main processing function
-def process_statements():
-    # Initialize empty DataFrames
-    dfs = {
-        'KCB': pd.DataFrame(),
-        'Equity': pd.DataFrame(),
-        'Co-op': pd.DataFrame(),
-        'Aspire': pd.DataFrame()
+# Parsed uploads are shared across reruns and sessions, keyed by file content
+@st.cache_resource
+def get_parse_cache():
+    max_mb = int(os.environ.get('RECON_PARSE_CACHE_MB', '512'))
+    cache_dir = os.environ.get('RECON_CACHE_DIR', DEFAULT_CACHE_DIR)
+    return ParseCache(max_bytes=max_mb * 1024 * 1024, cache_dir=cache_dir)
+
+# Runs go to a worker pool shared by every session; threads unless worker processes are asked for
+@st.cache_resource
+def get_job_manager():
+    threads = int(os.environ.get('RECON_JOB_THREADS', '4'))
+    processes = int(os.environ.get('RECON_JOB_PROCESSES', '0'))
+    return JobManager(threads=threads, processes=processes)
+
+# Statement parsing pool shared by the jobs of every session
+@st.cache_resource
+def get_load_pool():
+    return engine.load_pool(LOAD_WORKERS)
+
+# Queue a reconciliation of the uploaded statements and return its job
+def submit_statements(key):
+    uploads = {'kcb': kcb_file, 'equity': equity_file, 'coop': coop_file,
+               'aspire': aspire_file, 'key': key_file}
+    # The job reads its own copy of each upload; the widgets may change before it runs
+    files = {name: io.BytesIO(read_upload_bytes(f)) for name, f in uploads.items() if f}
+    meta = {
+        'key': key,
+        'report_date': report_date,
+        'inputs': {name: {'name': f.name, 'bytes': f.size} for name, f in uploads.items() if f},
+        'options': {'stream_aspire': stream_aspire, 'amount_tolerance': amount_tolerance,
+                    'card_window_minutes': card_window_minutes, 'carry_forward': carry_forward,
+                    'amount_matching': amount_matching},
     }
-    key = pd.DataFrame()
-    
-    # Load uploaded files
+    streaming = bool(stream_aspire and aspire_file)
+    manager = get_job_manager()
+    if LOAD_WORKERS <= 1:
+        executor = None
+    elif manager.processes:
+        # A job in a worker process starts its own load pool
+        executor = LOAD_WORKERS
+    else:
+        executor = get_load_pool()
+    return manager.submit(
+        engine.reconcile_files, label=', '.join(meta['inputs']),
+        stages=engine.reconcile_stages(streaming), meta=meta,
+        trace_memory=trace_memory, profile=profile_run,
+        # The page previews the frames, so runs stay in memory
+        cache=get_parse_cache(), executor=executor, stream_aspire=streaming, backend='memory',
+        amount_tolerance=int(round(amount_tolerance * 100)),
+        card_window=pd.Timedelta(minutes=card_window_minutes) if card_window_minutes else None,
+        matching=amount_matching,
+        **files
+    )
+
+# Close open items from earlier days and carry today's exceptions forward
+def carry_items_forward(result, day):
     try:
-        if kcb_file:
-            dfs['KCB'] = pd.read_excel(kcb_file)
-        if equity_file:
-            dfs['Equity'] = pd.read_excel(equity_file)
-        if coop_file:
-            dfs['Co-op'] = pd.read_excel(coop_file, skiprows=6)
-        if aspire_file:
-            dfs['Aspire'] = pd.read_csv(aspire_file)
-        if key_file:
-            key = pd.read_excel(key_file)
+        with CarryForwardStore(CARRY_FORWARD_DB) as store:
+            carried = store.apply(day, result.exceptions())
+            return carried, store.report_sheets(carried)
     except Exception as e:
-        st.error(f"Error loading files: {str(e)}")
-        return None, None
-    
-    # Process each bank's data
+        st.error(f"Error carrying items forward: {str(e)}")
+        return None
+
+# JSON record of a run: inputs, options, stage diagnostics and matching passes
+def save_run_record(diagnostics, result, job):
+    record = diagnostics.record(
+        job_id=job.id,
+        report_date=str(job.meta['report_date']),
+        inputs=job.meta['inputs'],
+        options=job.meta['options'],
+        ok=result is not None,
+        match_stats=(result.match_stats.to_dict('records')
+                     if result is not None and result.match_stats is not None else None),
+    )
     try:
-        # Process KCB data
-        if not dfs['KCB'].empty:
-            dfs['KCB'].columns = dfs['KCB'].columns.str.strip()
-            dfs['KCB']['Amount'] = pd.to_numeric(dfs['KCB']['Amount'], errors='coerce')
-            dfs['KCB'] = dfs['KCB'].drop_duplicates(subset=['RRN', 'Amount'], keep='first')
-            dfs['KCB']['Source'] = 'KCB'
-        
-        # Process Co-op data
-        if not dfs['Co-op'].empty:
-            dfs['Co-op'].columns = dfs['Co-op'].columns.str.strip()
-            dfs['Co-op']['BANK COMM'] = pd.to_numeric(dfs['Co-op']['BANK COMM'], errors='coerce')
-            dfs['Co-op'] = dfs['Co-op'].sort_values(by='BANK COMM', na_position='first')
-            dfs['Co-op'] = dfs['Co-op'].drop_duplicates(subset='RRN CODE', keep='first')
-            dfs['Co-op']['Source'] = 'Co-op'
-            dfs['Co-op'] = dfs['Co-op'].dropna(subset=["TRANSACTION DATE"]).reset_index(drop=True)
-        
-        # Process Equity data
-        if not dfs['Equity'].empty:
-            dfs['Equity'].columns = dfs['Equity'].columns.str.strip()
-            dfs['Equity']['Commission'] = pd.to_numeric(dfs['Equity']['Commission'], errors='coerce')
-            dfs['Equity'] = dfs['Equity'].sort_values(by='Commission', na_position='first')
-            dfs['Equity'] = dfs['Equity'].drop_duplicates(subset='R_R_N', keep='first')
-            dfs['Equity']['Source'] = 'Equity'
-        
-        # Process Aspire data (if needed)
-        if not dfs['Aspire'].empty:
-            dfs['Aspire']['Source'] = 'Aspire'
-        
-        # Merge KCB and Equity
-        merged_cards = pd.DataFrame()
-        if not dfs['KCB'].empty and not dfs['Equity'].empty:
-            # Rename columns for consistency
-            kcb_renamed = dfs['KCB'].rename(columns={
-                'Card No': 'Card_Number',
-                'Trans Date': 'TRANS_DATE',
-                'RRN': 'R_R_N',
-                'Amount': 'Purchase',
-                'Comm': 'Commission',
-                'NetPaid': 'Settlement_Amount',
-                'Merchant': 'store'
-            })
-            kcb_renamed['Cash_Back'] = kcb_renamed['Purchase'].apply(lambda x: -1 * x if x < 0 else 0)
-            
-            equity_renamed = dfs['Equity'].rename(columns={
-                'Outlet_Name': 'store',
-                'Trans_Amount': 'Purchase',
-                'Settlement_Amount': 'Settlement_Amount',
-                'R_R_N': 'R_R_N'
-            })
-            
-            # Select common columns
-            columns = ['TID', 'store', 'Card_Number', 'TRANS_DATE', 'R_R_N',
-                      'Purchase', 'Commission', 'Settlement_Amount', 'Cash_Back', 'Source']
-            
-            # Merge
-            kcb_final = kcb_renamed[columns]
-            equity_final = equity_renamed[columns]
-            merged_cards = pd.concat([kcb_final, equity_final], ignore_index=True)
-            
-            # Clean merged data
-            merged_cards = merged_cards[merged_cards['Card_Number'].notna()]
-            merged_cards = merged_cards[merged_cards['Card_Number'].astype(str).str.strip() != '']
-            
-            # Standardize card numbers
-            def standardize_card_number(card_num):
-                if pd.isna(card_num):
-                    return card_num
-                card_str = str(card_num)
-                # Remove all non-digit characters
-                digits = re.sub(r'\D', '', card_str)
-                # Mask middle digits if long enough
-                if len(digits) >= 12:
-                    return f"{digits[:6]}******{digits[-4:]}"
-                return card_str
-            
-            merged_cards['Card_Number'] = merged_cards['Card_Number'].apply(standardize_card_number)
-            
-            # Add branch information if key file is provided
-            if not key.empty:
-                # Create branch mapping dictionary
-                branch_mapping = dict(zip(key['Col_1'], key['Col_2']))
-                
-                # Function to extract branch from store name
-                def get_branch(store_name):
-                    store_name = str(store_name).upper()
-                    for key in branch_mapping:
-                        if str(key).upper() in store_name:
-                            return branch_mapping[key]
-                    # Try to extract branch from KCB merchant format
-                    if "QUICK MART" in store_name and "TILL" not in store_name:
-                        parts = store_name.split(",")
-                        if len(parts) >= 2:
-                            return parts[0].split("QUICK MART")[-1].strip("- ").strip()
-                    return "UNKNOWN"
-                
-                merged_cards['branch'] = merged_cards['store'].apply(get_branch)
-        
-        return merged_cards, dfs
-    
-    except Exception as e:
-        st.error(f"Error processing data: {str(e)}")
-        return None, None
+        write_record(record, RUN_RECORD_DIR)
+    except OSError as e:
+        st.warning(f"Could not write the run record: {str(e)}")
+    return record
+
+# Content hash of an upload, computed once per uploaded file rather than on every rerun
+def upload_digest(upload):
+    digests = st.session_state.setdefault('upload_digests', {})
+    file_id = getattr(upload, 'file_id', None)
+    if file_id is None or file_id not in digests:
+        digest = content_hash(read_upload_bytes(upload))
+        if file_id is None:
+            return digest
+        digests[file_id] = digest
+    return digests[file_id]
+
+# Key of a run: what was uploaded and every option that changes the results
+def run_key():
+    uploads = {'kcb': kcb_file, 'equity': equity_file, 'coop': coop_file,
+               'aspire': aspire_file, 'key': key_file}
+    options = {'stream_aspire': stream_aspire, 'amount_tolerance': amount_tolerance,
+               'card_window_minutes': card_window_minutes, 'carry_forward': carry_forward,
+               'amount_matching': amount_matching,
+               # The report date only labels the day for carry-forward
+               'report_date': str(report_date) if carry_forward else None}
+    payload = json.dumps([{name: upload_digest(f) for name, f in uploads.items() if f}, options],
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+# Figures the page shows, computed once per run instead of on every rerun
+def summarize(result):
+    dfs, merged_cards = result.dfs, result.merged_cards
+    bank_metrics = {}
+    for bank in ['KCB', 'Equity', 'Co-op', 'Aspire']:
+        if not dfs[bank].empty:
+            if bank in ['KCB', 'Equity']:
+                amount_col = 'Amount' if bank == 'KCB' else 'Purchase'
+                comm_col = 'Comm' if bank == 'KCB' else 'Commission'
+                count = len(dfs[bank])
+                total = dfs[bank][amount_col].sum()
+                commission = dfs[bank][comm_col].sum()
+            elif bank == 'Co-op':
+                count = len(dfs[bank])
+                total = dfs[bank]['TRANSACTION AMOUNT'].sum()
+                commission = dfs[bank]['BANK COMM'].sum()
+            else:  # Aspire
+                count = len(dfs[bank])
+                total = dfs[bank].get('Amount', pd.Series([0])).sum()
+                commission = 0  # Adjust based on actual Aspire data
+
+            bank_metrics[bank] = {
+                'Transactions': count,
+                'Total Amount': total,
+                'Total Commission': commission
+            }
+
+    summary = {'bank_metrics': bank_metrics}
+    if not merged_cards.empty:
+        summary['merged'] = {
+            'Transactions': len(merged_cards),
+            'Total Amount': decimals(merged_cards['Purchase'].sum()),
+            'Total Commission': decimals(merged_cards['Commission'].sum()),
+        }
+        # Source and branch are categorical: leave out categories with no rows
+        summary['source_counts'] = (merged_cards['Source'].value_counts()
+                                    .loc[lambda counts: counts > 0])
+        if 'branch' in merged_cards.columns:
+            summary['branch_counts'] = (merged_cards['branch'].value_counts()
+                                        .loc[lambda counts: counts > 0])
+    if result.matched:
+        summary['exception_counts'] = {name: len(df) for name, df in result.exceptions().items()}
+        summary['card_summary'] = from_cents(result.card_summary).astype({'No': str})
+    return summary
+
+# Remove a run's prepared report file, if any
+def discard_report(run):
+    report = run.pop('report', None)
+    if report is not None and os.path.exists(report['path']):
+        os.remove(report['path'])
+
+# Keep a processed run, dropping the oldest beyond RESULT_CACHE_SIZE
+def remember_run(key, run):
+    runs = st.session_state.setdefault('runs', OrderedDict())
+    if key in runs:
+        discard_report(runs.pop(key))
+    runs[key] = run
+    while len(runs) > max(RESULT_CACHE_SIZE, 1):
+        discard_report(runs.popitem(last=False)[1])
+    st.session_state['last_run'] = key
+
+# Attach a finished job's results (or its error) to this session
+def collect_job(job):
+    result = job.result if job.ok else None
+    if not job.ok:
+        st.error(f"Error processing statements: {job.error_message}")
+    # A worker process that died took its diagnostics with it
+    diagnostics = job.diagnostics or RunDiagnostics()
+    carried = None
+    if result is not None and job.meta['options']['carry_forward'] and result.matched:
+        with stage(diagnostics, 'carry_forward'):
+            carried = carry_items_forward(result, job.meta['report_date'])
+    run_record = save_run_record(diagnostics, result, job)
+
+    # Results are kept across reruns so the report can be prepared on request
+    st.session_state['diagnostics'] = {'diagnostics': diagnostics, 'record': run_record,
+                                       'profile': diagnostics.profile_bytes()}
+    if result is not None:
+        remember_run(job.meta['key'], {'result': result, 'carried': carried,
+                                       'summary': summarize(result)})
+    else:
+        st.session_state.pop('last_run', None)
+
+# Progress of this session's job, refreshed on its own without rerunning the page
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id):
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None or job.finished:
+        # The full rerun collects the results
+        st.rerun()
+    if job.status == QUEUED:
+        text = f"Job {job.id} is queued ({manager.queue_position(job)} ahead)"
+    else:
+        text = f"Job {job.id}: {job.current_stage or 'starting'}"
+    st.progress(job.progress, text=text)
+    st.dataframe(job.stage_frame(), hide_index=True)
 
 # Main content area
+runs = st.session_state.setdefault('runs', OrderedDict())
+has_uploads = bool(kcb_file or equity_file or coop_file or aspire_file)
+current_key = run_key() if has_uploads else None
+
+# A job survives the tab: a reconnected or reloaded page finds it through the URL
+manager = get_job_manager()
+if 'job' not in st.session_state and 'job' in st.query_params:
+    st.session_state['job'] = st.query_params['job']
+pending = manager.get(st.session_state['job']) if 'job' in st.session_state else None
+if 'job' in st.session_state and (pending is None or pending.finished):
+    if pending is None:
+        st.warning("The processing job is no longer available; please process the statements again.")
+    else:
+        collect_job(pending)
+        manager.forget(pending.id)
+    del st.session_state['job']
+    st.query_params.pop('job', None)
+    pending = None
+
 if process_btn:
-    if not (kcb_file or equity_file or coop_file or aspire_file):
+    if not has_uploads:
         st.warning("Please upload at least one bank statement")
+    elif pending is not None:
+        st.info(f"Statements are already being processed (job {pending.id}).")
+    elif current_key in runs:
+        # Same uploads and options: the results are already here
+        runs.move_to_end(current_key)
+        st.session_state['last_run'] = current_key
+        st.info("Uploads and options are unchanged; showing the results already processed.")
     else:
-        with st.spinner("Processing statements..."):
-            merged_cards, dfs = process_statements()
-            
-            if merged_cards is not None:
-                st.success("Processing completed!")
-                
-                # Display comprehensive statistics
-                st.subheader("Comprehensive Statistics")
-                
-                # Create metrics for each bank
-                st.markdown("### Transaction Summary by Bank")
-                
-                # Calculate metrics for each available bank
-                bank_metrics = {}
-                for bank in ['KCB', 'Equity', 'Co-op', 'Aspire']:
-                    if not dfs[bank].empty:
-                        if bank in ['KCB', 'Equity']:
-                            amount_col = 'Amount' if bank == 'KCB' else 'Purchase'
-                            comm_col = 'Comm' if bank == 'KCB' else 'Commission'
-                            count = len(dfs[bank])
-                            total = dfs[bank][amount_col].sum()
-                            commission = dfs[bank][comm_col].sum()
-                        elif bank == 'Co-op':
-                            count = len(dfs[bank])
-                            total = dfs[bank]['TRANSACTION AMOUNT'].sum()
-                            commission = dfs[bank]['BANK COMM'].sum()
-                        else:  # Aspire
-                            count = len(dfs[bank])
-                            total = dfs[bank].get('Amount', pd.Series([0])).sum()
-                            commission = 0  # Adjust based on actual Aspire data
-                        
-                        bank_metrics[bank] = {
-                            'Transactions': count,
-                            'Total Amount': total,
-                            'Total Commission': commission
-                        }
-                
-                # Display metrics in cards
-                cols = st.columns(len(bank_metrics))
-                for idx, (bank, metrics) in enumerate(bank_metrics.items()):
-                    with cols[idx]:
-                        st.markdown(f"<div class='metric-card'><h3>{bank}</h3>"
-                                   f"<p>Transactions: {metrics['Transactions']:,}</p>"
-                                   f"<p>Amount: KES {metrics['Total Amount']:,.2f}</p>"
-                                   f"<p>Commission: KES {metrics['Total Commission']:,.2f}</p></div>", 
-                                   unsafe_allow_html=True)
-                
-                # Show merged data statistics if available
-                if not merged_cards.empty:
-                    st.markdown("### Merged Data Summary")
-                    
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Total Transactions", len(merged_cards))
-                    with col2:
-                        st.metric("Total Amount", f"KES {merged_cards['Purchase'].sum():,.2f}")
-                    with col3:
-                        st.metric("Total Commission", f"KES {merged_cards['Commission'].sum():,.2f}")
-                    
-                    # Show source distribution
-                    st.write("#### Transactions by Bank")
-                    source_counts = merged_cards['Source'].value_counts()
-                    st.bar_chart(source_counts)
-                    
-                    # Show branch distribution if available
-                    if 'branch' in merged_cards.columns:
-                        st.write("#### Transactions by Branch")
-                        branch_counts = merged_cards['branch'].value_counts()
-                        st.bar_chart(branch_counts)
-                
-                # Show data previews
-                st.subheader("Data Previews")
-                
-                tab1, tab2, tab3, tab4 = st.tabs(["Merged Data", "KCB", "Equity", "Co-op"])
-                
-                with tab1:
-                    if not merged_cards.empty:
-                        st.dataframe(merged_cards.head())
-                    else:
-                        st.info("No merged data available")
-                
-                with tab2:
-                    if not dfs['KCB'].empty:
-                        st.dataframe(dfs['KCB'].head())
-                    else:
-                        st.info("No KCB data available")
-                
-                with tab3:
-                    if not dfs['Equity'].empty:
-                        st.dataframe(dfs['Equity'].head())
-                    else:
-                        st.info("No Equity data available")
-                
-                with tab4:
-                    if not dfs['Co-op'].empty:
-                        st.dataframe(dfs['Co-op'].head())
-                    else:
-                        st.info("No Co-op data available")
-                
-                # Download buttons
-                st.subheader("Download Reports")
-                
-                # Create Excel file with multiple sheets
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    if not merged_cards.empty:
-                        # Format merged data to match reconciliation report
-                        report_df = merged_cards.copy()
-                        report_df['Transaction_Date'] = pd.to_datetime(report_df['TRANS_DATE']).dt.strftime('%Y-%m-%d %H:%M:%S')
-                        report_df = report_df[[
-                            'Transaction_Date', 'branch', 'Card_Number', 'Purchase', 
-                            'Commission', 'Settlement_Amount', 'Source', 'R_R_N', 'TID'
-                        ]]
-                        report_df.to_excel(writer, sheet_name='Reconciled_Transactions', index=False)
-                    
-                    # Add individual bank sheets
-                    for bank, df in dfs.items():
-                        if not df.empty:
-                            df.to_excel(writer, sheet_name=f'{bank}_Raw_Data', index=False)
-                
-                # Create download link
-                b64 = base64.b64encode(output.getvalue()).decode()
-                href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="Reconciliation_Report_{report_date}.xlsx">Download Full Report</a>'
-                st.markdown(href, unsafe_allow_html=True)
+        pending = submit_statements(current_key)
+        st.session_state['job'] = pending.id
+        st.query_params['job'] = pending.id
+
+if pending is not None:
+    st.markdown("### Processing")
+    job_progress(pending.id)
+
+# The run of the current uploads and options if there is one, else the last one processed
+run = runs.get(current_key) or runs.get(st.session_state.get('last_run'))
+if run is not None:
+    result, carried, summary = run['result'], run['carried'], run['summary']
+    merged_cards, dfs = result.merged_cards, result.dfs
+    st.success("Processing completed!")
+    if runs.get(current_key) is not run:
+        st.info("The uploads or options changed since these results were processed. "
+                "Press **Process Statements** to update them.")
+
+    # Display comprehensive statistics
+    st.subheader("Comprehensive Statistics")
+
+    # Create metrics for each bank
+    st.markdown("### Transaction Summary by Bank")
+
+    # Display metrics in cards
+    bank_metrics = summary['bank_metrics']
+    cols = st.columns(len(bank_metrics))
+    for idx, (bank, metrics) in enumerate(bank_metrics.items()):
+        with cols[idx]:
+            st.markdown(f"<div class='metric-card'><h3>{bank}</h3>"
+                       f"<p>Transactions: {metrics['Transactions']:,}</p>"
+                       f"<p>Amount: KES {metrics['Total Amount']:,.2f}</p>"
+                       f"<p>Commission: KES {metrics['Total Commission']:,.2f}</p></div>", 
+                       unsafe_allow_html=True)
+
+    # Show merged data statistics if available
+    if not merged_cards.empty:
+        st.markdown("### Merged Data Summary")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Transactions", summary['merged']['Transactions'])
+        with col2:
+            st.metric("Total Amount", f"KES {summary['merged']['Total Amount']:,.2f}")
+        with col3:
+            st.metric("Total Commission", f"KES {summary['merged']['Total Commission']:,.2f}")
+
+        # Show source distribution
+        st.write("#### Transactions by Bank")
+        st.bar_chart(summary['source_counts'])
+
+        # Show branch distribution if available
+        if 'branch_counts' in summary:
+            st.write("#### Transactions by Branch")
+            st.bar_chart(summary['branch_counts'])
+
+    # Show the Aspire vs bank reconciliation if Aspire was uploaded
+    if result.matched:
+        st.markdown("### Reconciliation Summary")
+        exception_counts = summary['exception_counts']
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Aspire Unmatched (Asp_Recs)", exception_counts['Asp_Recs'])
+        with col2:
+            st.metric("KCB Unmatched (kcb_recs)", exception_counts['kcb_recs'])
+        with col3:
+            st.metric("Equity Unmatched (Equity_recs)", exception_counts['Equity_recs'])
+        st.dataframe(summary['card_summary'])
+    # Items closed from earlier days and what is still open
+    carried_sheets = {}
+    if carried is not None:
+        carried, carried_sheets = carried
+        st.markdown("### Carried Forward Items")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Closed from earlier days", len(carried))
+        with col2:
+            st.metric("Open items", int(carried_sheets['Open_Items_By_Day']['Items'].sum()))
+    
+    # Show data previews
+    st.subheader("Data Previews")
+
+    tab1, tab2, tab3, tab4 = st.tabs(["Merged Data", "KCB", "Equity", "Co-op"])
+
+    with tab1:
+        if not merged_cards.empty:
+            st.dataframe(merged_cards.head())
+        else:
+            st.info("No merged data available")
+
+    with tab2:
+        if not dfs['KCB'].empty:
+            st.dataframe(dfs['KCB'].head())
+        else:
+            st.info("No KCB data available")
+
+    with tab3:
+        if not dfs['Equity'].empty:
+            st.dataframe(dfs['Equity'].head())
+        else:
+            st.info("No Equity data available")
+
+    with tab4:
+        if not dfs['Co-op'].empty:
+            st.dataframe(dfs['Co-op'].head())
+        else:
+            st.info("No Co-op data available")
+
+    
+    # Download buttons
+    st.subheader("Download Reports")
+    
+    # The workbook is only written when asked for, straight to a temporary file
+    include_raw = st.checkbox(
+        "Include raw bank sheets", value=True,
+        help="The *_Raw_Data sheets repeat every uploaded row and make the file much larger"
+    )
+    if st.button("Prepare Report"):
+        with st.spinner("Writing report..."):
+            discard_report(run)
+            report_diagnostics = RunDiagnostics(trace_memory=trace_memory)
+            with report_diagnostics.run(), stage(report_diagnostics, 'export_report') as record:
+                sheets = result.download_sheets(carried_sheets)
+                record.rows_in = sum(len(df) for df in sheets.values())
+                path = export.export_report(sheets, include_raw=include_raw,
+                                            number_formats=engine.REPORT_NUMBER_FORMATS)
+            run['report'] = {'path': path, 'include_raw': include_raw,
+                             'diagnostics': report_diagnostics}
+    
+    report = run.get('report')
+    if report is not None and report['include_raw'] == include_raw and os.path.exists(report['path']):
+        with open(report['path'], 'rb') as fh:
+            st.download_button(
+                "Download Full Report", fh,
+                file_name=f"Reconciliation_Report_{report_date}.xlsx",
+                mime=export.XLSX_MIME
+            )
+
+# Where the time (and memory) of the last run went
+run_diagnostics = st.session_state.get('diagnostics')
+if run_diagnostics is not None:
+    diagnostics, run_record = run_diagnostics['diagnostics'], run_diagnostics['record']
+    with st.expander("Run diagnostics"):
+        if diagnostics.seconds is not None:
+            st.write(f"Total processing time: {diagnostics.seconds:.2f}s")
+        st.dataframe(diagnostics.frame(), hide_index=True)
+        if run is not None and run['result'].match_stats is not None:
+            st.write("#### Matching passes")
+            st.dataframe(run['result'].match_stats, hide_index=True)
+        report = None if run is None else run.get('report')
+        if report is not None:
+            st.write("#### Report export")
+            st.dataframe(report['diagnostics'].frame(), hide_index=True)
+        st.download_button(
+            "Download run record (JSON)", json.dumps(run_record, indent=2, default=str),
+            file_name=f"run_{run_record['run_id']}.json", mime="application/json"
+        )
+        if run_diagnostics['profile'] is not None:
+            st.download_button(
+                "Download cProfile dump", run_diagnostics['profile'],
+                file_name=f"run_{run_record['run_id']}.prof", mime="application/octet-stream"
+            )
 
 # Instructions section
 with st.expander("📌 Instructions"):
@@ -323,9 +527,10 @@ with st.expander("📌 Instructions"):
     
     2. Select the **report date**
     
-    3. Click **"Process Statements"** button
+    3. Click **"Process Statements"** button; the statements are processed in the background
+       with progress per stage, and the page can be reloaded meanwhile
     
-    4. View and download the reconciled reports
+    4. View the results, then click **"Prepare Report"** to download the Excel report
     
     ### Expected File Formats:
     - **KCB**: Excel with columns: Card No, Trans Date, RRN, Amount, Comm, NetPaid, Merchant
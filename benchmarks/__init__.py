@@ -0,0 +1 @@
+"""Benchmarks for the reconciliation pipeline (run with ``python -m benchmarks.<name>``)."""
@@ -0,0 +1,80 @@
+"""Compare app.py's per-row get_branch scan with BranchResolver.
+
+    python -m benchmarks.bench_branch_resolver --keys 1000 --rows 1000000
+
+The legacy scan is timed on ``--legacy-sample`` rows and extrapolated, since
+the full rows x keys loop takes far too long to run at benchmark sizes.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from recon.branches import BranchResolver
+
+
+def legacy_get_branch(branch_mapping):
+    # Verbatim copy of the get_branch closure app.py used before BranchResolver
+    def get_branch(store_name):
+        store_name = str(store_name).upper()
+        for key in branch_mapping:
+            if str(key).upper() in store_name:
+                return branch_mapping[key]
+        if "QUICK MART" in store_name and "TILL" not in store_name:
+            parts = store_name.split(",")
+            if len(parts) >= 2:
+                return parts[0].split("QUICK MART")[-1].strip("- ").strip()
+        return "UNKNOWN"
+    return get_branch
+
+
+def make_inputs(n_keys, n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    branches = [f'BRANCH {i:04d}' for i in range(n_keys)]
+    key = pd.DataFrame({
+        'Col_1': [f'QUICKMART {b}' for b in branches],
+        'Col_2': branches,
+    })
+    # Terminal strings seen on statements: known merchants, KCB-style names
+    # that only the fallback resolves, and stores missing from the key
+    known = [f'{m} TILL {t}' for m in key['Col_1'] for t in range(2)]
+    kcb_style = [f'QUICK MART - EXTRA {i}, NAIROBI KE' for i in range(n_keys // 10)]
+    unknown = [f'OTHER MERCHANT {i}' for i in range(n_keys // 10)]
+    pool = np.array(known + kcb_style + unknown, dtype=object)
+    stores = pd.Series(pool[rng.integers(0, len(pool), n_rows)])
+    return key, stores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--legacy-sample', type=int, default=20_000)
+    args = parser.parse_args(argv)
+
+    key, stores = make_inputs(args.keys, args.rows)
+    branch_mapping = dict(zip(key['Col_1'], key['Col_2']))
+
+    sample = stores.iloc[:args.legacy_sample]
+    start = time.perf_counter()
+    expected = sample.apply(legacy_get_branch(branch_mapping))
+    legacy_sample_s = time.perf_counter() - start
+    legacy_s = legacy_sample_s * len(stores) / max(len(sample), 1)
+
+    start = time.perf_counter()
+    resolver = BranchResolver(branch_mapping)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    resolved = resolver.resolve(stores)
+    resolve_s = time.perf_counter() - start
+
+    assert resolved.iloc[:len(sample)].tolist() == expected.tolist()
+    print(f'keys={args.keys:,} rows={args.rows:,} unique stores={stores.nunique():,}')
+    print(f'legacy get_branch: {legacy_s:10.2f}s (extrapolated from {len(sample):,} rows)')
+    print(f'BranchResolver:    {build_s + resolve_s:10.2f}s (build {build_s:.3f}s, resolve {resolve_s:.3f}s)')
+    print(f'speedup:           {legacy_s / (build_s + resolve_s):10.0f}x')
+
+
+if __name__ == '__main__':
+    main()
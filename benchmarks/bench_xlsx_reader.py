@@ -0,0 +1,84 @@
+"""Compare pd.read_excel with recon.xlsx_reader.read_statement on a KCB-style sheet.
+
+    python -m benchmarks.bench_xlsx_reader --rows 500000
+
+The statement has the eight KCB columns the reconciliation uses plus eight
+it does not. It is generated once into ``--path`` and reused on later runs.
+Strings go to the shared-string table as in Excel-saved bank exports;
+``--inline-strings`` writes them inline (xlsxwriter's constant_memory mode),
+which is slower for every reader but needs far less memory to generate.
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from recon.xlsx_reader import STATEMENT_COLUMNS, read_statement
+
+EXTRA_COLUMNS = ['Batch', 'Auth Code', 'Card Type', 'Currency', 'Terminal Location',
+                 'Settlement Date', 'Narration', 'Status']
+
+
+def write_statement(path, n_rows, seed=0, inline_strings=False):
+    import xlsxwriter
+
+    rng = np.random.default_rng(seed)
+    header = STATEMENT_COLUMNS['KCB'] + EXTRA_COLUMNS
+    start = datetime.datetime(2025, 6, 11)
+    amounts = rng.uniform(50, 20000, n_rows).round(2)
+    rrns = rng.integers(10 ** 11, 10 ** 12, n_rows)
+    seconds = rng.integers(0, 86400, n_rows)
+
+    wb = xlsxwriter.Workbook(path, {'constant_memory': inline_strings})
+    ws = wb.add_worksheet()
+    date_format = wb.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    ws.write_row(0, 0, header)
+    for i in range(n_rows):
+        ws.write_row(i + 1, 0, [
+            f'T{i % 400:04d}', f'412345******{i % 10000:04d}', None, int(rrns[i]),
+            float(amounts[i]), round(float(amounts[i]) * 0.015, 2),
+            round(float(amounts[i]) * 0.985, 2), f'QUICK MART BRANCH {i % 60}, NAIROBI KE',
+            i // 500, f'A{i:06d}', 'VISA', 'KES', 'NAIROBI', '2025-06-12', 'POS PURCHASE', 'OK',
+        ])
+        ws.write_datetime(i + 1, 2, start + datetime.timedelta(seconds=int(seconds[i])), date_format)
+    wb.close()
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    df = fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<34}{elapsed:8.2f}s  {df.shape[0]:,} rows x {df.shape[1]} cols')
+    return df, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--path', default=None)
+    parser.add_argument('--inline-strings', action='store_true')
+    args = parser.parse_args(argv)
+
+    suffix = '_inline' if args.inline_strings else ''
+    path = args.path or os.path.join(tempfile.gettempdir(), f'bench_kcb_{args.rows}{suffix}.xlsx')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        write_statement(path, args.rows, inline_strings=args.inline_strings)
+        print(f'wrote {path} in {time.perf_counter() - start:.1f}s')
+
+    baseline, base_s = timed('pd.read_excel', lambda: pd.read_excel(path))
+    full, full_s = timed('read_statement (all columns)', lambda: read_statement(path))
+    projected, proj_s = timed('read_statement (KCB columns)',
+                              lambda: read_statement(path, columns=STATEMENT_COLUMNS['KCB']))
+
+    pd.testing.assert_frame_equal(baseline, full)
+    pd.testing.assert_frame_equal(baseline[projected.columns], projected)
+    print(f'speedup: {base_s / full_s:.1f}x (all columns), {base_s / proj_s:.1f}x (projected)')
+
+
+if __name__ == '__main__':
+    main()
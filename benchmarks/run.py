@@ -0,0 +1,168 @@
+"""Time every reconciliation stage on synthetic statements of several sizes.
+
+    python -m benchmarks.run --sizes 10000 100000 1000000 --history bench_history.csv
+
+For each size a seeded statement set (``benchmarks.synthetic``) is
+reconciled through the engine the app and the notebook share, with
+``recon.diagnostics`` timing each stage: reading the files, cleaning,
+merging, card and branch normalization, the RRN and amount matching, the
+card_summary and the report export. Sizes whose bank statements fit in
+Excel go through the files; larger ones are reconciled from the frames.
+
+Every stage of every size is appended to ``--history`` (CSV, or JSON lines
+for a ``.jsonl`` path) with the code version, and compared against the
+latest earlier run of the same size and stage so regressions stand out.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import fits_excel, make_statements, write_statements
+from recon import engine
+from recon.diagnostics import RunDiagnostics, stage
+from recon.export import EXCEL_MAX_ROWS
+
+HISTORY_COLUMNS = ['run_at', 'version', 'size', 'mode', 'trace_memory', 'stage', 'depth',
+                   'seconds', 'rows_in', 'rows_out', 'peak_mb', 'python', 'pandas']
+
+
+def code_version():
+    """``git describe`` of the working tree, or 'unknown' outside a checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+            check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_size(size, workdir, seed=0, use_files=True, stream_aspire=False, trace_memory=False,
+             load_workers=None):
+    """Reconcile one synthetic day of ``size`` Aspire rows; returns ``(mode, diagnostics)``.
+
+    ``load_workers`` reads the files in that many worker processes.
+    """
+    statements = make_statements(size, seed=seed)
+    use_files = use_files and fits_excel(statements)
+    if use_files:
+        paths = write_statements(statements, os.path.join(workdir, f'day_{size}'))
+    report_path = os.path.join(workdir, f'report_{size}.xlsx')
+
+    diagnostics = RunDiagnostics(trace_memory=trace_memory)
+    with diagnostics.run():
+        if use_files:
+            result = engine.reconcile_files(**paths, stream_aspire=stream_aspire,
+                                            diagnostics=diagnostics, executor=load_workers)
+        else:
+            dfs = {'KCB': statements['kcb'], 'Equity': statements['equity'],
+                   'Co-op': statements['coop'],
+                   'Aspire': statements['aspire'].astype({'REF_NO': str})}
+            result = engine.reconcile(dfs, statements['key'], diagnostics=diagnostics)
+        with stage(diagnostics, 'write_report') as record:
+            # Sheets past Excel's row limit could not be written by the app either
+            sheets = {name: df for name, df in result.report_sheets().items()
+                      if len(df) < EXCEL_MAX_ROWS}
+            record.rows_in = sum(len(df) for df in sheets.values())
+            engine.write_report(sheets, report_path)
+    os.remove(report_path)
+    mode = ('files' if use_files else 'frames') + ('+stream' if stream_aspire and use_files else '')
+    if load_workers and use_files:
+        mode += f'+load{load_workers}'
+    return mode, diagnostics
+
+
+def read_history(path):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    if path.endswith('.jsonl'):
+        return pd.read_json(path, lines=True)
+    return pd.read_csv(path)
+
+
+def append_history(path, rows):
+    if path.endswith('.jsonl'):
+        with open(path, 'a') as fh:
+            for row in rows.to_dict('records'):
+                fh.write(json.dumps(row, default=str) + '\n')
+    else:
+        rows.to_csv(path, mode='a', index=False, header=not os.path.exists(path))
+
+
+def compare(current, history, threshold):
+    """Current stage times next to the latest earlier comparable run of each stage.
+
+    Runs are comparable when size, mode and memory tracing (which slows
+    every stage down) are the same.
+    """
+    keys = ['size', 'mode', 'trace_memory', 'stage']
+    previous = history[history['run_at'] < current['run_at'].iloc[0]]
+    previous = previous.sort_values('run_at').groupby(keys).tail(1)
+    table = current.merge(previous[keys + ['seconds', 'version']], on=keys, how='left',
+                          suffixes=('', '_before'))
+    table['ratio'] = table['seconds'] / table['seconds_before']
+    table['flag'] = (table['ratio'] > threshold).map({True: 'SLOWER', False: ''})
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000],
+                        help='Aspire rows per synthetic day (10k to 5M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default='bench_history.csv',
+                        help='CSV (or .jsonl) file the results are appended to')
+    parser.add_argument('--frames', action='store_true',
+                        help='reconcile the generated frames instead of writing files')
+    parser.add_argument('--stream-aspire', action='store_true')
+    parser.add_argument('--load-workers', type=int, default=None,
+                        help='read the statement files in this many worker processes')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='record the tracemalloc peak per stage (slower)')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='flag stages this many times slower than the previous run')
+    parser.add_argument('--workdir', default=None)
+    args = parser.parse_args(argv)
+
+    run_at = datetime.datetime.now().isoformat(timespec='seconds')
+    version = code_version()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='recon_bench_')
+    frames = []
+    for size in args.sizes:
+        start = time.perf_counter()
+        mode, diagnostics = run_size(size, workdir, seed=args.seed, use_files=not args.frames,
+                                     stream_aspire=args.stream_aspire,
+                                     trace_memory=args.trace_memory,
+                                     load_workers=args.load_workers)
+        print(f'{size:>10,} rows  {mode:<14}{diagnostics.seconds:8.2f}s '
+              f'({time.perf_counter() - start:.1f}s with generation)', flush=True)
+        stages = pd.DataFrame([r.as_dict() for r in diagnostics.stages])
+        stages.insert(0, 'trace_memory', args.trace_memory)
+        stages.insert(0, 'mode', mode)
+        stages.insert(0, 'size', size)
+        frames.append(stages)
+
+    current = pd.concat(frames, ignore_index=True)
+    current.insert(0, 'version', version)
+    current.insert(0, 'run_at', run_at)
+    current['python'] = platform.python_version()
+    current['pandas'] = pd.__version__
+    current = current[HISTORY_COLUMNS].astype({'rows_in': 'Int64', 'rows_out': 'Int64'})
+
+    table = compare(current, read_history(args.history), args.threshold)
+    table['stage'] = ['  ' * d + s for d, s in zip(table['depth'], table['stage'])]
+    print(table[['size', 'stage', 'seconds', 'rows_in', 'rows_out', 'peak_mb',
+                 'seconds_before', 'ratio', 'flag']].to_string(index=False, float_format='{:.3f}'.format))
+    append_history(args.history, current)
+    print(f'appended {len(current)} rows to {args.history} ({version})')
+
+
+if __name__ == '__main__':
+    main()
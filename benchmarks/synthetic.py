@@ -0,0 +1,220 @@
+"""Seeded synthetic statement sets for benchmarking the reconciliation.
+
+    python -m benchmarks.synthetic --rows 100000 --out /tmp/recon_100k
+
+``make_statements`` builds one day of KCB, Equity, Co-op, Aspire and card
+key frames in the layouts the banks and Aspire export; ``write_statements``
+writes them as the files the app takes (Co-op with its six title rows above
+the header). ``rows`` is the number of Aspire card sales. Of those,
+``match_rate`` reach a bank statement (split between KCB and Equity), and
+``rrn_rate`` of Aspire rows carry the bank RRN; the rest are left to the
+amount passes. ``duplicate_rate`` of bank rows are exported twice, and
+``rounding_rate`` of Aspire amounts are rounded to whole shillings. Bank-only
+rows (refunds, sales rung up elsewhere) make up the bank side's shortfall.
+
+Excel sheets hold at most 1,048,576 rows, so past roughly 1.5M Aspire rows
+the bank statements only exist as frames; ``benchmarks.run`` then
+reconciles the frames directly.
+"""
+import argparse
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from recon.export import EXCEL_MAX_ROWS
+from recon.xlsx_reader import STATEMENT_SKIPROWS
+
+KCB_SHARE = 0.6
+COOP_SHARE = 0.05
+
+# Title block of the Co-op export above its header row
+COOP_TITLE = ['CO-OPERATIVE BANK OF KENYA', 'MERCHANT TRANSACTION REPORT', 'QUICK MART LTD',
+              'ACCOUNT: 01100000000000', 'PERIOD: {day}', '']
+
+FILES = {
+    'kcb': 'kcb.xlsx',
+    'equity': 'equity.xlsx',
+    'coop': 'coop.xlsx',
+    'aspire': 'aspire.csv',
+    'key': 'card_key.xlsx',
+}
+
+
+def _pick(rng, pool, n):
+    pool = np.asarray(pool, dtype=object)
+    return pool[rng.integers(0, len(pool), n)]
+
+
+def _cards(rng, n_cards):
+    bins = rng.choice(['412345', '445566', '516732', '535522', '470012'], n_cards)
+    tails = rng.integers(0, 10000, n_cards)
+    return np.array([f'{b}******{t:04d}' for b, t in zip(bins, tails)], dtype=object)
+
+
+def make_statements(rows, seed=0, stores=60, match_rate=0.95, rrn_rate=0.85,
+                    duplicate_rate=0.01, rounding_rate=0.05, day='2025-06-11'):
+    """Frames ``{'kcb', 'equity', 'coop', 'aspire', 'key'}`` of one synthetic day."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(day)
+
+    names = np.array([f'BRANCH {i:03d}' for i in range(stores)], dtype=object)
+    key = pd.DataFrame({'Col_1': 'QUICKMART ' + pd.Series(names), 'Col_2': names})
+
+    # Aspire card sales
+    store = rng.integers(0, stores, rows)
+    amount = np.round(np.exp(rng.normal(6.5, 1.1, rows)).clip(20, 250_000), 2)
+    when = start + pd.to_timedelta(rng.integers(7 * 3600, 23 * 3600, rows), unit='s')
+    cards = _cards(rng, max(rows // 3, 1))[rng.integers(0, max(rows // 3, 1), rows)]
+    # Unique 12-digit RRNs without materializing a larger pool to sample from
+    rrn = 10 ** 11 + 7 * np.arange(rows, dtype=np.int64) + rng.integers(0, 7, rows)
+
+    in_bank = rng.random(rows) < match_rate
+    has_rrn = rng.random(rows) < rrn_rate
+    rounded = rng.random(rows) < rounding_rate
+    till = rng.integers(1, 9, rows)
+    aspire = pd.DataFrame({
+        'STORE_CODE': store + 100,
+        'STORE_NAME': names[store],
+        'ZED_DATE': day,
+        'TILL': till,
+        'SESSION': rng.integers(1, 4, rows),
+        'RCT': np.arange(rows) + 1,
+        'CUSTOMER_NAME': 'WALK IN',
+        'CARD_TYPE': _pick(rng, ['VISA', 'MASTERCARD'], rows),
+        'CARD_NUMBER': cards,
+        'AMOUNT': np.where(rounded, np.round(amount), amount),
+        'REF_NO': np.where(has_rrn, rrn.astype(str), '0'),
+        # The till prints its receipt up to a few minutes after the terminal
+        'RCT_TRN_DATE': (when + pd.to_timedelta(rng.integers(0, 300, rows), unit='s'))
+                        .strftime('%Y-%m-%d %H:%M:%S'),
+    })
+
+    # Bank rows: the matched sales plus bank-only rows, then repeated exports
+    n_extra = int(rows * (1 - match_rate) * 0.5)
+    extra_store = rng.integers(0, stores, n_extra)
+    bank = pd.DataFrame({
+        'store': np.concatenate([store[in_bank], extra_store]),
+        'card': np.concatenate([cards[in_bank], _cards(rng, n_extra)]),
+        'when': np.concatenate([when[in_bank].to_numpy(),
+                                (start + pd.to_timedelta(rng.integers(0, 86400, n_extra),
+                                                         unit='s')).to_numpy()]),
+        'rrn': np.concatenate([rrn[in_bank], 10 ** 11 + 7 * (rows + 1) + np.arange(n_extra)]),
+        'amount': np.concatenate([amount[in_bank],
+                                  np.round(rng.uniform(20, 20_000, n_extra), 2)]),
+        'till': np.concatenate([till[in_bank], rng.integers(1, 9, n_extra)]),
+    })
+    repeats = bank.iloc[np.flatnonzero(rng.random(len(bank)) < duplicate_rate)]
+    bank = pd.concat([bank, repeats], ignore_index=True)
+    bank = bank.iloc[rng.permutation(len(bank))].reset_index(drop=True)
+
+    terminal = (names[bank['store']] + ' TILL ' + bank['till'].astype(str)).astype(object)
+    tid = 'T' + (bank['store'] * 10 + bank['till']).astype(str).str.zfill(5)
+    commission = (bank['amount'] * 0.015).round(2)
+    to_kcb = rng.random(len(bank)) < KCB_SHARE
+
+    kcb_rows = bank[to_kcb]
+    kcb = pd.DataFrame({
+        'TID': tid[to_kcb],
+        'Card No': kcb_rows['card'],
+        'Trans Date': kcb_rows['when'],
+        'RRN': kcb_rows['rrn'],
+        'Amount': kcb_rows['amount'],
+        'Comm': commission[to_kcb],
+        'NetPaid': (kcb_rows['amount'] - commission[to_kcb]).round(2),
+        'Merchant': 'QUICKMART ' + terminal[to_kcb],
+    }).reset_index(drop=True)
+
+    eq_rows = bank[~to_kcb]
+    equity = pd.DataFrame({
+        'TID': tid[~to_kcb],
+        'Outlet_Name': 'QUICKMART ' + terminal[~to_kcb],
+        'Card_Number': eq_rows['card'],
+        'TRANS_DATE': eq_rows['when'],
+        'R_R_N': eq_rows['rrn'],
+        'Purchase': eq_rows['amount'],
+        'Commission': commission[~to_kcb],
+        'Settlement_Amount': (eq_rows['amount'] - commission[~to_kcb]).round(2),
+        'Cash_Back': 0.0,
+    }).reset_index(drop=True)
+
+    n_coop = max(int(rows * COOP_SHARE), 1)
+    coop_amount = np.round(rng.uniform(20, 20_000, n_coop), 2)
+    coop = pd.DataFrame({
+        'TRANSACTION DATE': start + pd.to_timedelta(rng.integers(0, 86400, n_coop), unit='s'),
+        'TRANSACTION AMOUNT': coop_amount,
+        'BANK COMM': (coop_amount * 0.0125).round(2),
+        'RRN CODE': 9 * 10 ** 11 + np.arange(n_coop),
+    })
+    return {'kcb': kcb, 'equity': equity, 'coop': coop, 'aspire': aspire, 'key': key}
+
+
+def fits_excel(statements):
+    """Whether every Excel statement fits in one sheet."""
+    return all(len(statements[name]) + 1 + STATEMENT_SKIPROWS.get(bank, 0) <= EXCEL_MAX_ROWS
+               for name, bank in [('kcb', 'KCB'), ('equity', 'Equity'), ('coop', 'Co-op')])
+
+
+def _write_coop(path, coop, day):
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        ws = wb.add_worksheet()
+        date_format = wb.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+        for row, title in enumerate(COOP_TITLE):
+            ws.write_string(row, 0, title.format(day=day))
+        header_row = STATEMENT_SKIPROWS['Co-op']
+        ws.write_row(header_row, 0, list(coop.columns))
+        for offset, (when, amount, comm, rrn) in enumerate(coop.itertuples(index=False)):
+            row = header_row + 1 + offset
+            ws.write_datetime(row, 0, when.to_pydatetime(), date_format)
+            ws.write_row(row, 1, [float(amount), float(comm), int(rrn)])
+    finally:
+        wb.close()
+
+
+def write_statements(statements, outdir, day='2025-06-11'):
+    """Write the frames of ``make_statements`` as upload files; returns ``{source: path}``."""
+    from recon.export import write_sheets
+
+    if not fits_excel(statements):
+        raise ValueError('the bank statements do not fit in one Excel sheet')
+    os.makedirs(outdir, exist_ok=True)
+    paths = {source: os.path.join(outdir, name) for source, name in FILES.items()}
+    write_sheets({'Sheet1': statements['kcb']}, paths['kcb'])
+    write_sheets({'Sheet1': statements['equity']}, paths['equity'])
+    write_sheets({'Sheet1': statements['key']}, paths['key'])
+    _write_coop(paths['coop'], statements['coop'], day)
+    statements['aspire'].to_csv(paths['aspire'], index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000, help='Aspire card sales')
+    parser.add_argument('--out', required=True, help='directory for the statement files')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stores', type=int, default=60)
+    parser.add_argument('--match-rate', type=float, default=0.95)
+    parser.add_argument('--rrn-rate', type=float, default=0.85)
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--rounding-rate', type=float, default=0.05)
+    parser.add_argument('--day', default=datetime.date(2025, 6, 11).isoformat())
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    statements = make_statements(args.rows, seed=args.seed, stores=args.stores,
+                                 match_rate=args.match_rate, rrn_rate=args.rrn_rate,
+                                 duplicate_rate=args.duplicate_rate,
+                                 rounding_rate=args.rounding_rate, day=args.day)
+    paths = write_statements(statements, args.out, day=args.day)
+    for source, path in paths.items():
+        print(f'{source:<8}{len(statements[source]):>10,} rows  {path}')
+    print(f'generated in {time.perf_counter() - start:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Card transaction reconciliation helpers shared by app.py and the notebook."""
@@ -0,0 +1,56 @@
+"""Money as integer cents.
+
+The engine converts every amount it reconciles to cents once, when a
+statement enters the pipeline, so sums are exact and match keys are plain
+integers. Cents are held as pandas' nullable ``Int64`` (a blank amount stays
+missing rather than becoming 0) and turned back into decimal shillings only
+for reports and display.
+"""
+import numpy as np
+import pandas as pd
+
+CENTS_DTYPE = 'Int64'
+
+# Columns of the engine's frames that hold cents
+MONEY_COLUMNS = [
+    # merged_cards
+    'Purchase', 'Commission', 'Settlement_Amount', 'Cash_Back',
+    # aspire
+    'AMOUNT', 'rrn_check', 'val_check',
+    # amount match
+    'Amount_diff',
+    # card_summary
+    'Aspire_Zed', 'kcb_paid', 'equity_paid', 'Gross_Banking', 'Variance',
+    'kcb_recs', 'Equity_recs', 'Asp_Recs', 'Net_variance',
+]
+
+
+def to_cents(values):
+    """Decimal amounts (numbers or numeric text) as ``Int64`` cents; junk becomes missing."""
+    amounts = pd.to_numeric(pd.Series(values), errors='coerce').astype('float64')
+    amounts = amounts.where(np.isfinite(amounts))
+    # Round half away from zero; the scaled value is first rounded to 6 places so
+    # float noise (1.005 * 100 == 100.49999999999999) does not move a 0.005 step
+    scaled = np.round(np.abs(amounts) * 100, 6)
+    cents = np.sign(amounts) * np.floor(scaled + 0.5)
+    return cents.astype(CENTS_DTYPE)
+
+
+def decimals(cents):
+    """Cents (a scalar or ``Int64`` values) as float shillings, missing as NaN."""
+    if np.ndim(cents) == 0:
+        return np.nan if pd.isna(cents) else cents / 100
+    return pd.Series(cents).astype('float64') / 100
+
+
+def from_cents(df, columns=None):
+    """Copy of ``df`` with its money columns converted back to shillings."""
+    columns = MONEY_COLUMNS if columns is None else columns
+    present = [col for col in columns if col in df.columns]
+    if not present:
+        return df
+    df = df.copy()
+    for col in present:
+        df[col] = df[col].astype('float64') / 100
+    return df
+
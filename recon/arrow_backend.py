@@ -0,0 +1,703 @@
+"""Reconciliation on Arrow tables with pyarrow.compute kernels.
+
+The in-memory engine cleans and keys the statements with pandas string
+methods on object columns: every strip, regex replace and concatenation
+builds one Python string per value while holding the GIL. This backend
+keeps the statements as Arrow tables, text as ``string`` or ``dictionary``
+columns, and runs the same stages as ``pyarrow.compute`` kernels over the
+Arrow buffers, which release the GIL:
+
+- cleaning: header strip, numeric coercion, keep-first de-duplication as a
+  group-by on the subset;
+- keys: masked card numbers and card_check, RRNs, branch names and cents,
+  text cleaned once per dictionary value;
+- the RRN match as a group-by of the bank rows and a hash lookup;
+- the exact passes of the amount cascade as a hash join on (keys, rank);
+- the card_summary sums as one group-by.
+
+Branch resolution (``BranchResolver``) and the card token hash still run in
+Python, once per distinct value as in the engine. The nearest-value passes
+keep the cascade's ``nearest_matches`` sweep, on the keys built here. Excel
+statements are parsed as in the engine (``engine.load_statements``) and
+converted; the Aspire CSV is read by pyarrow straight into a table.
+
+The result is an ``engine.Reconciliation`` of the engine's frames, so the
+report, carry-forward and app code are shared.
+``engine.reconcile_files(backend='arrow')`` runs it.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from recon import engine
+from recon.amounts import MONEY_COLUMNS
+from recon.aspire_stream import _header, _open
+from recon.branches import BranchResolver
+from recon.cards import card_tokens
+from recon.cascade import MatchPass, timestamp_key
+from recon.diagnostics import stage
+from recon.matching import FALSE, MatchResult, consume_matches
+
+# Numeric text pandas' to_numeric reads (a leading '+' is dropped first)
+NUMBER = r'^-?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+# Up to 18 digits always fits in int64 (see recon.rrn)
+RRN_DIGITS = r'^\d{1,18}$'
+
+# Date-time text parsed by Arrow for the time key; other spellings go through pandas
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Engine columns held as nullable Int64: cents and RRNs
+INT64_COLUMNS = MONEY_COLUMNS + ['REF_NO']
+INT64_TYPES = {pa.int64(): pd.Int64Dtype()}.get
+
+
+# ------------------ Conversion ------------------
+
+def to_arrow(df):
+    """``df`` as an Arrow table; object columns mixing text and numbers become text."""
+    columns = {}
+    for name in df.columns:
+        column = df[name]
+        try:
+            columns[str(name)] = pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[str(name)] = pa.array(column.astype(str).where(column.notna()),
+                                          type=pa.string(), from_pandas=True)
+    return pa.table(columns)
+
+
+def _frame(table):
+    # Engine frame: cents and RRNs as Int64, dictionaries as Categoricals
+    df = table.to_pandas()
+    for col in INT64_COLUMNS:
+        if col in df.columns and pa.types.is_integer(table[col].type):
+            df[col] = table[col].to_pandas(types_mapper=INT64_TYPES).array
+    return df
+
+
+def _array(values):
+    return values.combine_chunks() if isinstance(values, pa.ChunkedArray) else values
+
+
+def _value_type(values):
+    kind = values.type
+    return kind.value_type if pa.types.is_dictionary(kind) else kind
+
+
+def _text(values):
+    """``values`` as plain strings (dictionaries decoded, numbers printed)."""
+    if pa.types.is_string(values.type):
+        return values
+    return pc.cast(values, pa.string())
+
+
+def _dictionary(values):
+    # One dictionary-encoded array, so text is cleaned once per distinct value
+    if not pa.types.is_dictionary(values.type):
+        values = pc.dictionary_encode(values)
+    return _array(values)
+
+
+def _set(table, name, values):
+    return table.set_column(table.schema.get_field_index(name), name, values)
+
+
+def _null(kind):
+    return pa.scalar(None, type=kind)
+
+
+# ------------------ Normalize ------------------
+
+def to_numeric(values):
+    """Numbers of ``values``, as ``pd.to_numeric(errors='coerce')`` reads them."""
+    kind = _value_type(values)
+    if pa.types.is_integer(kind) or pa.types.is_floating(kind):
+        return pc.cast(values, kind)
+    text = pc.replace_substring_regex(pc.utf8_trim_whitespace(_text(values)), r'^\+', '')
+    number = pc.if_else(pc.match_substring_regex(text, NUMBER), text, _null(pa.string()))
+    return pc.cast(number, pa.float64())
+
+
+def to_cents(values):
+    """``amounts.to_cents`` on Arrow: int64 cents rounded half away from zero."""
+    amounts = pc.cast(to_numeric(values), pa.float64())
+    amounts = pc.if_else(pc.is_finite(amounts), amounts, _null(pa.float64()))
+    scaled = pc.round(pc.multiply(pc.abs(amounts), 100.0), 6)
+    cents = pc.multiply(pc.sign(amounts), pc.floor(pc.add(scaled, 0.5)))
+    return pc.cast(cents, pa.int64())
+
+
+def _groupable(values):
+    # Group-by keys: dictionaries decoded (chunks may differ), all-null columns as text
+    if pa.types.is_dictionary(values.type):
+        return pc.cast(values, values.type.value_type)
+    if pa.types.is_null(values.type):
+        return pc.cast(values, pa.string())
+    return values
+
+
+def drop_duplicates(table, subset):
+    """Rows of ``table`` whose ``subset`` was not seen on an earlier row, in order."""
+    keys = pa.table({f'k{i}': _groupable(table[name]) for i, name in enumerate(subset)})
+    keys = keys.append_column('_row', pa.array(np.arange(len(table), dtype=np.int64)))
+    first = keys.group_by(keys.column_names[:-1], use_threads=False).aggregate(
+        [('_row', 'min')])['_row_min']
+    return table.take(pc.take(first, pc.sort_indices(first)))
+
+
+def _pandas_order(values):
+    # DataFrame.sort_values(na_position='first'): numpy's (unstable) quicksort
+    # of the present values after the missing ones. Arrow's sort is stable, so
+    # equal values would keep other rows in the keep-first de-duplication.
+    missing = pc.is_null(values).to_numpy(zero_copy_only=False)
+    present = np.flatnonzero(~missing)
+    array = values.to_numpy(zero_copy_only=False)[present]
+    return np.concatenate([np.flatnonzero(missing), present[np.argsort(array, kind='quicksort')]])
+
+
+def _strip_names(table):
+    return table.rename_columns([name.strip() for name in table.column_names])
+
+
+def _with_source(table, bank):
+    indices = pa.array(np.full(len(table), engine.BANKS.index(bank), dtype=np.int8))
+    source = pa.DictionaryArray.from_arrays(indices, pa.array(engine.BANKS))
+    if 'Source' in table.column_names:
+        return _set(table, 'Source', source)
+    return table.append_column('Source', source)
+
+
+def clean_kcb(table):
+    table = _strip_names(table)
+    table = _set(table, 'Amount', to_numeric(table['Amount']))
+    return _with_source(drop_duplicates(table, ['RRN', 'Amount']), 'KCB')
+
+
+def clean_equity(table):
+    table = _strip_names(table)
+    table = _set(table, 'Commission', to_numeric(table['Commission']))
+    table = table.take(_pandas_order(table['Commission']))
+    return _with_source(drop_duplicates(table, ['R_R_N']), 'Equity')
+
+
+def clean_coop(table):
+    table = _strip_names(table)
+    table = _set(table, 'BANK COMM', to_numeric(table['BANK COMM']))
+    table = table.take(_pandas_order(table['BANK COMM']))
+    table = _with_source(drop_duplicates(table, ['RRN CODE']), 'Co-op')
+    return table.filter(pc.is_valid(table['TRANSACTION DATE']))
+
+
+def clean_aspire(table):
+    return _with_source(_strip_names(table), 'Aspire')
+
+
+# Same steps as engine.CLEANERS
+CLEANERS = {
+    'KCB': clean_kcb,
+    'Equity': clean_equity,
+    'Co-op': clean_coop,
+    'Aspire': clean_aspire,
+}
+
+
+def _is_blank(values):
+    # Missing or whitespace-only, as categories.is_blank
+    kind = _value_type(values)
+    if not (pa.types.is_string(kind) or pa.types.is_large_string(kind)):
+        return pc.is_null(values)
+    return pc.fill_null(pc.equal(pc.utf8_trim_whitespace(_text(values)), ''), True)
+
+
+def _concat(tables):
+    # A column typed differently per statement is joined as numbers when it
+    # is numeric in every one, else as text (pandas would keep it as objects)
+    for name in tables[0].column_names:
+        kinds = {table[name].type for table in tables} - {pa.null()}
+        if len(kinds) > 1:
+            values = {_value_type(table[name]) for table in tables} - {pa.null()}
+            if all(pa.types.is_integer(kind) for kind in values):
+                target = pa.int64()
+            elif all(pa.types.is_integer(kind) or pa.types.is_floating(kind) for kind in values):
+                target = pa.float64()
+            else:
+                target = pa.string()
+        elif kinds:
+            target = kinds.pop()
+        else:
+            continue
+        tables = [_set(table, name, pc.cast(table[name], target)) for table in tables]
+    return pa.concat_tables(tables)
+
+
+def _bank_table(table, renames):
+    table = table.rename_columns([renames.get(name, name) for name in table.column_names])
+    return pa.table({col: table[col] if col in table.column_names else pa.nulls(len(table))
+                     for col in engine.BANK_COLUMNS})
+
+
+def normalize_cards(values, token_key=None):
+    """``cards.normalize_cards`` on Arrow, each distinct value cleaned once.
+
+    Returns ``(Card_Number, card_check, card_token)`` arrays.
+    """
+    encoded = _dictionary(values)
+    uniques = _text(encoded.dictionary)
+    digits = pc.replace_substring_regex(uniques, r'\D', '')
+
+    # Mask the middle digits when the number is long enough
+    masked = pc.if_else(
+        pc.less(pc.utf8_length(digits), 12), uniques,
+        pc.binary_join_element_wise(pc.utf8_slice_codeunits(digits, 0, 6), '******',
+                                    pc.utf8_slice_codeunits(digits, -4), ''))
+
+    # First 4 + last 4 characters, blank when fewer than 8 digits survive
+    stripped = pc.utf8_trim_whitespace(masked)
+    visible = pc.replace_substring(pc.replace_substring(stripped, ' ', ''), '*', '')
+    card_check = pc.if_else(
+        pc.greater_equal(pc.utf8_length(visible), 8),
+        pc.binary_join_element_wise(pc.utf8_slice_codeunits(stripped, 0, 4),
+                                    pc.utf8_slice_codeunits(stripped, -4), ''),
+        '')
+    tokens = pa.array(card_tokens(card_check.to_numpy(zero_copy_only=False), token_key))
+
+    indices = encoded.indices
+    return (pc.take(masked, indices), pc.fill_null(pc.take(card_check, indices), ''),
+            pc.fill_null(pc.take(tokens, indices), 0))
+
+
+def resolve_branches(stores, resolver):
+    """Branch of every store, resolved once per distinct stripped name."""
+    encoded = _dictionary(stores)
+    names = pc.utf8_trim_whitespace(_text(encoded.dictionary)).to_pylist()
+    # Missing stores resolve as the text 'nan', as in the engine
+    branches = pa.array(list(resolver.resolve(pd.Series(names + ['nan'], dtype=object))))
+    indices = pc.fill_null(encoded.indices, len(names))
+    return pc.dictionary_encode(pc.take(branches, indices))
+
+
+def build_merged_cards(tables, key=None, diagnostics=None):
+    """KCB and Equity rows in the common schema with card_check and branch."""
+    frames = []
+    if len(tables['KCB']):
+        kcb = _bank_table(tables['KCB'], engine.KCB_RENAMES)
+        purchase = kcb['Purchase']
+        refund = pc.fill_null(pc.less(purchase, 0), False)
+        kcb = _set(kcb, 'Cash_Back',
+                   pc.abs(pc.if_else(refund, purchase, pa.scalar(0).cast(purchase.type))))
+        frames.append(kcb)
+    if len(tables['Equity']):
+        equity = tables['Equity']
+        frames.append(_bank_table(equity, {
+            old: new for old, new in engine.EQUITY_RENAMES.items()
+            if new not in equity.column_names
+        }))
+    if not frames:
+        return pa.table({col: pa.array([], pa.null()) for col in
+                         engine.BANK_COLUMNS + ['branch', 'card_check', 'card_token']})
+
+    with stage(diagnostics, 'concat', frames) as record:
+        merged = _concat(frames)
+
+        # Drop rows without a card number, then exact duplicates and blank TIDs
+        merged = merged.filter(pc.invert(_is_blank(merged['Card_Number'])))
+        merged = drop_duplicates(merged, engine.BANK_COLUMNS)
+        merged = merged.filter(pc.invert(_is_blank(merged['TID'])))
+        for col in ['TID', 'store']:
+            merged = _set(merged, col, pc.dictionary_encode(_groupable(merged[col])))
+
+        # Amounts are integer cents from here on (see recon.amounts)
+        for col in ['Purchase', 'Commission', 'Settlement_Amount', 'Cash_Back']:
+            merged = _set(merged, col, to_cents(merged[col]))
+        record.out(merged)
+
+    with stage(diagnostics, 'normalize_cards', merged) as record:
+        masked, card_check, tokens = normalize_cards(merged['Card_Number'])
+        merged = _set(merged, 'Card_Number', masked)
+        merged = merged.append_column('card_check', card_check)
+        merged = record.out(merged.append_column('card_token', tokens))
+
+    with stage(diagnostics, 'resolve_branches', merged) as record:
+        if key is not None and not key.empty:
+            resolver = BranchResolver.from_key(key)
+        else:
+            resolver = BranchResolver({})
+        merged = record.out(merged.append_column(
+            'branch', resolve_branches(merged['store'], resolver)))
+    return merged
+
+
+def prepare_aspire(aspire):
+    """Aspire rows reduced to the reconciliation columns, with card_check.
+
+    ``card_token`` is kept as a last column for the card key; it is not part
+    of the engine's aspire frame.
+    """
+    _, card_check, tokens = normalize_cards(aspire['CARD_NUMBER'])
+    aspire = aspire.append_column('card_check', card_check)
+    aspire = aspire.select([col for col in engine.ASPIRE_COLUMNS if col in aspire.column_names])
+    aspire = _set(aspire, 'AMOUNT', to_cents(aspire['AMOUNT']))
+    for col in ['STORE_NAME', 'ZED_DATE', 'TILL', 'CUSTOMER_NAME', 'CARD_TYPE']:
+        if col in aspire.column_names and not pa.types.is_dictionary(aspire[col].type):
+            aspire = _set(aspire, col, pc.dictionary_encode(aspire[col]))
+    return aspire.append_column('card_token', tokens)
+
+
+# ------------------ RRN match ------------------
+
+def _whole(values):
+    # Finite whole floats within int64 range; inf fails the range test, NaN the equality
+    values = pc.cast(values, pa.float64())
+    whole = pc.and_(pc.equal(values, pc.floor(values)), pc.less(pc.abs(values), 2.0 ** 63))
+    return pc.cast(pc.if_else(whole, values, _null(pa.float64())), pa.int64())
+
+
+def _parse_rrn_text(values):
+    try:
+        # Clean text columns parse in one cast; anything odd takes the regex path
+        return pc.cast(values, pa.int64())
+    except pa.ArrowInvalid:
+        pass
+    text = pc.replace_substring_regex(pc.utf8_trim_whitespace(_text(values)), r'^\+', '')
+    digits = pc.match_substring_regex(text, RRN_DIGITS)
+    rrns = pc.cast(pc.if_else(digits, text, _null(pa.string())), pa.int64())
+    # '1.23456789012E+11', '123456789012.0' and the like go through float
+    number = pc.and_(pc.invert(digits), pc.match_substring_regex(text, NUMBER))
+    parsed = pc.cast(pc.if_else(number, text, _null(pa.string())), pa.float64())
+    return pc.coalesce(rrns, _whole(parsed))
+
+
+def normalize_rrns(values):
+    """``rrn.normalize_rrns`` on Arrow: int64 RRNs, missing unless a positive whole number."""
+    kind = _value_type(values)
+    if pa.types.is_integer(kind):
+        rrns = pc.cast(values, pa.int64())
+    elif pa.types.is_floating(kind):
+        rrns = _whole(values)
+    else:
+        rrns = _parse_rrn_text(_text(values))
+    return pc.if_else(pc.greater(rrns, 0), rrns, _null(pa.int64()))
+
+
+def index_bank_rrns(merged):
+    """Add the normalized ``REF_NO`` to merged and total its Purchase per RRN.
+
+    Returns ``(merged, totals)``; ``totals`` has ``REF_NO``, ``rrn_check``
+    (Purchase total) and ``rrn_rows`` (bank rows) per RRN.
+    """
+    merged = merged.append_column('REF_NO', normalize_rrns(merged['R_R_N']))
+    bank = pa.table({
+        'REF_NO': merged['REF_NO'],
+        'rrn_check': pc.fill_null(merged['Purchase'], 0),
+        'rrn_rows': pa.array(np.ones(len(merged), dtype=np.int64)),
+    }).filter(pc.is_valid(merged['REF_NO']))
+    totals = bank.group_by('REF_NO').aggregate([('rrn_check', 'sum'), ('rrn_rows', 'sum')])
+    return merged, totals.rename_columns(['REF_NO', 'rrn_check', 'rrn_rows'])
+
+
+def probe_rrns(aspire, totals, bank_rrns):
+    """Look up each Aspire REF_NO in the bank ``totals`` through a hash table.
+
+    Adds ``rrn_rows``, ``rrn_check`` (0 where the RRN is not in the bank) and
+    ``val_check``. Returns ``(aspire, bank_seen)``, ``bank_seen`` flagging
+    the bank RRNs that appeared in Aspire.
+    """
+    rrns = normalize_rrns(aspire['REF_NO'])
+    aspire = _set(aspire, 'REF_NO', rrns)
+    # Position of each RRN in totals, in Aspire row order
+    hit = pc.index_in(rrns, value_set=_array(totals['REF_NO']))
+    aspire = aspire.append_column('rrn_rows', pc.fill_null(pc.take(totals['rrn_rows'], hit), 0))
+    aspire = aspire.append_column('rrn_check',
+                                  pc.fill_null(pc.take(totals['rrn_check'], hit), 0))
+    aspire = aspire.append_column('val_check',
+                                  pc.subtract(aspire['AMOUNT'], aspire['rrn_check']))
+    bank_seen = pc.fill_null(pc.is_in(bank_rrns, value_set=_array(pc.unique(rrns.drop_null()))),
+                             False)
+    return aspire, bank_seen
+
+
+def rrn_duplicated(bank_rrns, totals):
+    """Bank rows that share their RRN with another bank row."""
+    shared = totals.filter(pc.greater(totals['rrn_rows'], 1))['REF_NO']
+    return pc.fill_null(pc.is_in(bank_rrns, value_set=_array(shared)), False)
+
+
+# ------------------ Amount match ------------------
+
+def _name_key(names, collapse_spaces=False):
+    # Stripped, upper-cased text, cleaned once per dictionary value
+    encoded = _dictionary(names)
+    cleaned = pc.utf8_trim_whitespace(_text(encoded.dictionary))
+    if collapse_spaces:
+        cleaned = pc.replace_substring_regex(cleaned, r'\s+', '')
+    return pc.take(pc.utf8_upper(cleaned), encoded.indices)
+
+
+def _shared_codes(left, right):
+    # Integer codes of two text columns on one dictionary, so passes join on integers
+    encoded = _array(pc.dictionary_encode(pa.chunked_array([_array(left), _array(right)])))
+    codes = pc.cast(encoded.indices, pa.int64())
+    return codes.slice(0, len(left)), codes.slice(len(left))
+
+
+def _card_key(tokens):
+    # Blank card_checks hash to token 0 and never match
+    return pc.if_else(pc.equal(tokens, 0), _null(pa.int64()), tokens)
+
+
+def _shillings(cents, rounded=False):
+    # Whole shillings, truncated or rounded half to even as engine._shillings
+    shillings = pc.divide(pc.cast(cents, pa.float64()), 100.0)
+    shillings = (pc.round(shillings, round_mode='half_to_even') if rounded
+                 else pc.trunc(shillings))
+    return pc.cast(shillings, pa.int64())
+
+
+def _time_key(values):
+    # Int64 nanoseconds, naive in local time, as cascade.timestamp_key
+    if pa.types.is_timestamp(values.type):
+        if values.type.tz is not None:
+            values = pc.local_timestamp(values)
+        return pc.cast(pc.cast(values, pa.timestamp('ns')), pa.int64())
+    text = _text(values)
+    parsed = pc.strptime(text, format=TIME_FORMAT, unit='ns', error_is_null=True)
+    if parsed.null_count == text.null_count:
+        return pc.cast(parsed, pa.int64())
+    return pa.array(timestamp_key(text.to_pandas()), type=pa.int64())
+
+
+def match_keys(aspire, merged, names):
+    """``{key name: (aspire key, bank key)}`` over every row of each side.
+
+    Text keys come as integer codes on one dictionary per key; missing
+    values never match. The names are those of ``engine.ASPIRE_KEYS``.
+    """
+    builders = {
+        'branch': lambda: _shared_codes(_name_key(aspire['STORE_NAME']),
+                                        _name_key(merged['branch'])),
+        'branch_compact': lambda: _shared_codes(_name_key(aspire['STORE_NAME'], True),
+                                                _name_key(merged['branch'], True)),
+        'amount': lambda: (aspire['AMOUNT'], merged['Purchase']),
+        'shillings': lambda: (_shillings(aspire['AMOUNT']), _shillings(merged['Purchase'])),
+        'shillings_rounded': lambda: (_shillings(aspire['AMOUNT'], True),
+                                      _shillings(merged['Purchase'], True)),
+        'card': lambda: (_card_key(aspire['card_token']), _card_key(merged['card_token'])),
+        'time': lambda: (_time_key(aspire['RCT_TRN_DATE']), _time_key(merged['TRANS_DATE'])),
+    }
+    return {name: builders[name]() for name in names}
+
+
+def _ranked(keys, position):
+    # Rows with every key present, their position and the occurrence rank of their key
+    names = list(keys.columns)
+    table = pa.Table.from_pandas(keys, preserve_index=False)
+    table = table.append_column(position, pa.array(np.arange(len(table), dtype=np.int64)))
+    table = table.drop_null().sort_by([(name, 'ascending') for name in names + [position]])
+    table = table.combine_chunks()
+    rows = pa.array(np.arange(len(table), dtype=np.int64))
+    if not len(table):
+        return table.append_column('_rank', rows)
+    changed = None
+    for name in names:
+        column = table[name]
+        step = pc.not_equal(column.slice(1), column.slice(0, len(table) - 1))
+        changed = step if changed is None else pc.or_(changed, step)
+    starts = pa.concat_arrays([pa.array([True]), _array(changed)])
+    first = pc.cumulative_max(pc.if_else(starts, rows, 0))
+    return table.append_column('_rank', pc.subtract(rows, first))
+
+
+def join_matches(left_keys, right_keys):
+    """``matching.consume_matches`` as an Arrow hash join on (keys, rank).
+
+    The k-th left row with a key pairs with the k-th right row with the
+    same key, both in row order, which is what the engine's pass does.
+    """
+    left, right = _ranked(left_keys, 'left'), _ranked(right_keys, 'right')
+    on = list(left_keys.columns) + ['_rank']
+    pairs = left.join(right, on, join_type='inner').sort_by('left')
+    return MatchResult(pd.DataFrame({'left': pairs['left'].to_numpy(),
+                                     'right': pairs['right'].to_numpy()}),
+                       len(left_keys), len(right_keys))
+
+
+def amount_passes(tolerance=engine.AMOUNT_TOLERANCE, card_window=engine.CARD_WINDOW,
+                  matching='cascade'):
+    """``engine.amount_passes`` with the exact passes run by ``join_matches``."""
+    return [MatchPass(match_pass.name, match_pass.keys, join_matches)
+            if match_pass.match is consume_matches else match_pass
+            for match_pass in engine.amount_passes(tolerance, card_window, matching)]
+
+
+def _builders(keys, side):
+    # Key builders of one side reading the precomputed keys at the frame's rows
+    # (the engine's frames keep their row positions as index)
+    def builder(values):
+        values = pd.Series(values.to_pandas(types_mapper=INT64_TYPES))
+        return lambda df: values.take(df.index.to_numpy())
+    return {name: builder(pair[side]) for name, pair in keys.items()}
+
+
+# ------------------ card_summary ------------------
+
+def _sum_by(table, keys, column):
+    # Sum per group, 0 for a group of missing values as pandas does
+    valid = pc.is_valid(table[keys[0]])
+    for key in keys[1:]:
+        valid = pc.and_(valid, pc.is_valid(table[key]))
+    return table.filter(valid).group_by(keys).aggregate(
+        [(column, 'sum', pc.ScalarAggregateOptions(min_count=0))])
+
+
+def _measures(sources, names):
+    # Per-row measure from the Source dictionary (None where the bank has none)
+    source = _array(sources)
+    measures = pa.array([names.get(bank) for bank in source.dictionary.to_pylist()],
+                        type=pa.string())
+    return pc.take(measures, source.indices)
+
+
+def build_card_summary(aspire, merged, aspire_false, bank_false):
+    """Per-store Aspire vs bank totals, as ``engine.build_card_summary``, from one group-by.
+
+    ``aspire_false`` and ``bank_false`` flag the rows the amount match left
+    unpaired.
+    """
+    zed = _sum_by(pa.table({'STORE_NAME': _text(aspire['STORE_NAME']),
+                            'amount': aspire['AMOUNT']}), ['STORE_NAME'], 'amount')
+    stores = zed['STORE_NAME']
+    bank_false, aspire_false = pa.array(bank_false), pa.array(aspire_false)
+    branches = _text(merged['branch'])
+
+    def rows(store, measure, amount):
+        if isinstance(measure, str):
+            measure = pa.repeat(measure, len(store))
+        return pa.table({'STORE_NAME': store, 'measure': measure,
+                         'amount': pc.cast(amount, pa.int64())})
+
+    long = pa.concat_tables([
+        rows(stores, 'Aspire_Zed', zed['amount_sum']),
+        rows(branches, _measures(merged['Source'], engine.PAID_MEASURES), merged['Purchase']),
+        rows(branches.filter(bank_false),
+             _measures(merged['Source'], engine.RECS_MEASURES).filter(bank_false),
+             merged['Purchase'].filter(bank_false)),
+        rows(_text(aspire['STORE_NAME']).filter(aspire_false), 'Asp_Recs',
+             aspire['AMOUNT'].filter(aspire_false)),
+    ])
+    sums = _sum_by(long, ['STORE_NAME', 'measure'], 'amount').to_pandas()
+    sums = sums.set_index(['STORE_NAME', 'measure'])['amount_sum'].astype('Int64')
+    return engine.card_summary_from_sums(stores.to_pylist(), sums)
+
+
+# ------------------ Run ------------------
+
+def read_aspire(source):
+    """The Aspire CSV as an Arrow table, repeated text dictionary-encoded.
+
+    Columns are typed as ``pd.read_csv`` types them: REF_NO is read as text
+    so RRNs never pass through float (``engine.ASPIRE_CSV_OPTIONS``) and
+    dates stay text.
+    """
+    fh = _open(source)
+    try:
+        raw_names = {name.strip(): name for name in _header(fh)}
+        column_types = {raw_names['REF_NO']: pa.string()} if 'REF_NO' in raw_names else {}
+        table = pa_csv.read_csv(fh, convert_options=pa_csv.ConvertOptions(
+            column_types=column_types, strings_can_be_null=True, auto_dict_encode=True))
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            fh.close()
+    for name in table.column_names:
+        if pa.types.is_temporal(table[name].type):
+            table = _set(table, name, pc.cast(table[name], pa.string()))
+    # One dictionary per column rather than per CSV block
+    return table.unify_dictionaries()
+
+
+def load_tables(kcb=None, equity=None, coop=None, aspire=None, key=None, cache=None,
+                project=False, diagnostics=None, executor=None):
+    """Read and clean the given statements as Arrow tables.
+
+    Returns ``(tables, key)`` with a table, possibly empty, for every bank in
+    ``engine.BANKS``. Excel statements are read by ``engine.load_statements``
+    (``cache``, ``project`` and ``executor`` as there) and converted.
+    """
+    dfs, key_df = engine.load_statements(kcb, equity, coop, None, key, cache=cache,
+                                         project=project, diagnostics=diagnostics,
+                                         executor=executor)
+    tables = {bank: to_arrow(df) for bank, df in dfs.items() if bank != 'Aspire'}
+    tables['Aspire'] = pa.table({})
+    if aspire is not None:
+        with stage(diagnostics, 'read Aspire') as record:
+            tables['Aspire'] = record.out(read_aspire(aspire))
+    for bank, table in tables.items():
+        if len(table):
+            with stage(diagnostics, f'clean {bank}', table) as record:
+                tables[bank] = record.out(CLEANERS[bank](table))
+    return {bank: tables[bank] for bank in engine.BANKS}, key_df
+
+
+def reconcile(tables, key=None, amount_tolerance=engine.AMOUNT_TOLERANCE,
+              card_window=engine.CARD_WINDOW, diagnostics=None, matching='cascade'):
+    """Run every stage on cleaned statement tables and return an ``engine.Reconciliation``.
+
+    The stages and their names are those of ``engine.reconcile``; the
+    frames of the result are converted from the tables at the end.
+    """
+    with stage(diagnostics, 'build_merged_cards', [tables['KCB'], tables['Equity']]) as record:
+        merged = record.out(build_merged_cards(tables, key, diagnostics))
+    dfs = {bank: table.to_pandas() for bank, table in tables.items()}
+    if not len(tables['Aspire']) or not len(merged):
+        return engine.Reconciliation(dfs, key, _frame(merged))
+
+    with stage(diagnostics, 'index_bank_rrns', merged) as record:
+        merged, totals = index_bank_rrns(merged)
+        record.out(len(totals))
+    with stage(diagnostics, 'prepare_aspire', tables['Aspire']) as record:
+        aspire = record.out(prepare_aspire(tables['Aspire']))
+    with stage(diagnostics, 'probe_rrns', aspire) as record:
+        aspire, bank_seen = probe_rrns(aspire, totals, merged['REF_NO'])
+        record.out(pc.sum(pc.less_equal(aspire['rrn_check'], 0)).as_py())
+    merged = merged.append_column('Cheked_rows', pc.if_else(bank_seen, 'Yes', 'No'))
+    duplicates = merged.filter(rrn_duplicated(merged['REF_NO'], totals))
+
+    aspire_df = _frame(aspire.drop_columns(['card_token']))
+    merged_df = _frame(merged)
+    with stage(diagnostics, 'match_amounts', [aspire_df, merged_df]) as record:
+        passes = amount_passes(amount_tolerance, card_window, matching)
+        keys = match_keys(aspire, merged, {name for match_pass in passes
+                                           for name in match_pass.keys})
+        newaspire, newmerged_cards, match_stats = engine.match_amounts(
+            aspire_df, merged_df, passes=passes,
+            aspire_keys=_builders(keys, 0), bank_keys=_builders(keys, 1))
+        record.out([newaspire, newmerged_cards])
+
+    with stage(diagnostics, 'card_summary', merged) as record:
+        aspire_false = np.zeros(len(aspire), dtype=bool)
+        aspire_false[newaspire.index[newaspire['Amount_check'] == FALSE]] = True
+        bank_false = np.zeros(len(merged), dtype=bool)
+        bank_false[newmerged_cards.index[newmerged_cards['Amount_check'] == FALSE]] = True
+        card_summary = record.out(build_card_summary(aspire, merged, aspire_false, bank_false))
+    return engine.Reconciliation(dfs, key, merged_df, aspire_df, newaspire, newmerged_cards,
+                                 card_summary, _frame(duplicates), match_stats)
+
+
+def reconcile_files(kcb=None, equity=None, coop=None, aspire=None, key=None, cache=None,
+                    project=False, amount_tolerance=engine.AMOUNT_TOLERANCE,
+                    card_window=engine.CARD_WINDOW, diagnostics=None, executor=None,
+                    matching='cascade'):
+    """Load the given statement files as Arrow tables and reconcile them.
+
+    Takes the options of ``engine.reconcile_files``; returns an
+    ``engine.Reconciliation``.
+    """
+    with stage(diagnostics, 'load_statements') as record:
+        tables, key_df = load_tables(kcb, equity, coop, aspire, key, cache=cache,
+                                     project=project, diagnostics=diagnostics, executor=executor)
+        record.out(tables)
+    return reconcile(tables, key_df, amount_tolerance, card_window, diagnostics, matching)
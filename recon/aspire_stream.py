@@ -0,0 +1,127 @@
+"""Chunked ingestion of the Aspire ZEDS_CARDS_TILLWISE CSV.
+
+The Aspire export is by far the largest input, yet only the reconciliation
+columns are used. ``stream_aspire`` reads it with pyarrow's streaming CSV
+reader, projecting those columns with explicit string types (REF_NO never
+passes through float). It probes each chunk against the bank RRN lookup and
+keeps only per-store totals and the rows left open by the RRN match, so peak
+memory follows the chunk size rather than the file size.
+"""
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from recon.amounts import CENTS_DTYPE
+from recon.engine import ASPIRE_COLUMNS, prepare_aspire, probe_rrns
+
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+# Everything is read as text and converted by prepare_aspire, as in the
+# in-memory path; dates stay text too, as pd.read_csv leaves them
+STRING_COLUMNS = ['STORE_CODE', 'STORE_NAME', 'ZED_DATE', 'TILL', 'SESSION', 'RCT',
+                  'CUSTOMER_NAME', 'CARD_TYPE', 'CARD_NUMBER', 'AMOUNT', 'REF_NO',
+                  'RCT_TRN_DATE']
+
+
+class AspireStream:
+    """Per-store totals and RRN residuals accumulated over all chunks."""
+
+    def __init__(self):
+        self.zed = pd.Series(dtype=CENTS_DTYPE, name='AMOUNT')
+        self.residual_chunks = []
+        self.kept_chunks = []
+        self.bank_seen = None
+        self.rows = 0
+        self.rrn_matched = 0
+        self.chunks = 0
+
+    @property
+    def residuals(self):
+        """Aspire rows with no RRN hit (``rrn_check <= 0``)."""
+        return _concat(self.residual_chunks)
+
+    @property
+    def aspire(self):
+        """All prepared rows when the stream was run with ``keep_rows=True``."""
+        return _concat(self.kept_chunks) if self.kept_chunks else None
+
+
+def _concat(chunks):
+    if not chunks:
+        return pd.DataFrame(columns=ASPIRE_COLUMNS + ['rrn_rows', 'rrn_check', 'val_check'])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _open(source):
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def _header(fh):
+    pos = fh.tell()
+    first_line = fh.readline().decode('utf-8-sig')
+    fh.seek(pos)
+    return next(csv.reader([first_line]))
+
+
+def iter_aspire_chunks(source, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Yield the reconciliation columns of the Aspire CSV as pandas chunks."""
+    fh = _open(source)
+    try:
+        header = _header(fh)
+        # Map the stripped names the engine uses onto the raw header names
+        raw_names = {name.strip(): name for name in header}
+        wanted = [raw_names[col] for col in ASPIRE_COLUMNS if col in raw_names]
+        column_types = {raw_names[col]: pa.string() for col in STRING_COLUMNS if col in raw_names}
+
+        reader = pa_csv.open_csv(
+            fh,
+            read_options=pa_csv.ReadOptions(block_size=chunk_bytes),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=wanted,
+                column_types=column_types,
+                strings_can_be_null=True,
+            ),
+        )
+        for batch in reader:
+            chunk = batch.to_pandas()
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            fh.close()
+
+
+def stream_aspire(source, rrn_index, chunk_bytes=DEFAULT_CHUNK_BYTES, keep_rows=False):
+    """Reconcile Aspire chunk by chunk against a prebuilt bank ``RRNIndex``.
+
+    ``rrn_index`` comes from ``engine.index_bank_rrns``. Returns an
+    ``AspireStream``; with ``keep_rows=True`` the prepared rows are kept too
+    (for the report's aspire sheet), which gives up the memory bound.
+    """
+    stream = AspireStream()
+    # Bank rows whose RRN was seen in Aspire so far
+    stream.bank_seen = np.zeros(rrn_index.n_rows, dtype=bool)
+    for chunk in iter_aspire_chunks(source, chunk_bytes):
+        chunk, match = probe_rrns(prepare_aspire(chunk), rrn_index)
+
+        zed = chunk.groupby('STORE_NAME', observed=True)['AMOUNT'].sum()
+        stream.zed = stream.zed.add(zed, fill_value=0)
+        matched = chunk['rrn_check'] > 0
+        stream.rrn_matched += int(matched.sum())
+        stream.bank_seen |= match.bank_seen
+        stream.residual_chunks.append(chunk[~matched])
+        if keep_rows:
+            stream.kept_chunks.append(chunk)
+        stream.rows += len(chunk)
+        stream.chunks += 1
+    return stream
@@ -0,0 +1,361 @@
+"""Multi-day batch reconciliation.
+
+    python -m recon.batch statements/ --workers 16 --output month_end.xlsx
+
+``statements/`` holds one sub-directory per day (its name is the day label,
+e.g. ``2025-06-11``) with that day's KCB, Equity, Co-op and Aspire files.
+Files are recognised by a case-insensitive search of their names (see
+``SOURCE_PATTERNS``):
+
+    kcb      .xlsx/.xls with "kcb"               KCB_11062025.xlsx
+    equity   .xlsx/.xls with "equity"            equity 11.6.2025.xlsx
+    coop     .xlsx/.xls with "coop" or "co-op"   Co-op statement.xlsx
+    aspire   .csv with "aspire" or "zeds"        ZEDS_CARDS_TILLWISE_2025-06-11.csv
+    key      .xlsx/.xls with "key"               card_key.xlsx
+
+A card key found directly in ``statements/`` is shared by every day without
+its own. Statements named after the merchant, as the banks send them
+("QUICK MART 11.6.2025.xlsx"), need a pattern of their own on the command
+line:
+
+    python -m recon.batch statements/ --pattern "kcb=kcb|quick mart" \\
+        --pattern "equity=equity|quickmart"
+
+A day with a statement file that matches no pattern fails rather than
+being reconciled without it.
+
+Each day is reconciled in its own worker process. Only the card_summary and
+exception sheets travel back to the parent, and a day that fails is
+recorded with its traceback instead of stopping the run.
+"""
+import argparse
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from recon.amounts import from_cents
+from recon.engine import AMOUNT_MATCHING, MONEY_FORMAT, SUMMARY_COLUMNS
+
+# Case-insensitive file name patterns per reconcile_files argument
+SOURCE_PATTERNS = {
+    'kcb': r'kcb',
+    'equity': r'equity',
+    'coop': r'co-?op',
+    'aspire': r'aspire|zeds',
+    'key': r'key',
+}
+SOURCE_SUFFIXES = {
+    'kcb': ('.xlsx', '.xls'),
+    'equity': ('.xlsx', '.xls'),
+    'coop': ('.xlsx', '.xls'),
+    'aspire': ('.csv',),
+    'key': ('.xlsx', '.xls'),
+}
+
+# Sources entry for the statement files of a day that match no pattern
+UNRECOGNISED = 'unrecognised'
+
+EXCEPTION_SHEETS = ['Asp_Recs', 'Equity_recs', 'kcb_recs']
+
+REPORT_NUMBER_FORMATS = {
+    'combined_summary': dict.fromkeys(SUMMARY_COLUMNS, MONEY_FORMAT),
+    'daily_summary': dict.fromkeys(SUMMARY_COLUMNS, MONEY_FORMAT),
+}
+
+
+def _concat(frames):
+    """Stack ``frames`` without the empty ones.
+
+    A day with nothing on a sheet gives an empty frame, and pd.concat warns
+    that empty entries will change the result's dtypes. When every frame is
+    empty the first is returned so the sheet keeps its columns.
+    """
+    rows = [df for df in frames if not df.empty]
+    if rows:
+        return pd.concat(rows, ignore_index=True)
+    return frames[0].reset_index(drop=True) if frames else pd.DataFrame()
+
+
+def classify(filename, patterns=None):
+    """Return the source a statement file name belongs to, or ``None``."""
+    patterns = patterns or SOURCE_PATTERNS
+    name = filename.lower()
+    # The key is checked first so 'kcb_card_key.xlsx' is not taken for KCB
+    for source in ['key'] + [s for s in patterns if s != 'key']:
+        if name.endswith(SOURCE_SUFFIXES[source]) and re.search(patterns[source], name, re.I):
+            return source
+    return None
+
+
+def _find_sources(directory, patterns):
+    suffixes = tuple({suffix for source in patterns for suffix in SOURCE_SUFFIXES[source]})
+    sources = {}
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        # Skip hidden files and the '~$' lock files Excel leaves next to open workbooks
+        if filename.startswith(('.', '~$')) or not os.path.isfile(path):
+            continue
+        source = classify(filename, patterns)
+        if source is None:
+            if filename.lower().endswith(suffixes):
+                source = UNRECOGNISED
+            else:
+                continue
+        # Ambiguous sources are kept as a tuple and fail that day only (see run_day)
+        sources[source] = sources[source] + (path,) if source in sources else (path,)
+    return {source: paths[0] if len(paths) == 1 else paths for source, paths in sources.items()}
+
+
+def discover_days(directory, patterns=None):
+    """Map each day sub-directory of ``directory`` to its statement files.
+
+    Returns ``{day: {source: path}}`` in day order, with the shared key
+    filled in where a day has none. Spreadsheets and CSVs that match no
+    pattern are listed under ``UNRECOGNISED`` and fail their day in
+    ``run_day``. ``patterns`` overrides entries of ``SOURCE_PATTERNS``.
+    """
+    patterns = {**SOURCE_PATTERNS, **(patterns or {})}
+    shared_key = _find_sources(directory, {'key': patterns['key']}).get('key')
+    days = {}
+    for day in sorted(os.listdir(directory)):
+        day_dir = os.path.join(directory, day)
+        if not os.path.isdir(day_dir) or day.startswith(('.', '_')):
+            continue
+        sources = _find_sources(day_dir, patterns)
+        if shared_key and 'key' not in sources:
+            sources['key'] = shared_key
+        if sources:
+            days[day] = sources
+    return days
+
+
+class DayResult:
+    """card_summary and exception sheets of one day, or the error that stopped it."""
+
+    def __init__(self, day, card_summary=None, exceptions=None, error=None, seconds=0.0):
+        self.day = day
+        self.card_summary = card_summary
+        self.exceptions = exceptions or {}
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None and self.card_summary is not None
+
+
+def run_day(day, sources, stream_aspire=False, **match_options):
+    """Reconcile one day; exceptions are caught and returned in the result.
+
+    ``match_options`` (``amount_tolerance``, ``card_window``, ``matching``)
+    go to ``engine.reconcile_files``; the engine's defaults apply otherwise.
+    """
+    from recon import engine
+
+    start = time.perf_counter()
+    result = None
+    try:
+        unrecognised = sources.get(UNRECOGNISED)
+        if unrecognised:
+            files = unrecognised if isinstance(unrecognised, tuple) else (unrecognised,)
+            raise ValueError(f'no source pattern matches {", ".join(files)} '
+                             '(see --pattern)')
+        for source, path in sources.items():
+            if isinstance(path, tuple):
+                raise ValueError(f'several files look like {source}: {", ".join(path)}')
+        result = engine.reconcile_files(**sources, stream_aspire=stream_aspire, project=True,
+                                        **match_options)
+        if not result.matched:
+            raise ValueError('nothing to match: needs an Aspire file and at least one '
+                             'KCB/Equity statement')
+        return DayResult(day, result.card_summary, result.exceptions(),
+                         seconds=time.perf_counter() - start)
+    except Exception:
+        return DayResult(day, error=traceback.format_exc(), seconds=time.perf_counter() - start)
+    finally:
+        # A large day runs through SQLite; its temporary database goes with the day
+        if hasattr(result, 'close'):
+            result.close()
+
+
+class BatchResult:
+    """Day results of a batch run plus the combined sheets built from them."""
+
+    def __init__(self, days):
+        self.days = sorted(days, key=lambda d: d.day)
+
+    @property
+    def succeeded(self):
+        return [d for d in self.days if d.ok]
+
+    @property
+    def failed(self):
+        return [d for d in self.days if not d.ok]
+
+    def daily_summary(self):
+        """Every day's card_summary rows stacked, with a ``Day`` column."""
+        frames = [d.card_summary.assign(Day=d.day) for d in self.succeeded]
+        if not frames:
+            return pd.DataFrame(columns=['Day', 'No', 'STORE_NAME'] + SUMMARY_COLUMNS)
+        daily = pd.concat(frames, ignore_index=True)
+        return daily[['Day'] + [c for c in daily.columns if c != 'Day']]
+
+    def combined_summary(self):
+        """card_summary totals per store over all successful days."""
+        daily = self.daily_summary()
+        stores = daily[daily['STORE_NAME'] != 'TOTAL']
+        combined = stores.groupby('STORE_NAME')[SUMMARY_COLUMNS].sum().reset_index()
+        combined.insert(0, 'No', range(1, len(combined) + 1))
+        days_seen = stores.groupby('STORE_NAME')['Day'].nunique()
+        combined.insert(2, 'Days', combined['STORE_NAME'].map(days_seen))
+
+        total_row = {'No': '', 'STORE_NAME': 'TOTAL', 'Days': len(self.succeeded)}
+        total_row.update(combined[SUMMARY_COLUMNS].sum())
+        return pd.concat([combined, pd.DataFrame([total_row])], ignore_index=True)
+
+    def exceptions(self):
+        """Each exception sheet concatenated over days, with a ``Day`` column."""
+        sheets = {}
+        for name in EXCEPTION_SHEETS:
+            frames = [d.exceptions[name].assign(Day=d.day) for d in self.succeeded
+                      if name in d.exceptions]
+            sheets[name] = _concat(frames)
+        return sheets
+
+    def failures(self):
+        return pd.DataFrame({
+            'Day': [d.day for d in self.failed],
+            'Error': [d.error.strip().splitlines()[-1] for d in self.failed],
+            'Traceback': [d.error for d in self.failed],
+        })
+
+    def report_sheets(self):
+        """Batch report sheets, amounts in shillings."""
+        sheets = {'combined_summary': self.combined_summary(),
+                  'daily_summary': self.daily_summary()}
+        sheets.update(self.exceptions())
+        sheets = {name: from_cents(df) for name, df in sheets.items()}
+        if self.failed:
+            sheets['failures'] = self.failures()
+        return sheets
+
+
+def run_batch(days, workers=None, stream_aspire=False, progress=None, **match_options):
+    """Reconcile ``{day: {source: path}}`` (see ``discover_days``) in parallel.
+
+    ``workers`` defaults to the CPU count; ``workers=1`` runs in-process.
+    ``progress(day_result)`` is called as each day finishes; ``match_options``
+    go to every ``run_day``.
+    """
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers == 1 or len(days) <= 1:
+        for day, sources in days.items():
+            results.append(run_day(day, sources, stream_aspire, **match_options))
+            if progress:
+                progress(results[-1])
+        return BatchResult(results)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(days))) as pool:
+        futures = {pool.submit(run_day, day, sources, stream_aspire, **match_options): day
+                   for day, sources in days.items()}
+        for future in as_completed(futures):
+            try:
+                day_result = future.result()
+            except Exception:
+                # The worker itself died (e.g. killed for memory); only this day is lost
+                day_result = DayResult(futures[future], error=traceback.format_exc())
+            results.append(day_result)
+            if progress:
+                progress(day_result)
+    return BatchResult(results)
+
+
+def carry_forward(batch, path):
+    """Apply each successful day, in order, to a ``CarryForwardStore`` at ``path``.
+
+    Returns the carried-forward report sheets: the open items closed by the
+    batch's days and what is still open afterwards (see ``open_sheets``).
+    """
+    from recon.carry_forward import CarryForwardStore
+
+    with CarryForwardStore(path) as store:
+        closed = [store.apply(d.day, d.exceptions).closed for d in batch.succeeded]
+        return {'Carried_Closed': _concat(closed), **store.open_sheets()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reconcile a directory of daily statement sets.')
+    parser.add_argument('directory', help='directory with one sub-directory per day')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: CPU count)')
+    parser.add_argument('--output', default='Batch_Reconciliation_Report.xlsx')
+    parser.add_argument('--stream-aspire', action='store_true',
+                        help='read each Aspire CSV in bounded chunks')
+    parser.add_argument('--carry-forward', metavar='DB',
+                        help='SQLite store of open items to match across days')
+    parser.add_argument('--amount-tolerance', type=float, default=None, metavar='KES',
+                        help='largest amount difference accepted by the amount match '
+                             '(default: 1.00)')
+    parser.add_argument('--card-window', type=float, default=None, metavar='MINUTES',
+                        help='largest time gap of the card + amount match, 0 to turn it off '
+                             '(default: 30)')
+    parser.add_argument('--matching', choices=AMOUNT_MATCHING, default=None,
+                        help="amount matching: 'cascade' pairs Aspire and bank rows one-to-one, "
+                             "'notebook' flags each side as the original notebook did "
+                             '(default: cascade)')
+    parser.add_argument('--pattern', action='append', default=[], metavar='SOURCE=REGEX',
+                        help='file name pattern for one of ' + ', '.join(SOURCE_PATTERNS)
+                             + ' (case-insensitive; replaces the built-in one, repeatable)')
+    args = parser.parse_args(argv)
+
+    patterns = {}
+    for option in args.pattern:
+        source, _, pattern = option.partition('=')
+        if source not in SOURCE_PATTERNS or not pattern:
+            parser.error(f'--pattern {option!r}: expected SOURCE=REGEX with SOURCE one of '
+                         + ', '.join(SOURCE_PATTERNS))
+        try:
+            re.compile(pattern)
+        except re.error as exc:
+            parser.error(f'--pattern {option!r}: {exc}')
+        patterns[source] = pattern
+
+    from recon.engine import write_report
+
+    days = discover_days(args.directory, patterns)
+    if not days:
+        parser.error(f'no day directories with statements found in {args.directory}')
+
+    def report(day_result):
+        status = 'ok' if day_result.ok else 'FAILED'
+        print(f'{day_result.day:<12} {status:<7}{day_result.seconds:7.1f}s', flush=True)
+
+    start = time.perf_counter()
+    match_options = {}
+    if args.amount_tolerance is not None:
+        match_options['amount_tolerance'] = int(round(args.amount_tolerance * 100))
+    if args.card_window is not None:
+        match_options['card_window'] = (pd.Timedelta(minutes=args.card_window)
+                                        if args.card_window else None)
+    if args.matching is not None:
+        match_options['matching'] = args.matching
+    batch = run_batch(days, workers=args.workers, stream_aspire=args.stream_aspire,
+                      progress=report, **match_options)
+    sheets = batch.report_sheets()
+    if args.carry_forward:
+        sheets.update(carry_forward(batch, args.carry_forward))
+    write_report(sheets, args.output, number_formats=REPORT_NUMBER_FORMATS)
+    print(f'{len(batch.succeeded)}/{len(batch.days)} days reconciled in '
+          f'{time.perf_counter() - start:.1f}s -> {args.output}')
+    for failed in batch.failed:
+        print(f'\n{failed.day}:\n{failed.error}')
+    return 1 if batch.failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""Store name to branch resolution against the branch key.
+
+``get_branch`` in app.py upper-cased every branch-key entry and scanned it
+against every store name. ``BranchResolver`` compiles the key entries into an
+Aho-Corasick automaton once, resolves each distinct store string once and
+broadcasts the answers back to all rows. The rules are unchanged: the first
+key entry (in key-file order) contained in the store name wins, then the
+"QUICK MART <branch>, ..." fallback, then "UNKNOWN".
+"""
+import numpy as np
+import pandas as pd
+
+UNKNOWN_BRANCH = 'UNKNOWN'
+
+
+def fallback_branch(store_name):
+    """Branch from the KCB merchant format, for stores missing from the key."""
+    if "QUICK MART" in store_name and "TILL" not in store_name:
+        parts = store_name.split(",")
+        if len(parts) >= 2:
+            return parts[0].split("QUICK MART")[-1].strip("- ").strip()
+    return UNKNOWN_BRANCH
+
+
+class BranchResolver:
+    """Multi-pattern matcher built once per branch-key file."""
+
+    def __init__(self, branch_mapping):
+        self.branches = list(branch_mapping.values())
+        self._build([str(k).upper() for k in branch_mapping])
+
+    @classmethod
+    def from_key(cls, key, store_col='Col_1', branch_col='Col_2'):
+        return cls(dict(zip(key[store_col], key[branch_col])))
+
+    def _build(self, patterns):
+        # goto[node] maps a character to the next node; best[node] is the
+        # lowest pattern index recognised on reaching the node (``none`` if no
+        # pattern ends there)
+        none = len(patterns)
+        goto = [{}]
+        best = [none]
+        self._none = none
+        self._empty = none
+        for idx, pattern in enumerate(patterns):
+            if not pattern:
+                self._empty = min(self._empty, idx)
+                continue
+            node = 0
+            for ch in pattern:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    best.append(none)
+                node = nxt
+            best[node] = min(best[node], idx)
+
+        # Breadth-first pass to set failure links and fold their outputs in
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                best[nxt] = min(best[nxt], best[fail[nxt]])
+
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+
+    def first_match(self, text):
+        """Index of the first key entry contained in ``text``, or None."""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = self._empty
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if best[node] < found:
+                found = best[node]
+        return None if found == self._none else found
+
+    def resolve_one(self, store_name):
+        store_name = str(store_name).upper()
+        idx = self.first_match(store_name)
+        if idx is not None:
+            return self.branches[idx]
+        return fallback_branch(store_name)
+
+    def resolve(self, stores):
+        """Branch for every row of ``stores``, resolving each distinct value once."""
+        stores = pd.Series(stores, dtype=object) if not isinstance(stores, pd.Series) else stores
+        codes, uniques = pd.factorize(stores)
+        resolved = np.array([self.resolve_one(s) for s in uniques] + [None], dtype=object)
+        result = resolved[codes]
+        missing = codes == -1
+        if missing.any():
+            # None and NaN stringify differently ('NONE' vs 'NAN'), so resolve
+            # the few null spellings individually
+            result[missing] = [self.resolve_one(s) for s in stores[missing]]
+        return pd.Series(result, index=stores.index, dtype=object)
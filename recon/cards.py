@@ -0,0 +1,79 @@
+"""Card number normalization, run once per run on the distinct card values.
+
+``normalize_cards`` replaces app.py's per-row ``standardize_card_number`` and
+the notebook's repeated ``x[:4] + x[-4:]`` lambdas. It factorizes the card
+column, cleans only the unique values with pandas string methods and
+broadcasts the masked PAN, the ``card_check`` key and an int64 join token
+back to every row through the factorized codes.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# pd.util.hash_array needs a 16 byte key; set RECON_CARD_TOKEN_KEY to rotate it
+TOKEN_KEY_ENV = 'RECON_CARD_TOKEN_KEY'
+TOKEN_KEY_BYTES = 16
+DEFAULT_TOKEN_KEY = 'qm-cards-recon-1'
+
+
+def resolve_token_key(token_key=None):
+    """``token_key``, else ``RECON_CARD_TOKEN_KEY``, else the default key.
+
+    Raises ``ValueError`` unless the key is exactly 16 bytes in UTF-8, so a
+    bad setting fails before a run rather than part-way through it.
+    """
+    token_key = token_key or os.environ.get(TOKEN_KEY_ENV) or DEFAULT_TOKEN_KEY
+    size = len(token_key.encode('utf8'))
+    if size != TOKEN_KEY_BYTES:
+        raise ValueError(f'card token key must be {TOKEN_KEY_BYTES} bytes, got {size} '
+                         f'(check {TOKEN_KEY_ENV})')
+    return token_key
+
+
+def card_tokens(card_checks, token_key=None):
+    """Keyed 64-bit hash of card_check values as int64 (0 for blank keys)."""
+    token_key = resolve_token_key(token_key)
+    values = np.asarray(card_checks, dtype=object)
+    tokens = pd.util.hash_array(values, hash_key=token_key, categorize=False).view(np.int64)
+    return np.where(values == '', 0, tokens)
+
+
+def _normalize_unique(uniques, token_key):
+    card_str = pd.Series(uniques, dtype=object).astype(str)
+    digits = card_str.str.replace(r'\D', '', regex=True)
+
+    # Mask the middle digits when the number is long enough, as before
+    masked = card_str.where(
+        digits.str.len() < 12,
+        digits.str[:6] + '******' + digits.str[-4:],
+    )
+
+    # First 4 + last 4 characters, blank when fewer than 8 digits survive
+    stripped = masked.str.strip()
+    visible = stripped.str.replace(' ', '', regex=False).str.replace('*', '', regex=False)
+    card_check = (stripped.str[:4] + stripped.str[-4:]).where(visible.str.len() >= 8, '')
+
+    return masked, card_check, card_tokens(card_check.to_numpy(), token_key)
+
+
+def normalize_cards(cards, token_key=None):
+    """Return ``Card_Number`` (masked PAN), ``card_check`` and ``card_token`` per row.
+
+    Null card numbers keep a null ``Card_Number``, a blank ``card_check`` and
+    a zero token.
+    """
+    codes, uniques = pd.factorize(cards)
+    masked, card_check, tokens = _normalize_unique(uniques, token_key)
+
+    # Code -1 (null) picks the trailing sentinel of each lookup array
+    masked = np.append(masked.to_numpy(dtype=object), np.nan)
+    card_check = np.append(card_check.to_numpy(dtype=object), '')
+    tokens = np.append(tokens, 0)
+
+    index = cards.index if isinstance(cards, pd.Series) else None
+    return pd.DataFrame({
+        'Card_Number': masked[codes],
+        'card_check': card_check[codes],
+        'card_token': tokens[codes],
+    }, index=index)
@@ -0,0 +1,308 @@
+"""Open items carried from one day's reconciliation to the next.
+
+Bank settlements often land a day after the Aspire till record, so a day's
+exception rows (Asp_Recs, kcb_recs, Equity_recs) are kept in a SQLite store
+as open items. ``CarryForwardStore.apply`` matches only the new day's
+exceptions against the open items of the other side, first on RRN and then
+on branch + amount in cents, and closes both rows of every pair. Candidates
+are fetched through the partial indexes on open items, so a day's cost
+follows its own volume rather than the size of the history.
+
+Applying the same day again (e.g. after re-uploading a corrected statement)
+first undoes that day; only the most recent day can be re-applied.
+
+The history grows with every day, so the report lists in full only the
+items opened on the last ``OPEN_ITEMS_DAYS`` applied days, at most
+``OPEN_ITEMS_MAX_ROWS`` of them; ``Open_Items_By_Day`` counts every open
+item per day from the index alone.
+"""
+import datetime
+import json
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from recon.amounts import CENTS_DTYPE, from_cents
+from recon.categories import map_categories
+from recon.matching import consume_matches
+from recon.rrn import normalize_rrns
+
+ASPIRE = 'aspire'
+BANK = 'bank'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS open_items (
+    id INTEGER PRIMARY KEY,
+    side TEXT NOT NULL,
+    day TEXT NOT NULL,
+    source TEXT,
+    rrn TEXT,
+    branch TEXT,
+    amount_cents INTEGER,
+    record TEXT NOT NULL,
+    closed_day TEXT,
+    closed_by INTEGER,
+    closed_pass TEXT
+);
+CREATE INDEX IF NOT EXISTS open_items_rrn
+    ON open_items (side, rrn) WHERE closed_day IS NULL;
+CREATE INDEX IF NOT EXISTS open_items_branch_amount
+    ON open_items (side, branch, amount_cents) WHERE closed_day IS NULL;
+CREATE INDEX IF NOT EXISTS open_items_day ON open_items (day);
+CREATE INDEX IF NOT EXISTS open_items_closed_day ON open_items (closed_day);
+CREATE TABLE IF NOT EXISTS applied_days (
+    day TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL,
+    new_items INTEGER NOT NULL,
+    closed_items INTEGER NOT NULL
+);
+"""
+
+# Open_Items sheet: items opened on this many most recent applied days, newest
+# rows kept when over the row cap
+OPEN_ITEMS_DAYS = 31
+OPEN_ITEMS_MAX_ROWS = 100_000
+
+# (pass name, key columns) in matching order
+PASSES = [
+    ('rrn', ['rrn']),
+    ('branch_amount', ['branch', 'amount_cents']),
+]
+
+
+def _rrn_key(values):
+    return normalize_rrns(values).astype('string').to_numpy(dtype=object)
+
+
+def _branch_key(names):
+    # Same spelling rule as the second amount pass: no spaces, upper case,
+    # applied once per distinct name
+    def clean(names):
+        return names.astype(str).str.replace(r'\s+', '', regex=True).str.upper().where(names.notna())
+    return map_categories(names, clean).astype(object)
+
+
+def _records(df):
+    # Stored in shillings, as the rows appear in the report
+    return [json.dumps(row, default=str) for row in from_cents(df).to_dict('records')]
+
+
+def item_keys(exceptions):
+    """Key frame (side, source, rrn, branch, amount_cents, record) of a day's exceptions.
+
+    ``exceptions`` is ``Reconciliation.exceptions()``: Asp_Recs plus the
+    bank exception sheets.
+    """
+    frames = []
+    aspire = exceptions.get('Asp_Recs')
+    if aspire is not None and not aspire.empty:
+        frames.append(pd.DataFrame({
+            'side': ASPIRE,
+            'source': 'Aspire',
+            'rrn': _rrn_key(aspire['REF_NO']),
+            'branch': _branch_key(aspire['STORE_NAME']),
+            'amount_cents': aspire['AMOUNT'].astype(CENTS_DTYPE),
+            'record': _records(aspire),
+        }))
+    for name in ['kcb_recs', 'Equity_recs']:
+        bank = exceptions.get(name)
+        if bank is not None and not bank.empty:
+            frames.append(pd.DataFrame({
+                'side': BANK,
+                'source': bank['Source'].to_numpy(),
+                'rrn': _rrn_key(bank['REF_NO']),
+                'branch': _branch_key(bank['branch']).to_numpy(),
+                'amount_cents': bank['Purchase'].astype(CENTS_DTYPE).array,
+                'record': _records(bank),
+            }))
+    if not frames:
+        return pd.DataFrame(columns=['side', 'source', 'rrn', 'branch', 'amount_cents', 'record'])
+    items = pd.concat(frames, ignore_index=True)
+    items['amount_cents'] = items['amount_cents'].astype(CENTS_DTYPE)
+    return items
+
+
+class CarryForwardResult:
+    """What ``CarryForwardStore.apply`` did for one day."""
+
+    def __init__(self, day, closed, new_items, opened):
+        self.day = day
+        self.closed = closed
+        self.new_items = new_items
+        self.opened = opened
+
+    def __len__(self):
+        return len(self.closed)
+
+
+class CarryForwardStore:
+    """SQLite-backed open items, usable as a context manager."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def applied_days(self):
+        return [row[0] for row in self.conn.execute('SELECT day FROM applied_days ORDER BY day')]
+
+    def _undo(self, day):
+        self.conn.execute(
+            'UPDATE open_items SET closed_day = NULL, closed_by = NULL, closed_pass = NULL '
+            'WHERE closed_day = ? AND day <> ?', (day, day))
+        self.conn.execute('DELETE FROM open_items WHERE day = ?', (day,))
+        self.conn.execute('DELETE FROM applied_days WHERE day = ?', (day,))
+
+    def _candidates(self, side, key_columns, keys):
+        """Open items on ``side`` whose key is among ``keys``, oldest first."""
+        keys = keys.dropna().drop_duplicates()
+        columns = ['id', 'day'] + key_columns
+        if keys.empty:
+            return pd.DataFrame(columns=columns)
+        self.conn.execute('DROP TABLE IF EXISTS temp.probe')
+        self.conn.execute(f'CREATE TEMP TABLE probe ({", ".join(key_columns)})')
+        self.conn.executemany(
+            f'INSERT INTO temp.probe VALUES ({", ".join("?" * len(key_columns))})',
+            [tuple(None if pd.isna(v) else (int(v) if isinstance(v, np.integer) else v)
+                   for v in row) for row in keys.itertuples(index=False)])
+        on = ' AND '.join(f'o.{c} = p.{c}' for c in key_columns)
+        query = (f'SELECT o.id, o.day, {", ".join("o." + c for c in key_columns)} '
+                 f'FROM temp.probe p JOIN open_items o ON o.side = ? AND {on} '
+                 f'WHERE o.closed_day IS NULL ORDER BY o.day, o.id')
+        candidates = pd.DataFrame(self.conn.execute(query, (side,)).fetchall(), columns=columns)
+        if 'amount_cents' in candidates:
+            candidates['amount_cents'] = candidates['amount_cents'].astype(CENTS_DTYPE)
+        return candidates
+
+    def apply(self, day, exceptions):
+        """Match a day's exceptions against the open items and store what stays open.
+
+        Returns a ``CarryForwardResult`` whose ``closed`` frame lists the open
+        items closed by this day's rows.
+        """
+        day = str(day)
+        items = item_keys(exceptions)
+        with self.conn:
+            latest = self.conn.execute('SELECT MAX(day) FROM applied_days').fetchone()[0]
+            if latest is not None and day < latest:
+                raise ValueError(f'{day} is before the last carried-forward day {latest}')
+            if latest == day:
+                self._undo(day)
+
+            first_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM open_items').fetchone()[0]
+            items['id'] = np.arange(first_id, first_id + len(items), dtype=np.int64)
+            items['closed_by'] = pd.Series(pd.NA, index=items.index, dtype='Int64')
+            items['closed_pass'] = None
+
+            closed = []
+            for pass_name, key_columns in PASSES:
+                for side, other in [(ASPIRE, BANK), (BANK, ASPIRE)]:
+                    new = items[(items['side'] == side) & items['closed_by'].isna()]
+                    new = new.dropna(subset=key_columns)
+                    if new.empty:
+                        continue
+                    candidates = self._candidates(other, key_columns, new[key_columns])
+                    if candidates.empty:
+                        continue
+                    result = consume_matches(new[key_columns], candidates[key_columns])
+                    new_rows = new.iloc[result.pairs['left'].to_numpy()]
+                    open_rows = candidates.iloc[result.pairs['right'].to_numpy()]
+                    items.loc[new_rows.index, 'closed_by'] = open_rows['id'].to_numpy()
+                    items.loc[new_rows.index, 'closed_pass'] = pass_name
+                    self.conn.executemany(
+                        'UPDATE open_items SET closed_day = ?, closed_by = ?, closed_pass = ? '
+                        'WHERE id = ?',
+                        [(day, int(new_id), pass_name, int(open_id)) for new_id, open_id
+                         in zip(new_rows['id'], open_rows['id'])])
+                    closed.append(pd.DataFrame({
+                        'Day': day,
+                        'Pass': pass_name,
+                        'Side': side,
+                        'Source': new_rows['source'].to_numpy(),
+                        'RRN': new_rows['rrn'].to_numpy(),
+                        'Branch': new_rows['branch'].to_numpy(),
+                        'Amount': new_rows['amount_cents'].to_numpy() / 100,
+                        'Open_Item': open_rows['id'].to_numpy(),
+                        'Opened_Day': open_rows['day'].to_numpy(),
+                    }))
+
+            matched = items['closed_by'].notna()
+            self.conn.executemany(
+                'INSERT INTO open_items (id, side, day, source, rrn, branch, amount_cents, record, '
+                'closed_day, closed_by, closed_pass) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(int(row.id), row.side, day, row.source,
+                  None if pd.isna(row.rrn) else row.rrn,
+                  None if pd.isna(row.branch) else row.branch,
+                  None if pd.isna(row.amount_cents) else int(row.amount_cents),
+                  row.record,
+                  day if is_matched else None,
+                  int(row.closed_by) if is_matched else None,
+                  row.closed_pass if is_matched else None)
+                 for row, is_matched in zip(items.itertuples(index=False), matched)])
+            self.conn.execute(
+                'INSERT INTO applied_days VALUES (?, ?, ?, ?)',
+                (day, datetime.datetime.now().isoformat(timespec='seconds'), len(items),
+                 int(matched.sum())))
+
+        closed = pd.concat(closed, ignore_index=True) if closed else pd.DataFrame(
+            columns=['Day', 'Pass', 'Side', 'Source', 'RRN', 'Branch', 'Amount',
+                     'Open_Item', 'Opened_Day'])
+        return CarryForwardResult(day, closed, len(items), int((~matched).sum()))
+
+    def open_items(self, side=None, recent_days=None, limit=None):
+        """Still-open items (oldest first) with their original exception-row fields.
+
+        ``recent_days`` keeps the items opened on that many most recent
+        applied days; ``limit`` keeps the newest ``limit`` of those. Only
+        the rows returned have their records decoded.
+        """
+        query = ('SELECT id, side, day, source, rrn, branch, amount_cents, record '
+                 'FROM open_items WHERE closed_day IS NULL')
+        params = []
+        if side is not None:
+            query += ' AND side = ?'
+            params.append(side)
+        if recent_days is not None:
+            query += (' AND day >= (SELECT MIN(day) FROM (SELECT day FROM applied_days '
+                      'ORDER BY day DESC LIMIT ?))')
+            params.append(recent_days)
+        if limit is not None:
+            query = f'SELECT * FROM ({query} ORDER BY day DESC, id DESC LIMIT ?)'
+            params.append(limit)
+        rows = self.conn.execute(query + ' ORDER BY day, id', params).fetchall()
+        items = pd.DataFrame(rows, columns=['Open_Item', 'Side', 'Opened_Day', 'Source', 'RRN',
+                                            'Branch', 'amount_cents', 'record'])
+        items.insert(6, 'Amount', items.pop('amount_cents') / 100)
+        records = pd.DataFrame([json.loads(r) for r in items.pop('record')], index=items.index)
+        return pd.concat([items, records.drop(columns=items.columns, errors='ignore')], axis=1)
+
+    def open_items_by_day(self):
+        """Count and amount of the still-open items per opening day, side and source."""
+        rows = self.conn.execute(
+            'SELECT day, side, source, COUNT(*), SUM(amount_cents) FROM open_items '
+            'WHERE closed_day IS NULL GROUP BY day, side, source ORDER BY day, side, source'
+        ).fetchall()
+        by_day = pd.DataFrame(rows, columns=['Opened_Day', 'Side', 'Source', 'Items', 'Amount'])
+        by_day['Amount'] = by_day['Amount'].astype(CENTS_DTYPE) / 100
+        return by_day
+
+    def open_sheets(self, recent_days=OPEN_ITEMS_DAYS, max_rows=OPEN_ITEMS_MAX_ROWS):
+        """The Open_Items sheet, bounded as ``open_items`` describes, and Open_Items_By_Day."""
+        return {
+            'Open_Items': self.open_items(recent_days=recent_days, limit=max_rows),
+            'Open_Items_By_Day': self.open_items_by_day(),
+        }
+
+    def report_sheets(self, result):
+        """Sheets to add to a day's report for a ``CarryForwardResult``."""
+        return {'Carried_Closed': result.closed, **self.open_sheets()}
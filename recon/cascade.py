@@ -0,0 +1,263 @@
+"""Multi-pass matching cascade over residual rows.
+
+The notebook matches in a hand-run sequence of cells, each filtering the
+frames again and rebuilding its keys. Here every pass declares the keys it
+needs; ``KeyTable`` builds each key once over all rows of a side, and
+``run_cascade`` hands each pass only the positions the previous passes left
+unmatched, so a pass costs work on what is still open rather than on a new
+copy of the frames.
+
+Most passes pair rows of the two sides one-to-one, which flags both rows of
+a pair. A ``FlagPass`` instead runs one notebook cell as it was written:
+the open rows of one side are checked against every row of the other side,
+and only that side is flagged.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from recon.matching import consume_matches, flag_matches, nearest_matches
+
+STATS_COLUMNS = ['Pass', 'Keys', 'Left_in', 'Right_in', 'Matched', 'Seconds']
+
+
+class MatchPass:
+    """One pass of a cascade.
+
+    ``match(left, right)`` receives two frames with one column per name in
+    ``keys``, holding only the rows still unmatched, and returns a
+    ``MatchResult`` whose pairs are positions in those frames (a ``diff``
+    column, left minus right, is kept when present).
+    """
+
+    def __init__(self, name, keys, match):
+        self.name = name
+        self.keys = list(keys)
+        self.match = match
+
+    def __repr__(self):
+        return f'MatchPass({self.name!r}, {self.keys!r})'
+
+
+class FlagPass(MatchPass):
+    """A pass that flags the open rows of one ``side`` ('left' or 'right').
+
+    ``match(own, other)`` receives the open rows of that side and every row
+    of the other side, and returns a boolean mask over ``own``. The other
+    side's rows stay open. ``pool`` says what a row may consume from the
+    other side (see ``matching.flag_matches``).
+    """
+
+    def __init__(self, name, keys, side, pool):
+        super().__init__(name, keys, lambda own, other: flag_matches(own, other, pool))
+        if side not in ('left', 'right'):
+            raise ValueError(f"side must be 'left' or 'right', not {side!r}")
+        self.side = side
+        self.pool = pool
+
+    def __repr__(self):
+        return f'FlagPass({self.name!r}, {self.keys!r}, {self.side!r}, {self.pool!r})'
+
+
+def flag_pass(name, keys, side, pool='all'):
+    """Pass flagging the open ``side`` rows found among all of the other side's rows."""
+    return FlagPass(name, keys, side, pool)
+
+
+def exact_pass(name, keys):
+    """Pass pairing rows one-to-one on equal ``keys`` (see ``consume_matches``)."""
+    return MatchPass(name, keys, consume_matches)
+
+
+def nearest_pass(name, by, value, tolerance):
+    """Pass pairing rows with equal ``by`` on the nearest ``value`` within ``tolerance``."""
+    def match(left, right):
+        return nearest_matches(left[by], left[value], right[by], right[value], tolerance)
+    return MatchPass(name, [by, value], match)
+
+
+def window_pass(name, by, when, window):
+    """Pass pairing rows with equal ``by`` keys whose ``when`` is nearest within ``window``.
+
+    ``when`` keys are timestamps as int64 nanoseconds (see
+    ``timestamp_key``); ``window`` is a ``pd.Timedelta``. The pass makes no
+    amount difference, so its pairs get a ``diff`` of 0.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    tolerance = pd.Timedelta(window).value
+
+    def match(left, right):
+        result = nearest_matches(left[by], left[when], right[by], right[when], tolerance)
+        result.pairs = result.pairs.drop(columns='diff')
+        return result
+    return MatchPass(name, by + [when], match)
+
+
+def timestamp_key(values):
+    """Date-times (or date text) as nullable int64 nanoseconds, naive in local time."""
+    times = pd.to_datetime(pd.Series(values), errors='coerce')
+    if times.dt.tz is not None:
+        times = times.dt.tz_localize(None)
+    ns = times.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    return pd.Series(pd.arrays.IntegerArray(ns, times.isna().to_numpy()), index=times.index)
+
+
+class KeyTable:
+    """Match keys of one side, each built once over all rows when first needed.
+
+    ``builders`` maps key names to functions of the side's frame returning
+    one value per row (missing values never match). With a ``dictionary``
+    (a ``recon.categories.KeyDictionary`` shared with the other side) text
+    keys are replaced by integer codes, so the passes join on integers.
+    """
+
+    def __init__(self, frame, builders, dictionary=None):
+        self.frame = frame
+        self.builders = builders
+        self.dictionary = dictionary
+        self._keys = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def key(self, name):
+        if name not in self._keys:
+            if name not in self.builders:
+                raise KeyError(f'no builder for match key {name!r}')
+            values = pd.Series(self.builders[name](self.frame))
+            if self.dictionary is not None and not pd.api.types.is_numeric_dtype(values):
+                values = self.dictionary.codes(name, values)
+            self._keys[name] = values.reset_index(drop=True)
+        return self._keys[name]
+
+    def take(self, names, positions):
+        """Frame of the ``names`` keys for the rows at ``positions``."""
+        return pd.DataFrame({name: self.key(name).take(positions).reset_index(drop=True)
+                             for name in names})
+
+
+class CascadeResult:
+    """Pairs, flagged rows, per-row pass names and per-pass statistics of one run.
+
+    ``pairs`` has ``pass``, ``left``, ``right`` and ``diff`` (0 for passes
+    without one) with positions in the full frames; ``flags`` has ``pass``,
+    ``side`` and ``row`` for the rows flag passes matched. ``left_pass`` and
+    ``right_pass`` name the pass that matched each row (``None`` if
+    unmatched), ``left_diff``/``right_diff`` hold the pair's diff (missing
+    for flagged rows).
+    """
+
+    def __init__(self, pairs, n_left, n_right, stats, flags=None):
+        self.pairs = pairs
+        self.n_left = n_left
+        self.n_right = n_right
+        self.stats = stats
+        self.flags = _empty_flags() if flags is None else flags
+
+    def _flagged(self, side):
+        return self.flags[self.flags['side'] == side]
+
+    def _per_row(self, side, n, column, missing, dtype):
+        values = pd.Series(missing, index=range(n), dtype=dtype)
+        values.iloc[self.pairs[side].to_numpy()] = self.pairs[column].to_numpy()
+        if column == 'pass':
+            flagged = self._flagged(side)
+            values.iloc[flagged['row'].to_numpy()] = flagged['pass'].to_numpy()
+        return values.array
+
+    @property
+    def left_pass(self):
+        return self._per_row('left', self.n_left, 'pass', None, object)
+
+    @property
+    def right_pass(self):
+        return self._per_row('right', self.n_right, 'pass', None, object)
+
+    @property
+    def left_diff(self):
+        return self._per_row('left', self.n_left, 'diff', pd.NA, 'Int64')
+
+    @property
+    def right_diff(self):
+        return self._per_row('right', self.n_right, 'diff', pd.NA, 'Int64')
+
+    def _mask(self, side, n):
+        mask = np.zeros(n, dtype=bool)
+        mask[self.pairs[side].to_numpy()] = True
+        mask[self._flagged(side)['row'].to_numpy()] = True
+        return mask
+
+    @property
+    def left_mask(self):
+        return self._mask('left', self.n_left)
+
+    @property
+    def right_mask(self):
+        return self._mask('right', self.n_right)
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+def _empty_flags():
+    return pd.DataFrame({'pass': pd.Series(dtype=object), 'side': pd.Series(dtype=object),
+                         'row': pd.Series(dtype=np.int64)})
+
+
+def run_cascade(passes, left, right):
+    """Run ``passes`` in order on two ``KeyTable``s, each on the previous residuals.
+
+    A ``FlagPass`` gets the open rows of its side and all rows of the other.
+    """
+    left_open = np.arange(len(left), dtype=np.int64)
+    right_open = np.arange(len(right), dtype=np.int64)
+    pairs, flags, stats = [], [], []
+    for match_pass in passes:
+        start = time.perf_counter()
+        left_in, right_in = len(left_open), len(right_open)
+        matched = 0
+        if isinstance(match_pass, FlagPass):
+            if match_pass.side == 'left':
+                own, own_open, other = left, left_open, right
+                right_in = len(right)
+            else:
+                own, own_open, other = right, right_open, left
+                left_in = len(left)
+            if len(own_open) and len(other):
+                found = match_pass.match(own.take(match_pass.keys, own_open),
+                                         other.take(match_pass.keys, np.arange(len(other))))
+                matched = int(found.sum())
+                flags.append(pd.DataFrame({'pass': match_pass.name, 'side': match_pass.side,
+                                           'row': own_open[found]}))
+                if match_pass.side == 'left':
+                    left_open = own_open[~found]
+                else:
+                    right_open = own_open[~found]
+        elif left_in and right_in:
+            result = match_pass.match(left.take(match_pass.keys, left_open),
+                                      right.take(match_pass.keys, right_open))
+            found = result.pairs
+            matched = len(found)
+            if matched:
+                pairs.append(pd.DataFrame({
+                    'pass': match_pass.name,
+                    'left': left_open[found['left'].to_numpy()],
+                    'right': right_open[found['right'].to_numpy()],
+                    'diff': found['diff'].to_numpy() if 'diff' in found else 0,
+                }))
+                left_open = left_open[~result.left_mask]
+                right_open = right_open[~result.right_mask]
+        stats.append((match_pass.name, ', '.join(match_pass.keys), left_in, right_in, matched,
+                      time.perf_counter() - start))
+
+    if pairs:
+        pairs = pd.concat(pairs, ignore_index=True).astype({'diff': np.int64})
+    else:
+        pairs = pd.DataFrame({'pass': pd.Series(dtype=object),
+                              'left': pd.Series(dtype=np.int64),
+                              'right': pd.Series(dtype=np.int64),
+                              'diff': pd.Series(dtype=np.int64)})
+    flags = pd.concat(flags, ignore_index=True) if flags else _empty_flags()
+    return CascadeResult(pairs, len(left), len(right),
+                         pd.DataFrame(stats, columns=STATS_COLUMNS), flags)
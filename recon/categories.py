@@ -0,0 +1,115 @@
+"""Dictionary-encoded text columns.
+
+Source, TID, store, branch, STORE_NAME, CARD_TYPE and TILL repeat a few
+hundred distinct values over every row of a statement. The engine turns them
+into pandas Categoricals once, when a statement enters the pipeline; from
+there the text clean-up (strip, upper case, no spaces, branch resolution)
+runs on the categories only (``map_categories``), groupbys run on the codes
+(``observed=True``), and the columns compared across statements are recoded
+onto one shared dictionary (``share``) or, for the matching cascade, onto
+integer codes (``KeyDictionary``).
+"""
+import numpy as np
+import pandas as pd
+
+
+def _sorted(values):
+    # Mixed text and numbers (e.g. TILL) have no order; keep first-seen order then
+    try:
+        return values.sort_values()
+    except TypeError:
+        return values
+
+
+def _from_uniques(codes, uniques, index):
+    # ``uniques[codes]`` as a Categorical with sorted categories; ``uniques``
+    # may repeat (two spellings cleaned to one) and hold missing values
+    uniques = pd.Index(uniques, dtype=object)
+    categories = _sorted(pd.Index(uniques.dropna().unique(), dtype=object))
+    lookup = np.append(categories.get_indexer(uniques), -1)
+    categorical = pd.Categorical.from_codes(lookup[codes], categories=categories)
+    return pd.Series(categorical, index=index)
+
+
+def _distinct(values):
+    # (codes, distinct values): the categories of a Categorical, else factorized
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), np.asarray(values.cat.categories, dtype=object)
+    codes, uniques = pd.factorize(values)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def encode(values):
+    """``values`` as a Categorical with sorted categories (unchanged if already one)."""
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    codes, uniques = _distinct(values)
+    return _from_uniques(codes, uniques, values.index)
+
+
+def map_categories(values, fn):
+    """Categorical of ``fn`` applied to each distinct value of ``values``.
+
+    ``fn`` takes and returns a Series (e.g. a chain of ``.str`` methods) and
+    sees every distinct value once, a missing value included when there is
+    one, so it costs the number of categories rather than rows.
+    """
+    values = pd.Series(values)
+    codes, uniques = _distinct(values)
+    has_missing = (codes == -1).any()
+    if has_missing:
+        # Give missing rows a slot of their own so ``fn`` decides their result
+        uniques = np.append(uniques, np.nan)
+        codes = np.where(codes == -1, len(uniques) - 1, codes)
+    mapped = pd.Series(fn(pd.Series(uniques, dtype=object)))
+    return _from_uniques(codes, mapped.to_numpy(dtype=object), values.index)
+
+
+def is_blank(values):
+    """Boolean array: missing or whitespace-only, checked once per distinct value."""
+    values = pd.Series(values)
+    codes, uniques = _distinct(values)
+    blank = pd.Series(uniques, dtype=object).astype(str).str.strip().eq('').to_numpy()
+    return np.append(blank, True)[codes]
+
+
+def share(*columns):
+    """Recode Categorical columns onto one dictionary: the sorted union of their categories."""
+    columns = [encode(column) for column in columns]
+    categories = pd.Index([], dtype=object)
+    for column in columns:
+        categories = categories.append(pd.Index(column.cat.categories, dtype=object))
+    categories = _sorted(categories.unique())
+    return [column.cat.set_categories(categories) for column in columns]
+
+
+class KeyDictionary:
+    """Integer codes for text match keys, shared by both sides of a join.
+
+    Each key name has its own append-only dictionary, so the same text gets
+    the same code whichever side (or chunk) it is first seen on; missing
+    values get no code and never match.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def __len__(self):
+        return sum(len(values) for values in self._values.values())
+
+    def codes(self, name, values):
+        """Nullable int64 codes of ``values`` in the ``name`` dictionary."""
+        values = pd.Series(values)
+        codes, uniques = _distinct(values)
+        # Categories nobody uses would otherwise grow the dictionary
+        used = np.bincount(codes[codes >= 0], minlength=len(uniques)) > 0
+        known = self._values.get(name, pd.Index([], dtype=object))
+        positions = known.get_indexer(uniques)
+        new = (positions == -1) & used
+        positions[new] = len(known) + np.arange(new.sum())
+        self._values[name] = known.append(pd.Index(uniques[new], dtype=object))
+
+        missing = codes == -1
+        key = np.append(positions, -1)[codes].astype(np.int64)
+        return pd.Series(pd.arrays.IntegerArray(key, missing), index=values.index)
@@ -0,0 +1,137 @@
+"""Headless reconciliation of one day's statements.
+
+    python -m recon.cli --kcb kcb.xlsx --equity equity.xlsx --coop coop.xlsx \\
+        --aspire aspire.csv --key key.xlsx --out Reconciliation_Report.xlsx
+
+Writes the same workbook the app's "Download Full Report" button gives for
+the same files and options (``Reconciliation.download_sheets``), for
+scheduled runs that have no use for the UI. Only pandas and the engine are
+imported up front: openpyxl is loaded when an Excel statement is read,
+xlsxwriter when the report is written (see ``recon.export``) and the
+carry-forward store only with ``--carry-forward``. pyarrow comes in with
+pandas, which imports it; Streamlit is never imported. Startup is about
+the time it takes to import pandas.
+
+Inputs too large for memory are reconciled through SQLite (see
+``recon.sqlite_backend``); ``--backend`` forces one backend, including the
+Arrow one (``recon.arrow_backend``), which auto never picks.
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import pandas as pd
+
+from recon import engine, export
+from recon.diagnostics import RunDiagnostics, stage, write_record
+
+# Statement options, in the app's upload order
+SOURCES = ['kcb', 'equity', 'coop', 'aspire', 'key']
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kcb', help='KCB statement (xlsx)')
+    parser.add_argument('--equity', help='Equity statement (xlsx)')
+    parser.add_argument('--coop', help='Co-op statement (xlsx)')
+    parser.add_argument('--aspire', help='Aspire export (csv)')
+    parser.add_argument('--key', help='branch key (xlsx)')
+    parser.add_argument('--out', default='Reconciliation_Report.xlsx', help='report to write')
+    parser.add_argument('--no-raw', action='store_true',
+                        help='leave the *_Raw_Data sheets out of the report')
+    parser.add_argument('--stream-aspire', action='store_true',
+                        help='read the Aspire CSV in bounded chunks')
+    parser.add_argument('--amount-tolerance', type=float, default=engine.AMOUNT_TOLERANCE / 100,
+                        metavar='KES',
+                        help='largest amount difference accepted by the amount match '
+                             '(default: %(default).2f)')
+    parser.add_argument('--card-window', type=float,
+                        default=engine.CARD_WINDOW.total_seconds() / 60, metavar='MINUTES',
+                        help='largest time gap of the card + amount match, 0 to turn it off '
+                             '(default: %(default)g)')
+    parser.add_argument('--matching', choices=engine.AMOUNT_MATCHING, default='cascade',
+                        help="amount matching: 'cascade' pairs Aspire and bank rows one-to-one, "
+                             "'notebook' flags each side as the original notebook did "
+                             '(default: %(default)s)')
+    parser.add_argument('--carry-forward', metavar='DB',
+                        help='SQLite store of open items to match across days')
+    parser.add_argument('--date', type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help='day label for --carry-forward (default: today)')
+    parser.add_argument('--backend', choices=['auto'] + engine.BACKENDS, default='auto',
+                        help='reconcile in memory, through SQLite or on Arrow tables; '
+                             'auto picks memory or SQLite by input size')
+    parser.add_argument('--db', metavar='PATH',
+                        help='SQLite database of the sqlite backend (default: a temporary file)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes reading the statements (default: one process)')
+    parser.add_argument('--record', metavar='DIR',
+                        help='write a JSON run record (stage timings and rows) to DIR')
+    return parser
+
+
+def carried_sheets(result, path, day):
+    """Apply the day's exceptions to the store at ``path``; its report sheets."""
+    from recon.carry_forward import CarryForwardStore
+
+    with CarryForwardStore(path) as store:
+        return store.report_sheets(store.apply(day, result.exceptions()))
+
+
+def run(args, diagnostics=None):
+    """Reconcile the files named in ``args`` and write the report; returns the result."""
+    sources = {name: getattr(args, name) for name in SOURCES if getattr(args, name)}
+    result = engine.reconcile_files(
+        **sources, stream_aspire=bool(args.stream_aspire and args.aspire),
+        amount_tolerance=int(round(args.amount_tolerance * 100)),
+        card_window=pd.Timedelta(minutes=args.card_window) if args.card_window else None,
+        diagnostics=diagnostics, executor=args.workers if (args.workers or 0) > 1 else None,
+        backend=args.backend, db_path=args.db, matching=args.matching,
+    )
+    carried = {}
+    if args.carry_forward and result.matched:
+        with stage(diagnostics, 'carry_forward'):
+            carried = carried_sheets(result, args.carry_forward, args.date)
+    with stage(diagnostics, 'export_report') as record:
+        sheets = result.download_sheets(carried)
+        # Sheets streamed from SQLite are not counted
+        record.rows_in = sum(len(df) for df in sheets.values() if isinstance(df, pd.DataFrame))
+        export.export_report(sheets, args.out, include_raw=not args.no_raw,
+                             number_formats=engine.REPORT_NUMBER_FORMATS)
+    return result
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not any(getattr(args, name) for name in SOURCES if name != 'key'):
+        parser.error('give at least one statement (--kcb, --equity, --coop or --aspire)')
+
+    start = time.perf_counter()
+    diagnostics = RunDiagnostics()
+    with diagnostics.run():
+        result = run(args, diagnostics)
+    try:
+        exceptions = result.exceptions()
+    finally:
+        # A SQLite-backed result removes its temporary database
+        if hasattr(result, 'close'):
+            result.close()
+    if args.record:
+        write_record(diagnostics.record(
+            report_date=str(args.date),
+            inputs={name: getattr(args, name) for name in SOURCES if getattr(args, name)},
+            match_stats=(result.match_stats.to_dict('records')
+                         if result.match_stats is not None else None),
+        ), args.record)
+    if result.matched:
+        counts = ', '.join(f'{name} {len(df)}' for name, df in exceptions.items())
+        print(f'reconciled, unmatched: {counts}')
+    else:
+        print('nothing to match: the report has the merged statements only', file=sys.stderr)
+    print(f'{time.perf_counter() - start:.1f}s -> {args.out}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
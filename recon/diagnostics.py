@@ -0,0 +1,249 @@
+"""Per-stage timing, row counts and memory of a reconciliation run.
+
+A ``RunDiagnostics`` collects one record per stage: wall time, rows in and
+out and, when ``trace_memory`` is on, the tracemalloc peak reached inside
+the stage above what was allocated when it started. Stages may nest (the
+load stage wraps one stage per statement); an outer stage's peak includes
+its inner stages'. ``stage(diagnostics, name)`` is a no-op when no
+diagnostics are collected, so the engine can be instrumented without
+costing plain runs anything.
+
+tracemalloc is process-wide. Tracing runs share one tracing session,
+started by the first and stopped by the last, so a run that ends never
+stops another's tracing; but peaks count every thread's allocations, so
+concurrent traced runs inflate each other's figures (``recon.jobs`` runs
+traced jobs one at a time for that reason).
+
+``profile=True`` also runs the whole ``run()`` block under cProfile;
+``profile_bytes`` returns the dump in ``pstats`` format. A ``listener`` is
+called with ``('start', record)`` when a stage begins and with
+``('end', record)``, or ``('failed', record)`` if it raised, when it ends;
+that is how a background job reports its progress (see ``recon.jobs``).
+"""
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+import pandas as pd
+
+STAGE_COLUMNS = ['Stage', 'Seconds', 'Rows_in', 'Rows_out', 'Peak_MB']
+
+MB = 1024 * 1024
+
+
+def row_count(value):
+    """Rows of a frame, or summed over a dict/list of frames; None for anything else."""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        counts = [row_count(v) for v in value]
+        counts = [c for c in counts if c is not None]
+        return sum(counts) if counts else None
+    if hasattr(value, 'shape'):
+        return int(value.shape[0])
+    return None
+
+
+class _SharedTracing:
+    """Reference-counted tracemalloc session of the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._started = False
+
+    def acquire(self):
+        with self._lock:
+            if not self._runs and not tracemalloc.is_tracing():
+                # Tracing started by someone else is left to them
+                tracemalloc.start()
+                self._started = True
+            self._runs += 1
+
+    def release(self):
+        with self._lock:
+            self._runs -= 1
+            if not self._runs and self._started:
+                tracemalloc.stop()
+                self._started = False
+
+
+_TRACING = _SharedTracing()
+
+
+class StageRecord:
+    """One timed stage; set ``rows_out`` (or call ``out``) before it ends."""
+
+    def __init__(self, name, depth=0, rows_in=None):
+        self.name = name
+        self.depth = depth
+        self.rows_in = row_count(rows_in)
+        self.rows_out = None
+        self.seconds = None
+        self.peak_bytes = None
+        self._peak_seen = 0
+        self._start_bytes = 0
+
+    def out(self, value):
+        """Record the stage's output rows and return ``value`` unchanged."""
+        self.rows_out = row_count(value)
+        return value
+
+    def as_dict(self):
+        return {
+            'stage': self.name,
+            'depth': self.depth,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_mb': None if self.peak_bytes is None else self.peak_bytes / MB,
+        }
+
+
+class RunDiagnostics:
+    """Stage records of one run, optionally with memory tracing and a profile."""
+
+    def __init__(self, trace_memory=False, profile=False, listener=None):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.listener = listener
+        self.stages = []
+        self.started_at = None
+        self.seconds = None
+        self._stack = []
+        self._profiler = None
+        self._profile_bytes = None
+
+    def __getstate__(self):
+        # Sent back from a worker process: the profile travels as its dump
+        state = self.__dict__.copy()
+        state['_profile_bytes'] = self.profile_bytes()
+        state.update(_profiler=None, listener=None, _stack=[])
+        return state
+
+    @contextlib.contextmanager
+    def run(self):
+        """Wrap the whole run: starts tracing/profiling and times the total."""
+        self.started_at = datetime.datetime.now().isoformat(timespec='seconds')
+        if self.trace_memory:
+            _TRACING.acquire()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.seconds = time.perf_counter() - start
+            if self._profiler is not None:
+                self._profiler.disable()
+            if self.trace_memory:
+                _TRACING.release()
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None):
+        record = StageRecord(name, len(self._stack), rows_in)
+        # Runs that do not trace leave the shared peak counter alone
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Keep the parent's peak so far before the counter is reset
+                parent = self._stack[-1]
+                parent._peak_seen = max(parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            record._start_bytes = current
+        self.stages.append(record)
+        self._stack.append(record)
+        if self.listener is not None:
+            self.listener('start', record)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield record
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            record.seconds = time.perf_counter() - start
+            self._stack.pop()
+            if tracing and tracemalloc.is_tracing():
+                peak = max(record._peak_seen, tracemalloc.get_traced_memory()[1])
+                record.peak_bytes = max(peak - record._start_bytes, 0)
+                if self._stack:
+                    self._stack[-1]._peak_seen = max(self._stack[-1]._peak_seen, peak)
+            if self.listener is not None:
+                self.listener('failed' if failed else 'end', record)
+
+    def add(self, name, seconds, rows_in=None, rows_out=None):
+        """Record a stage timed elsewhere (e.g. in a worker process) under the current one."""
+        record = StageRecord(name, len(self._stack), rows_in)
+        record.rows_out = row_count(rows_out)
+        record.seconds = seconds
+        self.stages.append(record)
+        if self.listener is not None:
+            self.listener('start', record)
+            self.listener('end', record)
+        return record
+
+    def frame(self):
+        """Stages in run order, inner stages indented under their parent."""
+        return pd.DataFrame([
+            ('  ' * r.depth + r.name, r.seconds, r.rows_in, r.rows_out,
+             None if r.peak_bytes is None else r.peak_bytes / MB)
+            for r in self.stages
+        ], columns=STAGE_COLUMNS).astype({'Rows_in': 'Int64', 'Rows_out': 'Int64'})
+
+    def record(self, **meta):
+        """JSON-ready run record: ``meta`` (inputs, options, ...) plus the stages."""
+        return {
+            'run_id': uuid.uuid4().hex[:12],
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'trace_memory': self.trace_memory,
+            **meta,
+            'stages': [r.as_dict() for r in self.stages],
+        }
+
+    def profile_bytes(self):
+        """The cProfile dump (``pstats`` format) of the run, or None."""
+        if self._profiler is None:
+            return self._profile_bytes
+        fd, path = tempfile.mkstemp(suffix='.prof')
+        os.close(fd)
+        try:
+            pstats.Stats(self._profiler).dump_stats(path)
+            with open(path, 'rb') as fh:
+                return fh.read()
+        finally:
+            os.remove(path)
+
+
+def stage(diagnostics, name, rows_in=None):
+    """``diagnostics.stage(name)``, or a throwaway record when ``diagnostics`` is None."""
+    if diagnostics is None:
+        return contextlib.nullcontext(StageRecord(name))
+    return diagnostics.stage(name, rows_in)
+
+
+def write_record(record, directory):
+    """Write a run record as ``run_<started>_<id>.json`` in ``directory``; returns the path."""
+    os.makedirs(directory, exist_ok=True)
+    started = (record.get('started_at') or '').replace(':', '').replace('-', '')
+    path = os.path.join(directory, f'run_{started}_{record["run_id"]}.json')
+    with open(path, 'w') as fh:
+        json.dump(record, fh, indent=2, default=str)
+    return path
@@ -0,0 +1,840 @@
+"""Headless reconciliation engine.
+
+The notebook's steps as importable stages that pass frames in memory:
+
+    load -> normalize -> RRN match -> amount match -> card_summary -> report
+
+``reconcile`` runs them all. Intermediate frames are only written to disk
+when a ``debug_dir`` is given.
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from recon.amounts import CENTS_DTYPE, from_cents, to_cents
+from recon.branches import BranchResolver
+from recon.categories import KeyDictionary, encode, is_blank, map_categories, share
+from recon.cards import card_tokens, normalize_cards, resolve_token_key
+from recon.cascade import (KeyTable, exact_pass, flag_pass, nearest_pass, run_cascade,
+                           timestamp_key, window_pass)
+from recon.diagnostics import stage
+from recon.matching import FALSE, OKAY
+from recon.rrn import RRNIndex, normalize_rrns
+from recon.xlsx_reader import STATEMENT_COLUMNS, STATEMENT_SKIPROWS, read_statement
+
+BANKS = ['KCB', 'Equity', 'Co-op', 'Aspire']
+
+# Source is one Categorical dictionary across every statement
+SOURCE_DTYPE = pd.CategoricalDtype(BANKS)
+
+# Common bank-side schema for merged_cards
+BANK_COLUMNS = ['TID', 'store', 'Card_Number', 'TRANS_DATE', 'R_R_N',
+                'Purchase', 'Commission', 'Settlement_Amount', 'Cash_Back', 'Source']
+
+KCB_RENAMES = {
+    'Card No': 'Card_Number',
+    'Trans Date': 'TRANS_DATE',
+    'RRN': 'R_R_N',
+    'Amount': 'Purchase',
+    'Comm': 'Commission',
+    'NetPaid': 'Settlement_Amount',
+    'Merchant': 'store',
+}
+EQUITY_RENAMES = {
+    'Outlet_Name': 'store',
+    'Trans_Amount': 'Purchase',
+}
+
+# Aspire columns kept for reconciliation
+ASPIRE_COLUMNS = ['STORE_CODE', 'STORE_NAME', 'ZED_DATE', 'TILL', 'SESSION', 'RCT',
+                  'CUSTOMER_NAME', 'CARD_TYPE', 'CARD_NUMBER', 'card_check', 'AMOUNT',
+                  'REF_NO', 'RCT_TRN_DATE']
+
+# REF_NO is read as text so RRNs never pass through float
+ASPIRE_CSV_OPTIONS = {'dtype': {'REF_NO': str}}
+
+SUMMARY_COLUMNS = ['Aspire_Zed', 'kcb_paid', 'equity_paid', 'Gross_Banking', 'Variance',
+                   'kcb_recs', 'Equity_recs', 'Asp_Recs', 'Net_variance']
+
+# Largest Aspire vs bank amount difference (cents) the amount match accepts
+AMOUNT_TOLERANCE = 100
+
+# Largest gap between a bank TRANS_DATE and the Aspire RCT_TRN_DATE for the
+# card + amount pass
+CARD_WINDOW = pd.Timedelta(minutes=30)
+
+# Amount matching after the RRN match: 'cascade' pairs Aspire and bank rows
+# one-to-one through ``amount_passes``; 'notebook' flags each side from its
+# own consumed pool with the notebook's cells (``notebook_passes``)
+AMOUNT_MATCHING = ['cascade', 'notebook']
+
+# card_summary columns that are sums of rows; the rest are derived from them
+SUMMARY_MEASURES = ['Aspire_Zed', 'kcb_paid', 'equity_paid', 'kcb_recs', 'Equity_recs', 'Asp_Recs']
+PAID_MEASURES = {'KCB': 'kcb_paid', 'Equity': 'equity_paid'}
+RECS_MEASURES = {'KCB': 'kcb_recs', 'Equity': 'Equity_recs'}
+
+# Backends of reconcile_files: frames in memory, rows in an embedded SQLite
+# database (``recon.sqlite_backend``) for inputs too large for memory, or
+# Arrow tables run through pyarrow.compute kernels (``recon.arrow_backend``)
+BACKENDS = ['memory', 'sqlite', 'arrow']
+
+# Rough in-memory bytes per byte of input file: xlsx is compressed XML
+INPUT_EXPANSION = {'.xlsx': 10, '.xls': 10, '.csv': 4}
+DEFAULT_INPUT_EXPANSION = 4
+
+# Excel number format of the money columns in the summary sheets
+MONEY_FORMAT = '#,##0.00'
+REPORT_NUMBER_FORMATS = {'card_summary': dict.fromkeys(SUMMARY_COLUMNS, MONEY_FORMAT)}
+
+
+# ------------------ Load ------------------
+
+def _read_statement(source, name, cache=None, project=False):
+    options = {}
+    if project:
+        options['columns'] = STATEMENT_COLUMNS[name]
+    if STATEMENT_SKIPROWS.get(name):
+        options['skiprows'] = STATEMENT_SKIPROWS[name]
+    if cache is not None:
+        return cache.read(source, read_statement, **options)
+    return read_statement(source, **options)
+
+
+def _read_source(name, source, cache=None, project=False):
+    if name == 'Aspire':
+        if cache is not None:
+            return cache.read_csv(source, **ASPIRE_CSV_OPTIONS)
+        return pd.read_csv(source, **ASPIRE_CSV_OPTIONS)
+    return _read_statement(source, name, cache, project)
+
+
+def _load_source(name, source, cache=None, project=False, clean=False):
+    """Read, and with ``clean`` clean, one statement in a load worker.
+
+    Returns ``(df, timings)`` with a ``(stage, seconds, rows_in, rows_out)``
+    tuple per step for the caller's diagnostics.
+    """
+    start = time.perf_counter()
+    df = _read_source(name, source, cache, project)
+    timings = [(f'read {name}', time.perf_counter() - start, None, len(df))]
+    if clean and name in CLEANERS and not df.empty:
+        start, rows_in = time.perf_counter(), len(df)
+        df = CLEANERS[name](df)
+        timings.append((f'clean {name}', time.perf_counter() - start, rows_in, len(df)))
+    return df, timings
+
+
+def load_pool(workers=None):
+    """Worker processes for ``load_statements(executor=...)``.
+
+    Parsing a sheet is pure-Python work that holds the GIL, so the
+    statements are read in processes. They are forked from a server with the
+    engine preloaded: cheap to start, and safe to create from a threaded
+    server such as Streamlit's.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['recon.engine'])
+    workers = workers or min(4, os.cpu_count() or 1)
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def load_statements(kcb=None, equity=None, coop=None, aspire=None, key=None, cache=None,
+                    project=False, diagnostics=None, clean=False, executor=None):
+    """Read whichever statements were supplied (paths or file-like objects).
+
+    Returns ``(dfs, key)`` where ``dfs`` has an entry, possibly empty, for
+    every bank in ``BANKS``. ``cache`` is an optional ``ParseCache``;
+    ``project=True`` keeps only the columns the reconciliation uses (see
+    ``xlsx_reader.STATEMENT_COLUMNS``). ``diagnostics`` (a
+    ``RunDiagnostics``) gets one stage per file read. ``clean=True`` also
+    runs each statement's cleaner (see ``clean_statements``) right after
+    reading it.
+
+    With an ``executor`` (see ``load_pool``, or a number of worker processes
+    to start for this call) the Excel statements are read and cleaned in
+    parallel while the Aspire CSV, whose parser releases the GIL, is read
+    here; the call takes about as long as the slowest file. File-like
+    sources are sent to the workers whole, and the workers see only the
+    disk level of ``cache``.
+    """
+    sources = {'KCB': kcb, 'Equity': equity, 'Co-op': coop, 'Aspire': aspire, 'key': key}
+    sources = {name: source for name, source in sources.items() if source is not None}
+    own_pool = isinstance(executor, int)
+    if own_pool:
+        executor = load_pool(executor)
+    try:
+        futures = {}
+        if executor is not None:
+            futures = {name: executor.submit(_load_source, name, source, cache, project, clean)
+                       for name, source in sources.items() if name != 'Aspire'}
+
+        frames = {}
+        for name, source in sources.items():
+            if name in futures:
+                continue
+            with stage(diagnostics, f'read {name}') as record:
+                frames[name] = record.out(_read_source(name, source, cache, project))
+            if clean and name in CLEANERS and not frames[name].empty:
+                with stage(diagnostics, f'clean {name}', frames[name]) as record:
+                    frames[name] = record.out(CLEANERS[name](frames[name]))
+
+        for name, future in futures.items():
+            frames[name], timings = future.result()
+            if diagnostics is not None:
+                for stage_name, seconds, rows_in, rows_out in timings:
+                    diagnostics.add(stage_name, seconds, rows_in, rows_out)
+    finally:
+        if own_pool:
+            executor.shutdown()
+    dfs = {bank: frames.get(bank, pd.DataFrame()) for bank in BANKS}
+    return dfs, frames.get('key', pd.DataFrame())
+
+
+# ------------------ Normalize ------------------
+
+def clean_kcb(df):
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+    df = df.drop_duplicates(subset=['RRN', 'Amount'], keep='first')
+    df['Source'] = pd.Series('KCB', index=df.index, dtype=SOURCE_DTYPE)
+    return df
+
+
+def clean_equity(df):
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df['Commission'] = pd.to_numeric(df['Commission'], errors='coerce')
+    df = df.sort_values(by='Commission', na_position='first')
+    df = df.drop_duplicates(subset='R_R_N', keep='first')
+    df['Source'] = pd.Series('Equity', index=df.index, dtype=SOURCE_DTYPE)
+    return df
+
+
+def clean_coop(df):
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df['BANK COMM'] = pd.to_numeric(df['BANK COMM'], errors='coerce')
+    df = df.sort_values(by='BANK COMM', na_position='first')
+    df = df.drop_duplicates(subset='RRN CODE', keep='first')
+    df['Source'] = pd.Series('Co-op', index=df.index, dtype=SOURCE_DTYPE)
+    return df.dropna(subset=["TRANSACTION DATE"]).reset_index(drop=True)
+
+
+def clean_aspire(df):
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df['Source'] = pd.Series('Aspire', index=df.index, dtype=SOURCE_DTYPE)
+    return df
+
+
+CLEANERS = {
+    'KCB': clean_kcb,
+    'Equity': clean_equity,
+    'Co-op': clean_coop,
+    'Aspire': clean_aspire,
+}
+
+
+def clean_statements(dfs):
+    """Per-bank cleaning: strip headers, numeric amounts, de-duplicate, tag Source."""
+    return {bank: CLEANERS[bank](df) if not df.empty else df for bank, df in dfs.items()}
+
+
+def build_merged_cards(dfs, key=None, diagnostics=None):
+    """KCB and Equity rows in the common schema with card_check and branch."""
+    frames = []
+    if not dfs['KCB'].empty:
+        kcb = dfs['KCB'].rename(columns=KCB_RENAMES)
+        kcb['Cash_Back'] = kcb['Purchase'].where(kcb['Purchase'] < 0, 0).abs()
+        frames.append(kcb.reindex(columns=BANK_COLUMNS))
+    if not dfs['Equity'].empty:
+        equity = dfs['Equity']
+        equity = equity.rename(columns={
+            old: new for old, new in EQUITY_RENAMES.items() if new not in equity.columns
+        })
+        frames.append(equity.reindex(columns=BANK_COLUMNS))
+    if not frames:
+        return pd.DataFrame(columns=BANK_COLUMNS + ['branch', 'card_check', 'card_token'])
+
+    with stage(diagnostics, 'concat', frames) as record:
+        merged_cards = pd.concat(frames, ignore_index=True)
+
+        # Drop rows without a card number, then exact duplicates and blank TIDs
+        merged_cards = merged_cards[~is_blank(merged_cards['Card_Number'])]
+        merged_cards = merged_cards.drop_duplicates()
+        merged_cards = merged_cards[~is_blank(merged_cards['TID'])].reset_index(drop=True)
+        # Terminal and store text repeats on every row: keep it dictionary-encoded
+        for col in ['TID', 'store']:
+            merged_cards[col] = encode(merged_cards[col])
+
+        # Amounts are integer cents from here on (see recon.amounts)
+        for col in ['Purchase', 'Commission', 'Settlement_Amount', 'Cash_Back']:
+            merged_cards[col] = to_cents(merged_cards[col]).array
+        record.out(merged_cards)
+
+    with stage(diagnostics, 'normalize_cards', merged_cards) as record:
+        cards = record.out(normalize_cards(merged_cards['Card_Number']))
+        merged_cards[cards.columns] = cards
+
+    with stage(diagnostics, 'resolve_branches', merged_cards) as record:
+        if key is not None and not key.empty:
+            resolver = BranchResolver.from_key(key)
+        else:
+            resolver = BranchResolver({})
+        # Resolved once per distinct store rather than once per row
+        merged_cards['branch'] = map_categories(
+            merged_cards['store'], lambda stores: resolver.resolve(stores.astype(str).str.strip()))
+        record.out(merged_cards)
+    return merged_cards
+
+
+def prepare_aspire(aspire):
+    """Aspire rows reduced to the reconciliation columns, with card_check."""
+    aspire = aspire.copy()
+    aspire['card_check'] = normalize_cards(aspire['CARD_NUMBER'])['card_check']
+    aspire = aspire[[col for col in ASPIRE_COLUMNS if col in aspire.columns]]
+    aspire['AMOUNT'] = to_cents(aspire['AMOUNT']).array
+    for col in ['STORE_NAME', 'ZED_DATE', 'TILL', 'CUSTOMER_NAME', 'CARD_TYPE']:
+        if col in aspire.columns:
+            aspire[col] = encode(aspire[col]).array
+    return aspire.reset_index(drop=True)
+
+
+# ------------------ RRN match ------------------
+
+def index_bank_rrns(merged_cards):
+    """Add the normalized ``REF_NO`` to merged_cards and return its ``RRNIndex``.
+
+    The index totals the bank Purchase per RRN, so an RRN on several bank
+    rows is matched against their sum (see ``rrn_duplicates``).
+    """
+    merged_cards['REF_NO'] = normalize_rrns(merged_cards['R_R_N']).array
+    return RRNIndex(merged_cards['REF_NO'], merged_cards['Purchase'])
+
+
+def probe_rrns(aspire, rrn_index):
+    """Look up each Aspire REF_NO in the bank ``RRNIndex``.
+
+    Adds ``rrn_rows`` (bank rows with the RRN), ``rrn_check`` (their
+    Purchase total, 0 if none) and ``val_check``. Returns ``(aspire, match)``
+    with the ``RRNMatch``.
+    """
+    aspire['REF_NO'] = normalize_rrns(aspire['REF_NO']).array
+    match = rrn_index.probe(aspire['REF_NO'])
+    aspire['rrn_rows'] = match.bank_rows
+    aspire['rrn_check'] = pd.array(match.bank_amount, dtype=CENTS_DTYPE)
+    aspire['val_check'] = aspire['AMOUNT'] - aspire['rrn_check']
+    return aspire, match
+
+
+def mark_checked_rows(merged_cards, bank_seen):
+    """``Cheked_rows`` is 'Yes' for bank rows whose RRN appeared in Aspire."""
+    merged_cards['Cheked_rows'] = np.where(bank_seen, 'Yes', 'No')
+    return merged_cards
+
+
+def rrn_duplicates(merged_cards, rrn_index):
+    """Bank rows that share their RRN with another bank row."""
+    return merged_cards[rrn_index.duplicated]
+
+
+def match_rrn(aspire, merged_cards):
+    """Look up each Aspire REF_NO in the bank RRNs.
+
+    Adds ``REF_NO``/``Cheked_rows`` to merged_cards and ``rrn_rows``,
+    ``rrn_check`` and ``val_check`` to aspire (see ``probe_rrns``).
+    """
+    merged_cards = merged_cards.copy()
+    aspire, match = probe_rrns(aspire.copy(), index_bank_rrns(merged_cards))
+    return aspire, mark_checked_rows(merged_cards, match.bank_seen)
+
+
+# ------------------ Amount match ------------------
+
+def _name_key(names, collapse_spaces=False):
+    # Cleaned once per category (see recon.categories)
+    def clean(names):
+        cleaned = names.astype(str).str.strip()
+        if collapse_spaces:
+            cleaned = cleaned.str.replace(r'\s+', '', regex=True)
+        return cleaned.str.upper().where(names.notna())
+    return map_categories(names, clean)
+
+
+def _shillings(cents, to_shillings):
+    # Whole shillings as the notebook's astype(int) (np.trunc) or round() made them
+    shillings = to_shillings(pd.Series(cents).astype('Float64').to_numpy(float, na_value=np.nan)
+                             / 100)
+    return pd.Series(shillings).astype('Int64').array
+
+
+def _card_key(tokens):
+    # Blank card_checks hash to token 0 and never match
+    tokens = np.asarray(tokens, dtype=np.int64)
+    return pd.arrays.IntegerArray(tokens, tokens == 0)
+
+
+# Match keys of the residual rows per side (see ``recon.cascade``)
+ASPIRE_KEYS = {
+    'branch': lambda df: _name_key(df['STORE_NAME']),
+    'branch_compact': lambda df: _name_key(df['STORE_NAME'], collapse_spaces=True),
+    'amount': lambda df: df['AMOUNT'],
+    'shillings': lambda df: _shillings(df['AMOUNT'], np.trunc),
+    'shillings_rounded': lambda df: _shillings(df['AMOUNT'], np.round),
+    'card': lambda df: _card_key(card_tokens(df['card_check'].fillna(''))),
+    'time': lambda df: timestamp_key(df['RCT_TRN_DATE']),
+}
+BANK_KEYS = {
+    'branch': lambda df: _name_key(df['branch']),
+    'branch_compact': lambda df: _name_key(df['branch'], collapse_spaces=True),
+    'amount': lambda df: df['Purchase'],
+    'shillings': lambda df: _shillings(df['Purchase'], np.trunc),
+    'shillings_rounded': lambda df: _shillings(df['Purchase'], np.round),
+    'card': lambda df: _card_key(df['card_token']),
+    'time': lambda df: timestamp_key(df['TRANS_DATE']),
+}
+
+
+def notebook_passes():
+    """The notebook's amount cells, each flagging one side from its own pool.
+
+    check_and_consume flags Aspire rows on branch + whole shillings,
+    consuming from every open bank row. The bank side is flagged separately
+    against every open Aspire row: rows whose spaceless branch and rounded
+    amount occur in Aspire at all (the notebook's Matchable filter), then
+    match_and_trace on spaceless branch + whole shillings, one bank row per
+    Aspire key. No rows are paired, so ``Amount_diff`` stays missing.
+    """
+    return [
+        flag_pass('check_and_consume', ['branch', 'shillings'], 'left', 'all'),
+        flag_pass('matchable', ['branch_compact', 'shillings_rounded'], 'right', 'any'),
+        flag_pass('match_and_trace', ['branch_compact', 'shillings'], 'right', 'distinct'),
+    ]
+
+
+def amount_passes(tolerance=AMOUNT_TOLERANCE, card_window=CARD_WINDOW, matching='cascade'):
+    """The passes after the RRN match.
+
+    Card fingerprint + amount within ``card_window`` of the bank time (left
+    out when ``card_window`` is None), then exact branch + amount, then
+    branch + amount within ``tolerance`` cents. Every pass pairs rows
+    one-to-one and flags both rows of a pair, which is where its output
+    differs from the notebook's. ``matching='notebook'`` returns
+    ``notebook_passes()`` instead and ignores the other options.
+    """
+    if matching not in AMOUNT_MATCHING:
+        raise ValueError(f'unknown amount matching {matching!r}; '
+                         f'expected one of {", ".join(AMOUNT_MATCHING)}')
+    if matching == 'notebook':
+        return notebook_passes()
+    passes = []
+    if card_window is not None:
+        passes.append(window_pass('card_amount_time', ['card', 'amount'], 'time', card_window))
+    passes += [
+        exact_pass('branch_amount', ['branch', 'amount']),
+        nearest_pass('branch_tolerance', 'branch_compact', 'amount', tolerance),
+    ]
+    return passes
+
+
+def match_amounts(aspire, merged_cards, tolerance=AMOUNT_TOLERANCE, passes=None,
+                  card_window=CARD_WINDOW, aspire_keys=None, bank_keys=None):
+    """Match the rows the RRN match left open through a cascade of passes.
+
+    Returns ``(newaspire, newmerged_cards, stats)``: Aspire rows with no RRN
+    hit and bank rows whose RRN was not seen in Aspire, each with
+    ``Amount_check`` 'Okay' when a pass matched it (paired one-to-one with a
+    row on the other side, or flagged by one of ``notebook_passes``),
+    ``Match_pass`` naming the pass and ``Amount_diff`` (Aspire minus bank,
+    in cents) for a pair, plus the per-pass counts and timings.
+    ``passes`` defaults to ``amount_passes(tolerance, card_window)``;
+    ``aspire_keys``/``bank_keys`` replace ``ASPIRE_KEYS``/``BANK_KEYS``.
+    """
+    newaspire = aspire[aspire['rrn_check'] <= 0].copy()
+    newmerged_cards = merged_cards[merged_cards['Cheked_rows'] == 'No'].copy()
+
+    passes = amount_passes(tolerance, card_window) if passes is None else passes
+    # Text keys of both sides are coded in one dictionary, so passes join on integers
+    dictionary = KeyDictionary()
+    result = run_cascade(passes, KeyTable(newaspire, aspire_keys or ASPIRE_KEYS, dictionary),
+                         KeyTable(newmerged_cards, bank_keys or BANK_KEYS, dictionary))
+
+    newaspire['Amount_check'] = np.where(result.left_mask, OKAY, FALSE)
+    newaspire['Match_pass'] = result.left_pass
+    newaspire['Amount_diff'] = result.left_diff
+    newmerged_cards['Amount_check'] = np.where(result.right_mask, OKAY, FALSE)
+    newmerged_cards['Match_pass'] = result.right_pass
+    newmerged_cards['Amount_diff'] = result.right_diff
+    return newaspire, newmerged_cards, result.stats
+
+
+# ------------------ card_summary ------------------
+
+def aspire_zed(aspire):
+    """Aspire AMOUNT per STORE_NAME."""
+    return aspire.groupby('STORE_NAME', observed=True)['AMOUNT'].sum()
+
+
+def _measure_rows(stores, measures, amounts):
+    # ``measures`` is one name for every row or a per-row array of names
+    measures = np.broadcast_to(np.asarray(measures, dtype=object), len(stores))
+    return pd.DataFrame({
+        'STORE_NAME': stores,
+        'measure': pd.Categorical(measures, categories=SUMMARY_MEASURES),
+        'amount': pd.array(amounts, dtype=CENTS_DTYPE),
+    })
+
+
+def build_card_summary(zed, merged_cards, newaspire, newmerged_cards):
+    """Per-store Aspire vs bank totals, reconciling items and variances.
+
+    ``zed`` is the Aspire total per store (see ``aspire_zed``); its stores,
+    sorted, are the summary rows. Every summed measure comes from one
+    grouped aggregation over a long (store, measure, amount) frame; the
+    derived columns and the TOTAL row are added afterwards.
+    """
+    bank_false = newmerged_cards[newmerged_cards['Amount_check'] == FALSE]
+    aspire_false = newaspire[newaspire['Amount_check'] == FALSE]
+    # Aspire stores and bank branches on one dictionary, so the long frame groups on codes
+    zed_stores, branches, false_branches, false_stores = (
+        column.array for column in share(zed.index.to_series(), merged_cards['branch'],
+                                         bank_false['branch'], aspire_false['STORE_NAME']))
+    long = pd.concat([
+        _measure_rows(zed_stores, 'Aspire_Zed', zed.to_numpy()),
+        _measure_rows(branches, merged_cards['Source'].map(PAID_MEASURES),
+                      merged_cards['Purchase']),
+        _measure_rows(false_branches, bank_false['Source'].map(RECS_MEASURES),
+                      bank_false['Purchase']),
+        _measure_rows(false_stores, 'Asp_Recs', aspire_false['AMOUNT']),
+    ], ignore_index=True)
+
+    sums = long.groupby(['STORE_NAME', 'measure'], observed=True)['amount'].sum()
+    return card_summary_from_sums(zed.index, sums)
+
+
+def card_summary_from_sums(stores, sums):
+    """card_summary rows for ``stores`` (sorted) from their summed measures.
+
+    ``sums`` is indexed by (STORE_NAME, measure), one of ``SUMMARY_MEASURES``;
+    missing pairs count as 0.
+    """
+    card_summary = (
+        sums.unstack('measure')
+        .reindex(index=pd.Index(stores, dtype=object).sort_values(), columns=SUMMARY_MEASURES)
+        .fillna(0)
+        .rename_axis(index='STORE_NAME', columns=None)
+        .reset_index()
+    )
+    card_summary.insert(0, 'No', range(1, len(card_summary) + 1))
+
+    card_summary['Gross_Banking'] = card_summary['kcb_paid'] + card_summary['equity_paid']
+    card_summary['Variance'] = card_summary['Gross_Banking'] - card_summary['Aspire_Zed']
+    card_summary['Net_variance'] = (
+        card_summary['Variance']
+        - card_summary['kcb_recs']
+        - card_summary['Equity_recs']
+        + card_summary['Asp_Recs']
+    )
+    card_summary = card_summary[['No', 'STORE_NAME'] + SUMMARY_COLUMNS]
+
+    total_row = {'No': '', 'STORE_NAME': 'TOTAL'}
+    total_row.update(card_summary[SUMMARY_COLUMNS].sum())
+    return pd.concat([card_summary, pd.DataFrame([total_row])], ignore_index=True)
+
+
+# ------------------ Report ------------------
+
+class Reconciliation:
+    """Frames produced by one reconciliation run.
+
+    Amounts in the engine's frames are ``Int64`` cents (``recon.amounts``);
+    ``report_sheets`` converts them back to shillings. ``match_stats`` has
+    the rows in and matched, and the seconds taken, per matching pass.
+    """
+
+    def __init__(self, dfs, key, merged_cards, aspire=None, newaspire=None,
+                 newmerged_cards=None, card_summary=None, rrn_duplicates=None,
+                 match_stats=None):
+        self.dfs = dfs
+        self.key = key
+        self.merged_cards = merged_cards
+        self.aspire = aspire
+        self.newaspire = newaspire
+        self.newmerged_cards = newmerged_cards
+        self.card_summary = card_summary
+        self.rrn_duplicates = rrn_duplicates
+        self.match_stats = match_stats
+
+    @property
+    def matched(self):
+        return self.card_summary is not None
+
+    def exceptions(self):
+        """Unreconciled items per side: Asp_Recs, Equity_recs and kcb_recs."""
+        if not self.matched:
+            return {}
+        bank_false = self.newmerged_cards[self.newmerged_cards['Amount_check'] == FALSE]
+        return {
+            'Asp_Recs': self.newaspire[self.newaspire['Amount_check'] == FALSE],
+            'Equity_recs': bank_false[bank_false['Source'] == 'Equity'],
+            'kcb_recs': bank_false[bank_false['Source'] == 'KCB'],
+        }
+
+    def report_sheets(self):
+        """Sheets of the notebook's Reconciliation_Report.xlsx, in order, in shillings."""
+        if not self.matched:
+            return {'merged_cards': from_cents(self.merged_cards)}
+        sheets = {'card_summary': self.card_summary}
+        sheets.update(self.exceptions())
+        if self.rrn_duplicates is not None and not self.rrn_duplicates.empty:
+            sheets['RRN_Duplicates'] = self.rrn_duplicates
+        sheets['merged_cards'] = self.merged_cards
+        if self.aspire is not None:
+            sheets['aspire'] = self.aspire
+        return {name: from_cents(df) for name, df in sheets.items()}
+
+    def download_sheets(self, carried_sheets=None):
+        """Sheets of the app's downloadable report, in order, in shillings.
+
+        card_summary, the exception sheets and RRN_Duplicates, then
+        ``carried_sheets`` (see ``CarryForwardStore.report_sheets``),
+        Reconciled_Transactions and one ``<bank>_Raw_Data`` sheet per
+        statement (``export.export_report(include_raw=False)`` drops those).
+        """
+        merged_cards = self.merged_cards
+        sheets = {}
+        # card_summary and exception sheets from the reconciliation
+        if self.matched:
+            sheets['card_summary'] = from_cents(self.card_summary)
+            sheets.update({name: from_cents(df) for name, df in self.exceptions().items()})
+            if self.rrn_duplicates is not None and not self.rrn_duplicates.empty:
+                sheets['RRN_Duplicates'] = from_cents(self.rrn_duplicates)
+        sheets.update(carried_sheets or {})
+
+        if not merged_cards.empty:
+            sheets['Reconciled_Transactions'] = reconciled_transactions(from_cents(merged_cards))
+
+        # Add individual bank sheets
+        for bank, df in self.dfs.items():
+            if not df.empty:
+                sheets[f'{bank}_Raw_Data'] = df
+        return sheets
+
+
+def reconciled_transactions(merged_cards):
+    """merged_cards rows (in shillings) formatted as the Reconciled_Transactions sheet."""
+    report_df = merged_cards.copy()
+    report_df['Transaction_Date'] = (pd.to_datetime(report_df['TRANS_DATE'])
+                                     .dt.strftime('%Y-%m-%d %H:%M:%S'))
+    return report_df[[
+        'Transaction_Date', 'branch', 'Card_Number', 'Purchase',
+        'Commission', 'Settlement_Amount', 'Source', 'R_R_N', 'TID'
+    ]]
+
+
+def write_report(sheets, target, number_formats=None):
+    """Write ``{sheet name: frame}`` to an xlsx path or buffer (see ``recon.export``).
+
+    ``number_formats`` maps sheet -> column -> Excel number format and
+    defaults to ``REPORT_NUMBER_FORMATS``.
+    """
+    from recon.export import write_sheets
+
+    write_sheets(sheets, target,
+                 number_formats=REPORT_NUMBER_FORMATS if number_formats is None else number_formats)
+
+
+def _dump(debug_dir, name, df):
+    if debug_dir and df is not None:
+        os.makedirs(debug_dir, exist_ok=True)
+        from_cents(df).to_csv(os.path.join(debug_dir, f'{name}.csv'), index=False)
+
+
+def reconcile(dfs, key=None, debug_dir=None, aspire_source=None, chunk_bytes=None,
+              keep_aspire=True, amount_tolerance=AMOUNT_TOLERANCE, card_window=CARD_WINDOW,
+              diagnostics=None, cleaned=False, matching='cascade'):
+    """Run every stage on already-loaded frames and return a ``Reconciliation``.
+
+    With ``aspire_source`` (a path or file-like CSV) Aspire is streamed in
+    chunks of ``chunk_bytes`` instead of being taken from ``dfs['Aspire']``;
+    ``keep_aspire=False`` then also drops the full aspire sheet so memory
+    stays bounded by the chunk size. ``amount_tolerance`` (cents) is the
+    largest difference the amount match accepts and ``card_window`` the
+    largest time gap of the card + amount pass (None leaves it out).
+    ``matching`` is one of ``AMOUNT_MATCHING`` (see ``amount_passes``).
+    ``diagnostics`` (a ``RunDiagnostics``) records every stage.
+    ``cleaned=True`` skips ``clean_statements`` for frames loaded with
+    ``load_statements(clean=True)``.
+
+    Matching and the card_summary need both Aspire and bank rows; without
+    them only the cleaned statements and merged_cards are produced.
+    """
+    if not cleaned:
+        with stage(diagnostics, 'clean_statements', dfs) as record:
+            dfs = record.out(clean_statements(dfs))
+    with stage(diagnostics, 'build_merged_cards', [dfs['KCB'], dfs['Equity']]) as record:
+        merged_cards = record.out(build_merged_cards(dfs, key, diagnostics))
+    _dump(debug_dir, 'merged_cards', merged_cards)
+
+    has_aspire = aspire_source is not None or not dfs['Aspire'].empty
+    if not has_aspire or merged_cards.empty:
+        return Reconciliation(dfs, key, merged_cards)
+
+    with stage(diagnostics, 'index_bank_rrns', merged_cards) as record:
+        rrn_index = index_bank_rrns(merged_cards)
+        record.out(len(rrn_index))
+    if aspire_source is not None:
+        from recon.aspire_stream import DEFAULT_CHUNK_BYTES, stream_aspire
+
+        with stage(diagnostics, 'stream_aspire') as record:
+            stream = stream_aspire(aspire_source, rrn_index, chunk_bytes or DEFAULT_CHUNK_BYTES,
+                                   keep_rows=keep_aspire)
+            bank_seen = stream.bank_seen
+            aspire, residuals, zed = stream.aspire, stream.residuals, stream.zed
+            record.out(residuals)
+    else:
+        with stage(diagnostics, 'prepare_aspire', dfs['Aspire']) as record:
+            aspire = record.out(prepare_aspire(dfs['Aspire']))
+        _dump(debug_dir, 'aspire_filtered', aspire)
+        with stage(diagnostics, 'probe_rrns', aspire) as record:
+            aspire, match = probe_rrns(aspire, rrn_index)
+            bank_seen = match.bank_seen
+            residuals, zed = aspire, aspire_zed(aspire)
+            record.out(int((aspire['rrn_check'] <= 0).sum()))
+    merged_cards = mark_checked_rows(merged_cards, bank_seen)
+    duplicates = rrn_duplicates(merged_cards, rrn_index)
+
+    with stage(diagnostics, 'match_amounts', [residuals, merged_cards]) as record:
+        newaspire, newmerged_cards, match_stats = match_amounts(
+            residuals, merged_cards,
+            passes=amount_passes(amount_tolerance, card_window, matching))
+        record.out([newaspire, newmerged_cards])
+    _dump(debug_dir, 'newaspire', newaspire)
+    _dump(debug_dir, 'newmerged_cards', newmerged_cards)
+
+    with stage(diagnostics, 'card_summary', merged_cards) as record:
+        card_summary = record.out(build_card_summary(zed, merged_cards, newaspire,
+                                                     newmerged_cards))
+    _dump(debug_dir, 'card_summary', card_summary)
+    return Reconciliation(dfs, key, merged_cards, aspire, newaspire, newmerged_cards,
+                          card_summary, duplicates, match_stats)
+
+
+def _source_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if hasattr(source, 'getbuffer'):
+        return source.getbuffer().nbytes
+    if getattr(source, 'size', None) is not None:
+        return source.size
+    pos = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(pos)
+    return size
+
+
+def estimate_memory(sources):
+    """Rough in-memory bytes of the frames built from ``{name: source}``."""
+    total = 0
+    for source in sources.values():
+        if source is None:
+            continue
+        name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+        expansion = INPUT_EXPANSION.get(os.path.splitext(str(name))[1].lower(),
+                                        DEFAULT_INPUT_EXPANSION)
+        total += _source_bytes(source) * expansion
+    return total
+
+
+def memory_limit():
+    """Estimated input size above which ``reconcile_files`` leaves memory for SQLite.
+
+    ``RECON_MEMORY_LIMIT_MB`` if set, else half the physical memory (4 GiB
+    where that is unknown).
+    """
+    if os.environ.get('RECON_MEMORY_LIMIT_MB'):
+        return int(os.environ['RECON_MEMORY_LIMIT_MB']) * 1024 * 1024
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        return 4 * 1024 ** 3
+
+
+def choose_backend(sources, limit=None):
+    """'sqlite' when ``estimate_memory(sources)`` exceeds ``limit``, else 'memory'."""
+    limit = memory_limit() if limit is None else limit
+    return 'sqlite' if estimate_memory(sources) > limit else 'memory'
+
+
+def reconcile_stages(stream_aspire=False):
+    """Top-level stages ``reconcile_files`` records for a full run, in order."""
+    aspire_stages = ['stream_aspire'] if stream_aspire else ['prepare_aspire', 'probe_rrns']
+    return (['load_statements', 'build_merged_cards', 'index_bank_rrns']
+            + aspire_stages + ['match_amounts', 'card_summary'])
+
+
+def reconcile_files(kcb=None, equity=None, coop=None, aspire=None, key=None, cache=None,
+                    debug_dir=None, stream_aspire=False, chunk_bytes=None, project=False,
+                    amount_tolerance=AMOUNT_TOLERANCE, card_window=CARD_WINDOW,
+                    diagnostics=None, executor=None, backend='auto', db_path=None,
+                    matching='cascade'):
+    """Load and clean the given statement files and reconcile them.
+
+    ``stream_aspire=True`` reads the Aspire CSV in bounded chunks (see
+    ``recon.aspire_stream``) rather than loading it whole; ``project=True``
+    reads only the statement columns the reconciliation uses. ``executor``
+    loads the statements in parallel (see ``load_statements``).
+    ``matching`` picks the amount matching of every backend (see
+    ``amount_passes``).
+
+    ``backend`` is one of ``BACKENDS``; 'auto' picks 'sqlite' when the
+    estimated size of the inputs exceeds ``memory_limit()``. The SQLite
+    backend returns a ``sqlite_backend.SQLiteReconciliation`` whose
+    database is ``db_path`` (a temporary file by default); it always streams
+    Aspire and ignores ``debug_dir``, ``stream_aspire`` and ``executor``.
+    'arrow' (never picked by 'auto') returns a ``Reconciliation`` like the
+    in-memory path and ignores ``debug_dir`` and ``stream_aspire``.
+    """
+    # A bad RECON_CARD_TOKEN_KEY fails here rather than after the files are read
+    resolve_token_key()
+    if backend == 'auto':
+        backend = choose_backend({'kcb': kcb, 'equity': equity, 'coop': coop,
+                                  'aspire': aspire, 'key': key})
+    if backend not in BACKENDS:
+        raise ValueError(f'unknown backend {backend!r}; expected one of {", ".join(BACKENDS)}')
+    if backend == 'sqlite':
+        from recon import sqlite_backend
+
+        return sqlite_backend.reconcile_files(
+            kcb, equity, coop, aspire, key, cache=cache, project=project,
+            chunk_bytes=chunk_bytes, amount_tolerance=amount_tolerance,
+            card_window=card_window, diagnostics=diagnostics, db_path=db_path,
+            matching=matching)
+    if backend == 'arrow':
+        from recon import arrow_backend
+
+        return arrow_backend.reconcile_files(
+            kcb, equity, coop, aspire, key, cache=cache, project=project,
+            amount_tolerance=amount_tolerance, card_window=card_window,
+            diagnostics=diagnostics, executor=executor, matching=matching)
+
+    options = {'debug_dir': debug_dir, 'amount_tolerance': amount_tolerance,
+               'card_window': card_window, 'diagnostics': diagnostics, 'cleaned': True,
+               'matching': matching}
+    with stage(diagnostics, 'load_statements') as record:
+        dfs, key_df = load_statements(kcb, equity, coop, None if stream_aspire else aspire, key,
+                                      cache=cache, project=project, diagnostics=diagnostics,
+                                      clean=True, executor=executor)
+        record.out(dfs)
+    if stream_aspire:
+        return reconcile(dfs, key_df, aspire_source=aspire, chunk_bytes=chunk_bytes,
+                         keep_aspire=False, **options)
+    return reconcile(dfs, key_df, **options)
@@ -0,0 +1,177 @@
+"""Streaming xlsx export.
+
+xlsxwriter's ``constant_memory`` mode flushes each row to disk as soon as
+the next one starts, but only if rows are written in order; pandas'
+``to_excel`` writes column by column, so ``write_sheets`` writes the cells
+itself, a block of rows at a time. The workbook goes to a file (by default
+a temporary one) instead of being assembled in memory.
+
+A sheet may also be given as an iterable of frames (e.g. rows streamed out
+of ``recon.sqlite_backend``); its chunks are written one after another and
+continue on a numbered sheet when one reaches Excel's row limit.
+"""
+import datetime
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1048576
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows converted to Python values at a time
+BLOCK_ROWS = 50_000
+
+# Same cell formats as pandas' xlsxwriter writer
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+def _column_values(column):
+    """Python values of one column block, ``None`` for blanks."""
+    if column.dtype.kind == 'M':
+        if getattr(column.dt, 'tz', None) is not None:
+            column = column.dt.tz_localize(None)
+        values = column.to_numpy(dtype=object)
+    elif isinstance(column.dtype, np.dtype) and column.dtype.kind in 'iub':
+        return column.tolist()
+    else:
+        values = column.to_numpy(dtype=object, copy=True)
+    values[pd.isna(column).to_numpy()] = None
+    return values.tolist()
+
+
+def _cell_writer(ws, dtype, datetime_format, number_format=None):
+    if dtype.kind == 'b' and isinstance(dtype, np.dtype):
+        return ws.write_boolean
+    if dtype.kind in 'iuf':
+        if number_format is not None:
+            return lambda row, col, value: ws.write_number(row, col, value, number_format)
+        return ws.write_number
+    if dtype.kind == 'M':
+        return lambda row, col, value: ws.write_datetime(row, col, value, datetime_format)
+
+    def write_any(row, col, value):
+        if isinstance(value, str):
+            ws.write_string(row, col, value)
+        elif isinstance(value, datetime.datetime):
+            ws.write_datetime(row, col, value.replace(tzinfo=None), datetime_format)
+        elif isinstance(value, (bool, int, float, np.number, datetime.date, datetime.time)):
+            ws.write(row, col, value)
+        else:
+            ws.write_string(row, col, str(value))
+    return write_any
+
+
+def _write_header(ws, columns, header_format):
+    for col, name in enumerate(columns):
+        ws.write_string(0, col, str(name), header_format)
+
+
+def _write_rows(ws, df, first_row, datetime_format, number_formats):
+    writers = [_cell_writer(ws, dtype, datetime_format, number_formats.get(name))
+               for name, dtype in df.dtypes.items()]
+    for start in range(0, len(df), BLOCK_ROWS):
+        block = df.iloc[start:start + BLOCK_ROWS]
+        columns = [_column_values(block.iloc[:, i]) for i in range(block.shape[1])]
+        for offset, row in enumerate(zip(*columns)):
+            excel_row = first_row + start + offset
+            for col, value in enumerate(row):
+                if value is not None:
+                    writers[col](excel_row, col, value)
+
+
+def write_frame(ws, df, header_format, datetime_format, number_formats=None):
+    """Write ``df`` (header row first) to a worksheet in row order.
+
+    ``number_formats`` maps column names to xlsxwriter formats for their
+    numeric cells.
+    """
+    if len(df) + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f'{len(df):,} rows do not fit in one Excel sheet')
+    _write_header(ws, df.columns, header_format)
+    _write_rows(ws, df, 1, datetime_format, number_formats or {})
+
+
+def _part_name(name, part):
+    # Sheet names are limited to 31 characters
+    suffix = f' ({part})'
+    return name[:31 - len(suffix)] + suffix
+
+
+def write_chunks(workbook, name, chunks, header_format, datetime_format, number_formats=None):
+    """Write an iterable of frames as sheet ``name``, in order.
+
+    The header comes from the first chunk. When a sheet is full the rows
+    continue on ``name (2)``, ``name (3)``, ... with the header repeated.
+    Returns the number of sheets written.
+    """
+    number_formats = number_formats or {}
+    ws, row, parts = None, 0, 0
+    for df in chunks:
+        start = 0
+        while ws is None or start < len(df):
+            if ws is None or row == EXCEL_MAX_ROWS:
+                parts += 1
+                ws = workbook.add_worksheet(name if parts == 1 else _part_name(name, parts))
+                _write_header(ws, df.columns, header_format)
+                row = 1
+            take = min(len(df) - start, EXCEL_MAX_ROWS - row)
+            _write_rows(ws, df.iloc[start:start + take], row, datetime_format, number_formats)
+            row += take
+            start += take
+    if ws is None:
+        workbook.add_worksheet(name)
+        parts = 1
+    return parts
+
+
+def write_sheets(sheets, target, constant_memory=True, number_formats=None):
+    """Write ``{sheet name: frame}`` to an xlsx path or buffer.
+
+    ``number_formats`` maps sheet -> column -> Excel number format (e.g.
+    ``'#,##0.00'``), so numbers stay numeric and Excel formats them. A sheet
+    that is not a DataFrame is taken as an iterable of frames (see
+    ``write_chunks``). Buffers are built in memory (``constant_memory``
+    needs a file).
+    """
+    import xlsxwriter
+
+    if isinstance(target, (str, os.PathLike)):
+        options = {'constant_memory': constant_memory}
+    else:
+        options = {'in_memory': True}
+    workbook = xlsxwriter.Workbook(target, options)
+    try:
+        header_format = workbook.add_format(HEADER_FORMAT)
+        datetime_format = workbook.add_format({'num_format': DATETIME_FORMAT})
+        formats = {}
+        for name, df in sheets.items():
+            column_formats = {}
+            for column, num_format in (number_formats or {}).get(name, {}).items():
+                if num_format not in formats:
+                    formats[num_format] = workbook.add_format({'num_format': num_format})
+                column_formats[column] = formats[num_format]
+            if isinstance(df, pd.DataFrame):
+                write_frame(workbook.add_worksheet(name), df, header_format, datetime_format,
+                            column_formats)
+            else:
+                write_chunks(workbook, name, df, header_format, datetime_format, column_formats)
+    finally:
+        workbook.close()
+    return target
+
+
+def export_report(sheets, path=None, include_raw=True, number_formats=None):
+    """Write the report sheets to ``path`` (a new temporary file by default).
+
+    ``include_raw=False`` leaves out the ``*_Raw_Data`` sheets. Returns the
+    path; the caller removes temporary files it no longer needs.
+    """
+    if not include_raw:
+        sheets = {name: df for name, df in sheets.items() if not name.endswith('_Raw_Data')}
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='reconciliation_', suffix='.xlsx')
+        os.close(fd)
+    return write_sheets(sheets, path, number_formats=number_formats)
@@ -0,0 +1,262 @@
+"""Background reconciliation jobs with per-stage progress.
+
+Streamlit runs app.py on a server thread per session; a run inside it blocks
+that session, and its work is lost when the tab reconnects. ``JobManager`` is
+shared by every session of the server: ``submit`` queues a run on a worker
+pool and returns its ``Job`` at once. The run's ``RunDiagnostics`` reports
+every stage as it starts and ends, so a page can poll ``Job.progress`` and
+``Job.stage_frame``; the result stays on the job until a session (the one
+that submitted it, or a reconnected one holding the job id) collects it.
+
+Jobs run on a thread pool by default: parsing and the pandas kernels of the
+matching spend most of their time outside the GIL. With ``processes`` set,
+each job runs in a worker process instead so CPU-bound runs of several users
+do not share one interpreter; the function and its arguments must then be
+picklable, and the stage events come back over a manager queue.
+
+Memory tracing (``trace_memory``) uses tracemalloc, which is process-wide,
+so on threads traced jobs wait for each other and run one at a time.
+"""
+import contextlib
+import datetime
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+from recon.diagnostics import RunDiagnostics
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_STAGE_COLUMNS = ['Stage', 'Status', 'Seconds']
+
+# Finished jobs nobody collected are dropped after this long
+DEFAULT_KEEP_SECONDS = 3600
+
+
+class Job:
+    """One submitted run: status, stage progress and, once finished, the result.
+
+    ``stages`` are the names of the top-level stages the run is expected to
+    go through (see ``engine.reconcile_stages``); ``progress`` is the share
+    of them finished. ``meta`` is whatever the submitter needs to make sense
+    of the result later (inputs, options).
+    """
+
+    def __init__(self, job_id, label='', stages=(), meta=None):
+        self.id = job_id
+        self.label = label
+        self.expected = list(stages)
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.submitted_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.diagnostics = None
+        self.stages = []
+        self._lock = threading.Lock()
+        self._finished_clock = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def ok(self):
+        return self.status == DONE
+
+    @property
+    def error_message(self):
+        return self.error.strip().splitlines()[-1] if self.error else None
+
+    @property
+    def current_stage(self):
+        """Innermost stage still running, or None."""
+        with self._lock:
+            running = [s['stage'] for s in self.stages if s['status'] == RUNNING]
+        return running[-1] if running else None
+
+    @property
+    def progress(self):
+        """Share of the expected top-level stages finished (1.0 once the job is)."""
+        if self.finished:
+            return 1.0
+        if not self.expected:
+            return 0.0
+        with self._lock:
+            done = {s['stage'] for s in self.stages if s['depth'] == 0 and s['status'] == DONE}
+        return len(done & set(self.expected)) / len(self.expected)
+
+    def stage_frame(self):
+        """Stages seen so far, inner stages indented, with their status and seconds."""
+        with self._lock:
+            rows = [('  ' * s['depth'] + s['stage'], s['status'], s['seconds'])
+                    for s in self.stages]
+        return pd.DataFrame(rows, columns=JOB_STAGE_COLUMNS)
+
+    def _event(self, event, record):
+        # ``record`` is a StageRecord, or its as_dict() when sent by a worker process
+        info = record if isinstance(record, dict) else record.as_dict()
+        with self._lock:
+            if event == 'start':
+                self.stages.append({'stage': info['stage'], 'depth': info['depth'],
+                                    'status': RUNNING, 'seconds': None})
+                return
+            for entry in reversed(self.stages):
+                if (entry['stage'], entry['depth'], entry['status']) == (
+                        info['stage'], info['depth'], RUNNING):
+                    entry.update(status=FAILED if event == 'failed' else DONE,
+                                 seconds=info['seconds'])
+                    break
+
+    def _finish(self, result, diagnostics, error):
+        self.result = result
+        self.diagnostics = diagnostics
+        self.error = error
+        with self._lock:
+            # A worker process that died never reported the end of its stages
+            for entry in self.stages:
+                if entry['status'] == RUNNING:
+                    entry['status'] = FAILED
+        self.finished_at = datetime.datetime.now().isoformat(timespec='seconds')
+        self._finished_clock = time.monotonic()
+        self.status = FAILED if error else DONE
+
+
+def _execute(fn, kwargs, diagnostics):
+    # Run ``fn`` under ``diagnostics``; returns (result, traceback text or None)
+    try:
+        with diagnostics.run():
+            return fn(diagnostics=diagnostics, **kwargs), None
+    except Exception:
+        return None, traceback.format_exc()
+
+
+def _process_job(fn, kwargs, trace_memory, profile, events):
+    # Body of a job in a worker process: stage events go back over ``events``
+    def listener(event, record):
+        events.put((event, record.as_dict()))
+
+    diagnostics = RunDiagnostics(trace_memory=trace_memory, profile=profile, listener=listener)
+    result, error = _execute(fn, kwargs, diagnostics)
+    return result, diagnostics, error
+
+
+class JobManager:
+    """Worker pool running ``Job``s; one per server, shared by all sessions.
+
+    ``threads`` jobs run at once on threads, or ``processes`` jobs in worker
+    processes when that is set. Jobs beyond that wait in the queue; on
+    threads, a job with ``trace_memory`` also waits for any other traced
+    job to finish.
+    """
+
+    def __init__(self, threads=4, processes=0, keep_seconds=DEFAULT_KEEP_SECONDS):
+        self.processes = processes
+        self.keep_seconds = keep_seconds
+        # In process mode each pool thread just waits on its process and relays events
+        workers = processes if processes else threads
+        self._pool = ThreadPoolExecutor(max_workers=max(workers, 1),
+                                        thread_name_prefix='recon-job')
+        self._process_pool = None
+        self._manager = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._trace_lock = threading.Lock()
+
+    def submit(self, fn, label='', stages=(), meta=None, trace_memory=False, profile=False,
+               **kwargs):
+        """Queue ``fn(diagnostics=..., **kwargs)`` and return its ``Job``."""
+        self.prune()
+        job = Job(uuid.uuid4().hex[:12], label, stages, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, kwargs, trace_memory, profile)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    @property
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def queue_position(self, job):
+        """Jobs queued ahead of ``job`` (0 once it runs)."""
+        if job.status != QUEUED:
+            return 0
+        ahead = 0
+        # Jobs are kept in submission order
+        for other in self.jobs:
+            if other is job:
+                break
+            ahead += other.status == QUEUED
+        return ahead
+
+    def prune(self):
+        """Drop finished jobs older than ``keep_seconds``."""
+        cutoff = time.monotonic() - self.keep_seconds
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished and job._finished_clock < cutoff]:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+        if self._manager is not None:
+            self._manager.shutdown()
+
+    def _run(self, job, fn, kwargs, trace_memory, profile):
+        # Traced jobs on threads share the process's tracemalloc peak, so they take turns
+        traced = trace_memory and not self.processes
+        with self._trace_lock if traced else contextlib.nullcontext():
+            job.status = RUNNING
+            diagnostics = None
+            try:
+                if self.processes:
+                    result, diagnostics, error = self._run_in_process(job, fn, kwargs,
+                                                                      trace_memory, profile)
+                else:
+                    diagnostics = RunDiagnostics(trace_memory=trace_memory, profile=profile,
+                                                 listener=job._event)
+                    result, error = _execute(fn, kwargs, diagnostics)
+            except Exception:
+                # The worker process itself died (e.g. killed for memory)
+                result, error = None, traceback.format_exc()
+            job._finish(result, diagnostics, error)
+
+    def _run_in_process(self, job, fn, kwargs, trace_memory, profile):
+        with self._lock:
+            if self._process_pool is None:
+                # Spawned, not forked: the server process is full of threads
+                context = multiprocessing.get_context('spawn')
+                self._manager = context.Manager()
+                self._process_pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                         mp_context=context)
+        events = self._manager.Queue()
+        future = self._process_pool.submit(_process_job, fn, kwargs, trace_memory, profile,
+                                           events)
+        while True:
+            try:
+                job._event(*events.get(timeout=0.2))
+            except queue.Empty:
+                if future.done():
+                    break
+        return future.result()
@@ -0,0 +1,247 @@
+"""Vectorized one-to-one matching of keyed rows.
+
+The notebook's ``check_and_consume`` family walks one side row by row and
+removes each hit from a Python list of the other side's keys. That is the
+same as pairing the k-th occurrence of a key on the left with the k-th
+occurrence of the same key on the right, which is what ``consume_matches``
+does with a ``groupby().cumcount()`` rank and a single hash join.
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+OKAY = 'Okay'
+FALSE = 'False'
+
+# What a row of one side may consume from the other side (see flag_matches)
+POOLS = ['all', 'distinct', 'any']
+
+
+def _key_frame(keys):
+    """Turn a Series, list of Series/arrays or DataFrame into a positional key frame."""
+    if isinstance(keys, pd.DataFrame):
+        frame = keys.reset_index(drop=True)
+    elif isinstance(keys, (list, tuple)):
+        frame = pd.DataFrame({f'k{i}': np.asarray(k) for i, k in enumerate(keys)})
+    else:
+        values = keys.to_numpy() if isinstance(keys, pd.Series) else np.asarray(keys)
+        frame = pd.DataFrame({'k0': values})
+    frame.columns = [f'k{i}' for i in range(frame.shape[1])]
+    return frame
+
+
+def _ranked(keys, position_name):
+    frame = _key_frame(keys)
+    cols = list(frame.columns)
+    length = len(frame)
+    frame[position_name] = np.arange(len(frame), dtype=np.int64)
+    # Null keys never match, the same as they never equal anything in the pool
+    frame = frame.dropna(subset=cols)
+    frame['_rank'] = frame.groupby(cols, sort=False).cumcount()
+    return frame, cols, length
+
+
+class MatchResult:
+    """Pairs of row positions plus the unmatched positions on each side."""
+
+    def __init__(self, pairs, n_left, n_right):
+        self.pairs = pairs
+        self.n_left = n_left
+        self.n_right = n_right
+
+    @property
+    def left_mask(self):
+        mask = np.zeros(self.n_left, dtype=bool)
+        mask[self.pairs['left'].to_numpy()] = True
+        return mask
+
+    @property
+    def right_mask(self):
+        mask = np.zeros(self.n_right, dtype=bool)
+        mask[self.pairs['right'].to_numpy()] = True
+        return mask
+
+    @property
+    def left_unmatched(self):
+        return np.flatnonzero(~self.left_mask)
+
+    @property
+    def right_unmatched(self):
+        return np.flatnonzero(~self.right_mask)
+
+    def left_flags(self):
+        """'Okay'/'False' per left row, as the notebook's Amount_check column."""
+        return np.where(self.left_mask, OKAY, FALSE)
+
+    def right_flags(self):
+        return np.where(self.right_mask, OKAY, FALSE)
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+def consume_matches(left_keys, right_keys):
+    """Match left rows to right rows one-to-one on equal keys.
+
+    Keys can be a Series, an array, a list of key columns or a DataFrame;
+    both sides must use the same number of key columns. Rows are matched in
+    their existing order, so the result is identical to looping over the left
+    side and removing the first equal key from a list of the right side.
+    Runs in O((n + m) log(n + m)) instead of O(n * m).
+    """
+    left, cols, n_left = _ranked(left_keys, 'left')
+    right, right_cols, n_right = _ranked(right_keys, 'right')
+    if len(cols) != len(right_cols):
+        raise ValueError('left and right keys must have the same number of columns')
+
+    pairs = left.merge(right, on=cols + ['_rank'], how='inner', sort=False)
+    pairs = pairs[['left', 'right']].sort_values('left', kind='stable').reset_index(drop=True)
+    return MatchResult(pairs, n_left, n_right)
+
+
+def flag_matches(keys, pool_keys, pool='all'):
+    """Flag rows of ``keys`` that find a match in ``pool_keys``; a boolean mask.
+
+    This is one of the notebook's cells on its own: only the flagged side
+    consumes, and nothing is recorded on the pool side. Rows are taken in
+    order. With ``pool='all'`` the k-th row of a key is flagged while the
+    pool holds at least k rows with it, as removing each hit from a list of
+    the pool's keys does. 'distinct' consumes from the pool's distinct keys,
+    so only the first row of a key can be flagged. 'any' flags every row
+    whose key occurs in the pool. Keys take the forms ``consume_matches``
+    accepts.
+    """
+    if pool not in POOLS:
+        raise ValueError(f'unknown pool {pool!r}; expected one of {", ".join(POOLS)}')
+    own, cols, n = _ranked(keys, 'row')
+    other = _key_frame(pool_keys).dropna()
+    if len(cols) != other.shape[1]:
+        raise ValueError('keys and pool keys must have the same number of columns')
+    counts = other.groupby(cols, sort=False).size().rename('_n').reset_index()
+    hits = own.merge(counts, on=cols)
+    if pool == 'all':
+        hits = hits[hits['_rank'] < hits['_n']]
+    elif pool == 'distinct':
+        hits = hits[hits['_rank'] == 0]
+    mask = np.zeros(n, dtype=bool)
+    mask[hits['row'].to_numpy()] = True
+    return mask
+
+
+def _value_groups(by, values, position_name):
+    frame = _key_frame(by)
+    by_cols = [f'by{i}' for i in range(frame.shape[1])]
+    frame.columns = by_cols
+    frame['value'] = pd.array(values, dtype='Int64')
+    frame[position_name] = np.arange(len(frame), dtype=np.int64)
+    frame = frame.dropna(subset=by_cols + ['value'])
+    frame['value'] = frame['value'].astype(np.int64)
+    frame['_rank'] = frame.groupby(by_cols + ['value'], sort=False).cumcount()
+    groups = frame.groupby(by_cols + ['value'], sort=False).size().rename('n').reset_index()
+    return frame, groups, by_cols
+
+
+def _nearest_allocations(left_groups, right_groups, by, tolerance):
+    """``(left group, right group, rows)`` of the greedy match, closest groups first.
+
+    The groups of both sides are merged into one run sorted on ``by`` and
+    value. The closest pair of open groups from opposite sides is always
+    adjacent in that run (a group between them would be closer to one of
+    them), so candidates are only ever adjacent pairs, kept in a heap and
+    taken closest first, lower values on ties. A group that runs out of rows
+    leaves the run and its neighbours become a new candidate. Each group
+    leaves the run once, so one sweep costs O(n log n) in the number of
+    groups, however the values fall.
+    """
+    groups = pd.concat([
+        left_groups.assign(side=0),
+        right_groups.rename(columns={'right_value': 'value', 'right_n': 'n'}).assign(side=1),
+    ], ignore_index=True).sort_values(by + ['value', 'side'], kind='stable', ignore_index=True)
+    n = len(groups)
+    key_codes = groups.groupby(by, sort=False).ngroup().to_numpy()
+    gaps = np.diff(groups['value'].to_numpy(np.int64))
+    first = np.flatnonzero((np.diff(key_codes) == 0) & (np.diff(groups['side'].to_numpy()) != 0)
+                           & (gaps <= tolerance))
+    heap = list(zip(gaps[first].tolist(), first.tolist(), (first + 1).tolist()))
+    heapq.heapify(heap)
+
+    # The sweep itself walks Python lists; it touches each group a few times
+    values, sides, keys = groups['value'].tolist(), groups['side'].tolist(), key_codes.tolist()
+    counts = groups['n'].tolist()
+    prev, nxt = list(range(-1, n - 1)), list(range(1, n + 1))
+
+    def candidate(a, b):
+        if (a >= 0 and b < n and keys[a] == keys[b] and sides[a] != sides[b]
+                and values[b] - values[a] <= tolerance):
+            heapq.heappush(heap, (values[b] - values[a], a, b))
+
+    taken = []
+    while heap:
+        _, a, b = heapq.heappop(heap)
+        if not counts[a] or not counts[b] or nxt[a] != b:
+            continue
+        take = min(counts[a], counts[b])
+        taken.append((a, b, take) if sides[a] == 0 else (b, a, take))
+        counts[a] -= take
+        counts[b] -= take
+        for gone in [g for g in (a, b) if not counts[g]]:
+            if prev[gone] >= 0:
+                nxt[prev[gone]] = nxt[gone]
+            if nxt[gone] < n:
+                prev[nxt[gone]] = prev[gone]
+        if counts[a]:
+            candidate(a, nxt[a])
+        elif counts[b]:
+            candidate(prev[b], b)
+        else:
+            candidate(prev[a], nxt[b])
+    return groups, taken
+
+
+def nearest_matches(left_by, left_values, right_by, right_values, tolerance):
+    """Match left rows to right rows one-to-one on ``by`` and the nearest value.
+
+    ``by`` takes the same forms as ``consume_matches`` keys. Values are
+    integers (e.g. amounts in cents or timestamps in ns); a pair is only made
+    when the values are at most ``tolerance`` apart. Rows with equal ``by``
+    and value are grouped, and groups are paired greedily, the closest open
+    left and right groups first (see ``_nearest_allocations``), in a single
+    sorted sweep per ``by`` key. Rows of a group are paired in their
+    existing order. ``pairs`` gets a ``diff`` column (left minus right).
+    """
+    left, left_groups, by = _value_groups(left_by, left_values, 'left')
+    right, right_groups, right_by_cols = _value_groups(right_by, right_values, 'right')
+    if by != right_by_cols:
+        raise ValueError('left and right keys must have the same number of columns')
+    right_groups = right_groups.rename(columns={'value': 'right_value', 'n': 'right_n'})
+
+    allocations = []
+    if not left_groups.empty and not right_groups.empty:
+        groups, taken = _nearest_allocations(left_groups, right_groups, by, tolerance)
+        if taken:
+            left_pos, right_pos, take = (np.array(column, dtype=np.int64)
+                                         for column in zip(*taken))
+            found = groups.iloc[left_pos][by + ['value']].reset_index(drop=True)
+            found['right_value'] = groups['value'].to_numpy(np.int64)[right_pos]
+            found['take'] = take
+            allocations.append(found)
+
+    n_left, n_right = len(left_values), len(right_values)
+    if not allocations:
+        return MatchResult(pd.DataFrame({'left': [], 'right': [], 'diff': []}, dtype=np.int64),
+                           n_left, n_right)
+
+    # Expand group allocations to row pairs, consuming each group's rows in order
+    allocations = pd.concat(allocations, ignore_index=True)
+    pairs = allocations.loc[allocations.index.repeat(allocations['take'])].reset_index(drop=True)
+    pairs['_rank'] = pairs.groupby(by + ['value'], sort=False).cumcount()
+    pairs['_right_rank'] = pairs.groupby(by + ['right_value'], sort=False).cumcount()
+    pairs = pairs.merge(left, on=by + ['value', '_rank'])
+    pairs = pairs.merge(
+        right.rename(columns={'value': 'right_value', '_rank': '_right_rank'}),
+        on=by + ['right_value', '_right_rank'],
+    )
+    pairs['diff'] = pairs['value'] - pairs['right_value']
+    pairs = pairs[['left', 'right', 'diff']].sort_values('left', kind='stable')
+    return MatchResult(pairs.reset_index(drop=True), n_left, n_right)
@@ -0,0 +1,174 @@
+"""Content-hash keyed cache for parsed statement uploads.
+
+Parsed frames are keyed by the SHA-256 of the uploaded bytes plus the reader
+and its options (e.g. Co-op's ``skiprows=6``), held in memory with LRU
+eviction under a byte budget, and written through to a Parquet directory so
+a restarted app can skip parsing too.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qm_cards_recon')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def read_upload_bytes(upload):
+    """Return the raw bytes of a path, bytes object or file-like upload."""
+    if isinstance(upload, (bytes, bytearray)):
+        return bytes(upload)
+    if isinstance(upload, (str, os.PathLike)):
+        with open(upload, 'rb') as fh:
+            return fh.read()
+    if hasattr(upload, 'getvalue'):
+        return upload.getvalue()
+    upload.seek(0)
+    data = upload.read()
+    upload.seek(0)
+    return data
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _reader_name(reader):
+    return f"{getattr(reader, '__module__', '')}.{getattr(reader, '__qualname__', repr(reader))}"
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ParseCache:
+    """Two-level (memory LRU + Parquet on disk) cache of parsed uploads.
+
+    ``max_bytes`` bounds the in-memory frames; ``cache_dir=None`` disables the
+    on-disk level. A hit returns the cached frame itself, so callers must
+    treat it as read-only (the engine's cleaners build new frames); pass
+    ``copy=True`` to ``read`` for a frame that may be changed in place.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, cache_dir=DEFAULT_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._frames = OrderedDict()
+        self._sizes = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # A copy sent to a worker process keeps the settings and the disk
+        # level; the in-memory frames stay with the original
+        return {'max_bytes': self.max_bytes, 'cache_dir': self.cache_dir}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def key(self, digest, reader, options):
+        payload = json.dumps([digest, _reader_name(reader), options], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def read(self, upload, reader, copy=False, **options):
+        """Parse ``upload`` with ``reader(BytesIO, **options)``, reusing earlier results.
+
+        The frame is shared with the cache unless ``copy`` is set.
+        """
+        data = read_upload_bytes(upload)
+        key = self.key(content_hash(data), reader, options)
+
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                df = self._frames[key]
+                return df.copy() if copy else df
+
+        df = self._load_from_disk(key)
+        if df is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            df = reader(BytesIO(data), **options)
+            self._write_to_disk(key, df)
+
+        self._remember(key, df)
+        return df.copy() if copy else df
+
+    def read_excel(self, upload, **options):
+        return self.read(upload, pd.read_excel, **options)
+
+    def read_csv(self, upload, **options):
+        return self.read(upload, pd.read_csv, **options)
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._frames.clear()
+            self._sizes.clear()
+            self._total = 0
+        if disk and self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.parquet'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    @property
+    def memory_bytes(self):
+        return self._total
+
+    def _remember(self, key, df):
+        size = _frame_bytes(df)
+        if size > self.max_bytes:
+            # Too big to hold in memory; the Parquet copy still serves re-runs
+            return
+        with self._lock:
+            if key in self._frames:
+                self._total -= self._sizes[key]
+            self._frames[key] = df
+            self._sizes[key] = size
+            self._total += size
+            while self._total > self.max_bytes and len(self._frames) > 1:
+                old_key, _ = self._frames.popitem(last=False)
+                self._total -= self._sizes.pop(old_key)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.parquet')
+
+    def _load_from_disk(self, key):
+        if not self.cache_dir or not os.path.exists(self._path(key)):
+            return None
+        try:
+            return pd.read_parquet(self._path(key))
+        except Exception as exc:
+            # Corrupt or partially written entry: drop it and re-parse
+            log.warning('parse cache: dropping unreadable %s: %s', self._path(key), exc)
+            os.remove(self._path(key))
+            return None
+
+    def _write_to_disk(self, key, df):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            df.to_parquet(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            # Mixed-type object columns or non-string headers can't be stored
+            # as Parquet; those frames stay memory-only
+            log.warning('parse cache: could not write %s, keeping it in memory only: %s',
+                        path, exc)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,146 @@
+"""RRN normalization and the bank RRN index.
+
+Aspire's REF_NO and the banks' RRN columns arrive as text, ints or floats
+(Excel and a CSV column with blanks both turn them into floats, sometimes
+printed in scientific notation). ``normalize_rrns`` maps every spelling to
+one nullable ``Int64`` value, vectorized, with blanks, zero and junk as
+missing. ``RRNIndex`` hashes the bank rows by RRN once; ``probe`` then
+classifies every Aspire row as one-to-one, one-to-many or orphan and totals
+the matching bank amounts in a single pass.
+"""
+import numpy as np
+import pandas as pd
+
+RRN_DTYPE = 'Int64'
+
+# Up to 18 digits always fits in int64
+_DIGITS = r'\d{1,18}'
+
+
+def _int_rrns(parsed, valid, index):
+    return pd.Series(pd.arrays.IntegerArray(parsed, ~valid), index=index)
+
+
+def _parse_text(values):
+    # Numbers and nulls in the column become text too ('123.0', 'nan'), then parse
+    text = values.astype(str).str.strip()
+    present = ~text.isin(['', 'nan', 'None', '<NA>']).to_numpy()
+    text = text.to_numpy(dtype=object)
+    parsed = np.zeros(len(text), dtype=np.int64)
+    try:
+        parsed[present] = text[present].astype(np.int64)
+        return _int_rrns(parsed, present, values.index)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    digits = pd.Series(text).str.fullmatch(_DIGITS).to_numpy(dtype=bool)
+    parsed[digits] = text[digits].astype(np.int64)
+    rrns = _int_rrns(parsed, digits, values.index)
+    # '1.23456789012E+11', '123456789012.0' and the like go through float
+    rest = present & ~digits
+    if rest.any():
+        rrns[rest] = normalize_rrns(pd.to_numeric(pd.Series(text[rest]), errors='coerce')
+                                    .astype('float64')).array
+    return rrns
+
+
+def normalize_rrns(values):
+    """Canonical ``Int64`` RRNs; anything that is not a positive whole number is missing."""
+    values = pd.Series(values)
+    if values.dtype.kind in 'iu':
+        rrns = values.astype(RRN_DTYPE)
+    elif values.dtype.kind == 'f':
+        whole = np.isfinite(values) & (values == np.floor(values)) & (values.abs() < 2 ** 63)
+        rrns = values.where(whole).astype(RRN_DTYPE)
+    elif pd.api.types.infer_dtype(values, skipna=True) in ('string', 'integer', 'empty'):
+        # Clean text columns parse in one numpy call; anything odd takes the slow path
+        present = values.notna().to_numpy()
+        parsed = np.zeros(len(values), dtype=np.int64)
+        try:
+            parsed[present] = values.to_numpy(dtype=object)[present].astype(np.int64)
+            rrns = _int_rrns(parsed, present, values.index)
+        except (TypeError, ValueError, OverflowError):
+            rrns = _parse_text(values)
+    else:
+        rrns = _parse_text(values)
+    return rrns.where(rrns > 0)
+
+
+class RRNMatch:
+    """Result of probing an ``RRNIndex`` with one set of RRNs.
+
+    Per probe row: ``bank_rows`` (0 for orphans) and ``bank_amount`` (sum of
+    the bank amounts for the RRN, 0 for orphans). ``bank_seen`` flags the
+    bank rows whose RRN was probed.
+    """
+
+    def __init__(self, bank_rows, bank_amount, bank_seen):
+        self.bank_rows = bank_rows
+        self.bank_amount = bank_amount
+        self.bank_seen = bank_seen
+
+    @property
+    def orphan(self):
+        return self.bank_rows == 0
+
+    @property
+    def one_to_one(self):
+        return self.bank_rows == 1
+
+    @property
+    def one_to_many(self):
+        return self.bank_rows > 1
+
+
+class RRNIndex:
+    """Bank rows hashed by normalized RRN.
+
+    ``amounts`` (Int64 cents) are totalled per RRN; rows without an RRN are
+    kept out of the index and never seen.
+    """
+
+    def __init__(self, rrns, amounts):
+        rrns = normalize_rrns(rrns)
+        codes, keys = pd.factorize(rrns)
+        self.n_rows = len(codes)
+        self.codes = codes
+        self.keys = pd.Index(keys)
+        valid = codes >= 0
+        self.counts = np.bincount(codes[valid], minlength=len(keys))
+        amounts = pd.Series(amounts).astype(RRN_DTYPE).fillna(0).to_numpy(dtype=np.int64)
+        self.totals = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(self.totals, codes[valid], amounts[valid])
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def duplicated(self):
+        """Bank rows that share their RRN with another bank row."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        valid = self.codes >= 0
+        mask[valid] = self.counts[self.codes[valid]] > 1
+        return mask
+
+    def seen_rows(self, key_seen):
+        """Bank-row mask from a mask over the index keys."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        valid = self.codes >= 0
+        mask[valid] = key_seen[self.codes[valid]]
+        return mask
+
+    def probe(self, rrns):
+        """Match RRNs (any spelling) against the index in one vectorized pass."""
+        rrns = normalize_rrns(rrns)
+        positions = self.keys.get_indexer(rrns.dropna())
+        hit = np.full(len(rrns), -1, dtype=np.int64)
+        hit[rrns.notna().to_numpy()] = positions
+        found = hit >= 0
+
+        bank_rows = np.zeros(len(rrns), dtype=np.int64)
+        bank_amount = np.zeros(len(rrns), dtype=np.int64)
+        bank_rows[found] = self.counts[hit[found]]
+        bank_amount[found] = self.totals[hit[found]]
+
+        key_seen = np.zeros(len(self.keys), dtype=bool)
+        key_seen[hit[found]] = True
+        return RRNMatch(bank_rows, bank_amount, self.seen_rows(key_seen))
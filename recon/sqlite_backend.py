@@ -0,0 +1,683 @@
+"""Out-of-core reconciliation backed by an embedded SQLite database.
+
+A quarter's KCB, Equity and Aspire rows do not fit in memory as frames.
+This backend reads one bank statement at a time, and the Aspire CSV in
+chunks of rows, normalizes them with the engine's own functions and bulk-loads the rows, with their match keys, into
+a local SQLite database. Only the frame being loaded is in memory.
+
+The RRN match and the exact passes of the amount cascade then run as SQL
+joins over indexes on the RRN, (branch, amount) and the card key. Passes
+that pair the nearest value (``cascade.nearest_pass``/``window_pass``) are
+run by the cascade's own matcher on batches of their first key, fetched
+through the same indexes; a key's rows never pair with another key's, so
+the pairs are those the in-memory cascade makes. Report sheets are streamed
+back out in chunks (see ``export.write_chunks``).
+
+The downloadable report has the sheets and column types of the in-memory
+one, ``Aspire_Raw_Data`` included. Aspire columns are typed per chunk by
+pandas' CSV reader; a column whose chunks disagree (numbers in one, text
+in another) is stored with the wider type.
+
+``engine.reconcile_files(backend='sqlite')`` runs it, and picks it by
+itself for inputs larger than ``engine.memory_limit()``.
+"""
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from recon import engine
+from recon.amounts import from_cents
+from recon.cascade import STATS_COLUMNS, FlagPass
+from recon.diagnostics import stage
+from recon.matching import FALSE, OKAY, consume_matches
+from recon.rrn import normalize_rrns
+
+# Rows per frame when reading a table back out
+FETCH_ROWS = 50_000
+
+# Distinct first-key values per batch of a nearest-value pass
+BATCH_KEYS = 20_000
+
+# Rough bytes per Aspire CSV row, to turn chunk_bytes into rows per chunk
+ASPIRE_ROW_BYTES = 128
+
+# Page cache of the connection, in KiB
+CACHE_KB = 256 * 1024
+
+# Match keys are stored next to the row as key_<name> (see engine.ASPIRE_KEYS)
+KEY_PREFIX = 'key_'
+
+# Datetimes are stored as ISO text
+DATETIME_TEXT = '%Y-%m-%d %H:%M:%S.%f'
+
+ASPIRE = 'aspire'
+BANK = 'bank'
+
+# Rows left open by the RRN match, as in engine.match_amounts
+RESIDUAL = {ASPIRE: 'rrn_check <= 0', BANK: "Cheked_rows = 'No'"}
+EXCEPTION = {side: f"{residual} AND Amount_check = '{FALSE}'"
+             for side, residual in RESIDUAL.items()}
+
+MATCH_COLUMNS = [('Amount_check', 'text'), ('Match_pass', 'text'), ('Amount_diff', 'integer')]
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _kind(dtype):
+    if dtype.kind == 'M':
+        return 'datetime'
+    if dtype.kind in 'iub':
+        return 'integer'
+    if dtype.kind == 'f':
+        return 'real'
+    return 'text'
+
+
+def _common_kind(old, new):
+    if old == new:
+        return old
+    if {old, new} <= {'integer', 'real'}:
+        return 'real'
+    return 'text'
+
+
+def _adapt(value):
+    # One cell of a text column as a value sqlite3 can bind
+    if isinstance(value, str) or value is None:
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, (bool, np.bool_, int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value)
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_TEXT)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _sql_values(column, kind):
+    """Cells of ``column`` as Python values, None for blanks."""
+    missing = column.isna().to_numpy()
+    if kind == 'datetime':
+        if column.dt.tz is not None:
+            column = column.dt.tz_localize(None)
+        values = column.dt.strftime(DATETIME_TEXT).to_numpy(dtype=object)
+    elif kind == 'integer':
+        values = column.to_numpy(dtype=np.int64, na_value=0).tolist()
+    elif kind == 'real':
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan).tolist()
+    else:
+        return [_adapt(value) for value in column.to_numpy(dtype=object)]
+    if missing.any():
+        values = [None if blank else value for value, blank in zip(values, missing)]
+    return list(values)
+
+
+def _frame(rows, columns, kinds):
+    """Rows fetched from SQLite as a frame typed by ``kinds``."""
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    data = {}
+    for column, cells in zip(columns, values):
+        kind = kinds.get(column, 'text')
+        if kind == 'integer':
+            data[column] = pd.array(list(cells), dtype='Int64')
+        elif kind == 'real':
+            data[column] = np.array([np.nan if v is None else v for v in cells], dtype=np.float64)
+        elif kind == 'datetime':
+            data[column] = pd.to_datetime(pd.Series(cells, dtype=object), format=DATETIME_TEXT)
+        else:
+            data[column] = np.array(cells, dtype=object)
+    return pd.DataFrame(data, columns=columns)
+
+
+def _close(conn, path):
+    conn.close()
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+class SQLiteStore:
+    """Frames as SQLite tables, with the column types kept on the Python side.
+
+    Columns are declared without a type so every cell keeps the storage
+    class it was written with; ``kinds`` (integer, real, datetime or text)
+    turns them back into the same dtypes when read. The database is a
+    temporary file, removed on ``close``, unless a ``path`` is given.
+    """
+
+    def __init__(self, path=None):
+        temporary = path is None
+        if temporary:
+            fd, path = tempfile.mkstemp(prefix='reconciliation_', suffix='.sqlite')
+            os.close(fd)
+        self.path = path
+        # Results are handed from a worker thread to the app's thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode = OFF')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute(f'PRAGMA cache_size = {-CACHE_KB}')
+        self.columns = {}
+        self.kinds = {}
+        self._finalizer = weakref.finalize(self, _close, self.conn,
+                                           path if temporary else None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._finalizer()
+
+    def has_table(self, table):
+        return table in self.columns
+
+    def insert(self, table, df):
+        """Append ``df`` to ``table``, creating it (anew) on first use."""
+        kinds = {column: _kind(dtype) for column, dtype in df.dtypes.items()}
+        with self.conn:
+            if table not in self.columns:
+                self.conn.execute(f'DROP TABLE IF EXISTS {_quote(table)}')
+                columns = ', '.join(_quote(column) for column in df.columns)
+                self.conn.execute(f'CREATE TABLE {_quote(table)} (_row INTEGER PRIMARY KEY, '
+                                  f'{columns})')
+                self.columns[table], self.kinds[table] = list(df.columns), kinds
+            else:
+                for column, kind in kinds.items():
+                    if column in self.kinds[table]:
+                        self.kinds[table][column] = _common_kind(self.kinds[table][column], kind)
+                    else:
+                        self._add_column(table, column, kind)
+            values = [_sql_values(df[column], kinds[column]) for column in df.columns]
+            self.conn.executemany(
+                f'INSERT INTO {_quote(table)} ({", ".join(_quote(c) for c in df.columns)}) '
+                f'VALUES ({", ".join("?" * len(df.columns))})', zip(*values))
+
+    def _add_column(self, table, column, kind):
+        self.conn.execute(f'ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)}')
+        self.columns[table].append(column)
+        self.kinds[table][column] = kind
+
+    def add_column(self, table, column, kind):
+        with self.conn:
+            self._add_column(table, column, kind)
+
+    def count(self, table, where='1'):
+        if table not in self.columns:
+            return 0
+        return self.conn.execute(f'SELECT COUNT(*) FROM {_quote(table)} WHERE {where}').fetchone()[0]
+
+    def chunks(self, table, where='1', columns=None, convert=None):
+        """``QueryChunks`` of the rows of ``table`` matching ``where``, in insertion order."""
+        columns = self.columns[table] if columns is None else columns
+        query = (f'SELECT {", ".join(_quote(c) for c in columns)} FROM {_quote(table)} '
+                 f'WHERE {where} ORDER BY _row')
+        return QueryChunks(self, query, columns, self.kinds[table], convert=convert)
+
+
+class QueryChunks:
+    """Rows of a query as frames of ``FETCH_ROWS``, e.g. a sheet for ``export.write_sheets``.
+
+    Every iteration runs the query again; a query without rows gives one
+    empty frame with the columns. ``convert`` is applied to each frame.
+    """
+
+    def __init__(self, store, query, columns, kinds, params=(), convert=None):
+        self.store = store
+        self.query = query
+        self.columns = list(columns)
+        self.kinds = kinds
+        self.params = params
+        self.convert = convert
+
+    def __iter__(self):
+        cursor = self.store.conn.execute(self.query, self.params)
+        try:
+            rows = cursor.fetchmany(FETCH_ROWS)
+            while True:
+                df = _frame(rows, self.columns, self.kinds)
+                yield self.convert(df) if self.convert is not None else df
+                rows = cursor.fetchmany(FETCH_ROWS)
+                if not rows:
+                    break
+        finally:
+            cursor.close()
+
+    def frame(self):
+        """All rows in one frame."""
+        return pd.concat(list(self), ignore_index=True)
+
+
+# ------------------ Load ------------------
+
+def _add_keys(df, builders, names):
+    for name in names:
+        df[KEY_PREFIX + name] = pd.Series(builders[name](df)).array
+    return df
+
+
+def _pass_keys(passes):
+    return list(dict.fromkeys(key for match_pass in passes for key in match_pass.keys))
+
+
+def _load_bank(store, name, df, key, keys, diagnostics):
+    """Append a cleaned KCB or Equity statement to the bank table as merged_cards rows."""
+    dfs = {bank: pd.DataFrame() for bank in engine.BANKS}
+    dfs[name] = df
+    merged = engine.build_merged_cards(dfs, key, diagnostics)
+    if merged.empty:
+        return 0
+    merged['REF_NO'] = normalize_rrns(merged['R_R_N']).array
+    store.insert(BANK, _add_keys(merged, engine.BANK_KEYS, keys))
+    return len(merged)
+
+
+def aspire_chunks(source, chunk_bytes=None):
+    """Yield the Aspire CSV as frames of about ``chunk_bytes`` each.
+
+    pandas' chunked reader with the options of ``engine._read_source``, so
+    every column is typed as the in-memory path types it (dates stay text).
+    """
+    from recon.aspire_stream import DEFAULT_CHUNK_BYTES, _open
+
+    rows = max(1, (chunk_bytes or DEFAULT_CHUNK_BYTES) // ASPIRE_ROW_BYTES)
+    fh = _open(source)
+    try:
+        with pd.read_csv(fh, chunksize=rows, **engine.ASPIRE_CSV_OPTIONS) as reader:
+            yield from reader
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            fh.close()
+
+
+def load(store, kcb=None, equity=None, coop=None, aspire=None, key=None, cache=None,
+         project=False, chunk_bytes=None, passes=None, diagnostics=None):
+    """Load the statements into ``store``; returns the branch key frame.
+
+    Each cleaned statement goes to ``raw_<bank>`` (its report sheet); KCB
+    and Equity rows also go to ``bank`` and the Aspire rows to ``aspire``
+    (see ``aspire_chunks``),
+    normalized as in ``engine.reconcile`` and with the match keys of
+    ``passes``.
+    """
+    keys = _pass_keys(passes)
+    key_df = pd.DataFrame()
+    if key is not None:
+        with stage(diagnostics, 'read key') as record:
+            key_df = record.out(engine._read_source('key', key, cache, project))
+
+    for name, source in [('KCB', kcb), ('Equity', equity), ('Co-op', coop)]:
+        if source is None:
+            continue
+        with stage(diagnostics, f'read {name}') as record:
+            df = record.out(engine._read_source(name, source, cache, project))
+        if df.empty:
+            continue
+        with stage(diagnostics, f'clean {name}', df) as record:
+            df = record.out(engine.CLEANERS[name](df))
+        with stage(diagnostics, f'store {name}', df) as record:
+            store.insert(f'raw_{name}', df)
+            if name in ('KCB', 'Equity'):
+                record.out(_load_bank(store, name, df, key_df, keys, diagnostics))
+        del df
+
+    if aspire is not None:
+        with stage(diagnostics, 'store Aspire') as record:
+            rows = 0
+            for chunk in aspire_chunks(aspire, chunk_bytes):
+                chunk = engine.clean_aspire(chunk)
+                store.insert('raw_Aspire', chunk)
+                chunk = engine.prepare_aspire(chunk)
+                chunk['REF_NO'] = normalize_rrns(chunk['REF_NO']).array
+                store.insert(ASPIRE, _add_keys(chunk, engine.ASPIRE_KEYS, keys))
+                rows += len(chunk)
+            record.out(rows)
+    return key_df
+
+
+def create_indexes(store, passes):
+    """Index both sides on the RRN and on the keys of every amount pass."""
+    with store.conn:
+        for side in (ASPIRE, BANK):
+            store.conn.execute(f'CREATE INDEX {side}_rrn ON {side} (REF_NO)')
+            for match_pass in passes:
+                columns = ', '.join(KEY_PREFIX + key for key in match_pass.keys)
+                store.conn.execute(f'CREATE INDEX {side}_{match_pass.name} ON {side} ({columns})')
+
+
+# ------------------ RRN match ------------------
+
+def match_rrn(store):
+    """The RRN match of ``engine.probe_rrns``/``mark_checked_rows`` as SQL joins.
+
+    Bank Purchase is totalled per RRN into ``bank_rrns``; each Aspire row
+    gets ``rrn_rows``, ``rrn_check`` and ``val_check`` from it, and bank rows
+    whose RRN is in Aspire get ``Cheked_rows`` 'Yes'.
+    """
+    for column in ['rrn_rows', 'rrn_check', 'val_check']:
+        store.add_column(ASPIRE, column, 'integer')
+    store.add_column(BANK, 'Cheked_rows', 'text')
+    with store.conn:
+        store.conn.execute('DROP TABLE IF EXISTS bank_rrns')
+        store.conn.execute('CREATE TABLE bank_rrns (REF_NO INTEGER PRIMARY KEY, n, total)')
+        store.conn.execute(
+            'INSERT INTO bank_rrns SELECT REF_NO, COUNT(*), SUM(COALESCE(Purchase, 0)) '
+            'FROM bank WHERE REF_NO IS NOT NULL GROUP BY REF_NO')
+        store.conn.execute(
+            'UPDATE aspire SET '
+            'rrn_rows = COALESCE((SELECT n FROM bank_rrns b WHERE b.REF_NO = aspire.REF_NO), 0), '
+            'rrn_check = COALESCE((SELECT total FROM bank_rrns b WHERE b.REF_NO = aspire.REF_NO), 0)')
+        store.conn.execute('UPDATE aspire SET val_check = AMOUNT - rrn_check')
+        store.conn.execute(
+            "UPDATE bank SET Cheked_rows = CASE WHEN REF_NO IN "
+            "(SELECT REF_NO FROM aspire WHERE REF_NO IS NOT NULL) THEN 'Yes' ELSE 'No' END")
+
+
+# ------------------ Amount match ------------------
+
+def _open(side):
+    return f'{RESIDUAL[side]} AND Match_pass IS NULL'
+
+
+def _exact_pairs(store, match_pass):
+    """Fill temp.pairs for an exact pass with one SQL join.
+
+    The k-th open row of a key on one side pairs with the k-th on the
+    other, in row order, as ``consume_matches`` does.
+    """
+    columns = [KEY_PREFIX + key for key in match_pass.keys]
+    partition = ', '.join(columns)
+    present = ' AND '.join(f'{column} IS NOT NULL' for column in columns)
+
+    def ranked(side):
+        return (f'SELECT _row, {partition}, ROW_NUMBER() OVER '
+                f'(PARTITION BY {partition} ORDER BY _row) AS _rank '
+                f'FROM {side} WHERE {_open(side)} AND {present}')
+    on = ' AND '.join(f'l.{column} = r.{column}' for column in columns + ['_rank'])
+    store.conn.execute(
+        f'INSERT INTO temp.pairs WITH l AS ({ranked(ASPIRE)}), r AS ({ranked(BANK)}) '
+        f'SELECT l._row, r._row, 0 FROM l JOIN r ON {on}')
+
+
+def _batched_pairs(store, match_pass):
+    """Fill temp.pairs for a nearest-value pass, a batch of first-key values at a time."""
+    columns = [KEY_PREFIX + key for key in match_pass.keys]
+    first = columns[0]
+    store.conn.execute('DROP TABLE IF EXISTS temp.pass_keys')
+    store.conn.execute(
+        f'CREATE TEMP TABLE pass_keys AS SELECT DISTINCT l.{first} AS value FROM aspire l '
+        f'WHERE {_open(ASPIRE)} AND l.{first} IS NOT NULL AND EXISTS '
+        f'(SELECT 1 FROM bank r WHERE r.{first} = l.{first} AND {_open(BANK)})')
+    n_keys = store.conn.execute('SELECT MAX(rowid) FROM temp.pass_keys').fetchone()[0] or 0
+
+    def rows(side, low, high):
+        query = (f'SELECT _row, {", ".join(columns)} FROM {side} WHERE {_open(side)} AND '
+                 f'{first} IN (SELECT value FROM temp.pass_keys WHERE rowid > ? AND rowid <= ?) '
+                 f'ORDER BY _row')
+        found = store.conn.execute(query, (low, high)).fetchall()
+        frame = _frame(found, ['_row'] + columns, {**store.kinds[side], '_row': 'integer'})
+        return frame.rename(columns=lambda c: c[len(KEY_PREFIX):] if c in columns else c)
+
+    for low in range(0, n_keys, BATCH_KEYS):
+        left, right = rows(ASPIRE, low, low + BATCH_KEYS), rows(BANK, low, low + BATCH_KEYS)
+        pairs = match_pass.match(left[match_pass.keys], right[match_pass.keys]).pairs
+        if pairs.empty:
+            continue
+        diff = pairs['diff'].to_numpy(np.int64) if 'diff' in pairs else np.zeros(len(pairs), np.int64)
+        store.conn.executemany('INSERT INTO temp.pairs VALUES (?, ?, ?)', zip(
+            left['_row'].to_numpy(np.int64)[pairs['left'].to_numpy()].tolist(),
+            right['_row'].to_numpy(np.int64)[pairs['right'].to_numpy()].tolist(),
+            diff.tolist()))
+
+
+def _flagged_rows(store, match_pass, own, other):
+    """Fill temp.flags with the open ``own`` rows a flag pass finds in ``other``.
+
+    Own rows are ranked per key in row order and checked against the count
+    of the key among all of the other side's residual rows, as
+    ``matching.flag_matches`` does for its pools.
+    """
+    columns = [KEY_PREFIX + key for key in match_pass.keys]
+    partition = ', '.join(columns)
+    present = ' AND '.join(f'{column} IS NOT NULL' for column in columns)
+    on = ' AND '.join(f'o.{column} = p.{column}' for column in columns)
+    keep = {'all': 'o._rank <= p._n', 'distinct': 'o._rank = 1', 'any': '1'}[match_pass.pool]
+    store.conn.execute(
+        f'INSERT INTO temp.flags WITH o AS (SELECT _row, {partition}, ROW_NUMBER() OVER '
+        f'(PARTITION BY {partition} ORDER BY _row) AS _rank FROM {own} '
+        f'WHERE {_open(own)} AND {present}), '
+        f'p AS (SELECT {partition}, COUNT(*) AS _n FROM {other} '
+        f'WHERE {RESIDUAL[other]} AND {present} GROUP BY {partition}) '
+        f'SELECT o._row FROM o JOIN p ON {on} WHERE {keep}')
+
+
+def match_amounts(store, passes):
+    """Run the amount cascade over the rows the RRN match left open.
+
+    Sets ``Match_pass`` on every paired or flagged row, ``Amount_diff`` on
+    every paired row and ``Amount_check`` on all open rows, as
+    ``engine.match_amounts`` does;
+    returns the per-pass statistics.
+    """
+    for side in (ASPIRE, BANK):
+        for column, kind in MATCH_COLUMNS:
+            store.add_column(side, column, kind)
+    stats = []
+    for match_pass in passes:
+        start = time.perf_counter()
+        left_in, right_in = store.count(ASPIRE, _open(ASPIRE)), store.count(BANK, _open(BANK))
+        matched = 0
+        if isinstance(match_pass, FlagPass):
+            own, other = (ASPIRE, BANK) if match_pass.side == 'left' else (BANK, ASPIRE)
+            # The other side is checked in full, not only its open rows
+            if match_pass.side == 'left':
+                right_in = store.count(BANK, RESIDUAL[BANK])
+            else:
+                left_in = store.count(ASPIRE, RESIDUAL[ASPIRE])
+            if left_in and right_in:
+                with store.conn:
+                    store.conn.execute('DROP TABLE IF EXISTS temp.flags')
+                    store.conn.execute('CREATE TEMP TABLE flags (row INTEGER PRIMARY KEY)')
+                    _flagged_rows(store, match_pass, own, other)
+                    store.conn.execute(f'UPDATE {own} SET Match_pass = ? '
+                                       f'WHERE _row IN (SELECT row FROM temp.flags)',
+                                       (match_pass.name,))
+                    matched = store.conn.execute('SELECT COUNT(*) FROM temp.flags').fetchone()[0]
+        elif left_in and right_in:
+            with store.conn:
+                store.conn.execute('DROP TABLE IF EXISTS temp.pairs')
+                store.conn.execute('CREATE TEMP TABLE pairs (left_row INTEGER PRIMARY KEY, '
+                                   'right_row INTEGER UNIQUE, diff INTEGER)')
+                if match_pass.match is consume_matches:
+                    _exact_pairs(store, match_pass)
+                else:
+                    _batched_pairs(store, match_pass)
+                for side, own in [(ASPIRE, 'left_row'), (BANK, 'right_row')]:
+                    store.conn.execute(
+                        f'UPDATE {side} SET Match_pass = ?, Amount_diff = '
+                        f'(SELECT diff FROM temp.pairs p WHERE p.{own} = {side}._row) '
+                        f'WHERE _row IN (SELECT {own} FROM temp.pairs)', (match_pass.name,))
+                matched = store.conn.execute('SELECT COUNT(*) FROM temp.pairs').fetchone()[0]
+        stats.append((match_pass.name, ', '.join(match_pass.keys), left_in, right_in, matched,
+                      time.perf_counter() - start))
+    with store.conn:
+        for side in (ASPIRE, BANK):
+            store.conn.execute(
+                f"UPDATE {side} SET Amount_check = CASE WHEN Match_pass IS NULL "
+                f"THEN '{FALSE}' ELSE '{OKAY}' END WHERE {RESIDUAL[side]}")
+    return pd.DataFrame(stats, columns=STATS_COLUMNS)
+
+
+# ------------------ card_summary ------------------
+
+def build_card_summary(store):
+    """``engine.build_card_summary`` from SQL aggregates over both tables."""
+    conn = store.conn
+    stores = [row[0] for row in conn.execute(
+        'SELECT DISTINCT STORE_NAME FROM aspire WHERE STORE_NAME IS NOT NULL')]
+    rows = [(name, 'Aspire_Zed', total) for name, total in conn.execute(
+        'SELECT STORE_NAME, COALESCE(SUM(AMOUNT), 0) FROM aspire '
+        'WHERE STORE_NAME IS NOT NULL GROUP BY STORE_NAME')]
+    for measures, where in [(engine.PAID_MEASURES, '1'), (engine.RECS_MEASURES, EXCEPTION[BANK])]:
+        for branch, source, total in conn.execute(
+                f'SELECT branch, Source, COALESCE(SUM(Purchase), 0) FROM bank '
+                f'WHERE {where} AND branch IS NOT NULL GROUP BY branch, Source'):
+            if source in measures:
+                rows.append((branch, measures[source], total))
+    rows += [(name, 'Asp_Recs', total) for name, total in conn.execute(
+        f'SELECT STORE_NAME, COALESCE(SUM(AMOUNT), 0) FROM aspire '
+        f'WHERE {EXCEPTION[ASPIRE]} AND STORE_NAME IS NOT NULL GROUP BY STORE_NAME')]
+
+    names, measures, totals = zip(*rows) if rows else ((), (), ())
+    sums = pd.Series(pd.array(list(totals), dtype='Int64'), index=pd.MultiIndex.from_arrays(
+        [list(names), list(measures)], names=['STORE_NAME', 'measure']))
+    return engine.card_summary_from_sums(stores, sums)
+
+
+# ------------------ Report ------------------
+
+class SQLiteReconciliation:
+    """A reconciliation whose rows stay in a ``SQLiteStore``.
+
+    Answers the report side of ``engine.Reconciliation``: ``card_summary``
+    and ``match_stats`` are frames (amounts in cents), ``exceptions()`` reads
+    the unmatched rows into memory, and ``report_sheets``/``download_sheets``
+    give ``QueryChunks`` that stream the large sheets out of the database in
+    shillings. The full aspire sheet of ``report_sheets`` is left out, as
+    with a streamed Aspire CSV. Frames read back hold text where the engine
+    has Categoricals and ``Int64`` where it has int64; the written sheets
+    are the same. ``close`` removes a temporary database.
+    """
+
+    def __init__(self, store, key, card_summary=None, match_stats=None):
+        self.store = store
+        self.key = key
+        self.card_summary = card_summary
+        self.match_stats = match_stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.store.close()
+
+    @property
+    def matched(self):
+        return self.card_summary is not None
+
+    @property
+    def bank_rows(self):
+        return self.store.count(BANK)
+
+    def _columns(self, side):
+        return [c for c in self.store.columns.get(side, []) if not c.startswith(KEY_PREFIX)]
+
+    def _chunks(self, side, where='1', columns=None, convert=from_cents):
+        return self.store.chunks(side, where, columns or self._columns(side), convert=convert)
+
+    def _exception_chunks(self, convert=from_cents):
+        return {
+            'Asp_Recs': self._chunks(ASPIRE, EXCEPTION[ASPIRE], convert=convert),
+            'Equity_recs': self._chunks(BANK, f"{EXCEPTION[BANK]} AND Source = 'Equity'",
+                                        convert=convert),
+            'kcb_recs': self._chunks(BANK, f"{EXCEPTION[BANK]} AND Source = 'KCB'",
+                                     convert=convert),
+        }
+
+    def exceptions(self):
+        """Unreconciled items per side (in cents), read into memory."""
+        if not self.matched:
+            return {}
+        return {name: chunks.frame() for name, chunks in self._exception_chunks(None).items()}
+
+    def _duplicates(self):
+        where = 'REF_NO IN (SELECT REF_NO FROM bank_rrns WHERE n > 1)'
+        if not self.store.count(BANK, where):
+            return None
+        merged = [c for c in self._columns(BANK) if c not in dict(MATCH_COLUMNS)]
+        return self._chunks(BANK, where, merged)
+
+    def report_sheets(self):
+        """Sheets of the notebook's Reconciliation_Report.xlsx, in order, in shillings."""
+        if not self.store.has_table(BANK):
+            return {'merged_cards': pd.DataFrame(
+                columns=engine.BANK_COLUMNS + ['branch', 'card_check', 'card_token'])}
+        merged = [c for c in self._columns(BANK) if c not in dict(MATCH_COLUMNS)]
+        if not self.matched:
+            return {'merged_cards': self._chunks(BANK, columns=merged)}
+        sheets = {'card_summary': from_cents(self.card_summary)}
+        sheets.update(self._exception_chunks())
+        duplicates = self._duplicates()
+        if duplicates is not None:
+            sheets['RRN_Duplicates'] = duplicates
+        sheets['merged_cards'] = self._chunks(BANK, columns=merged)
+        return sheets
+
+    def download_sheets(self, carried_sheets=None):
+        """Sheets of the app's downloadable report (see ``Reconciliation.download_sheets``)."""
+        sheets = {}
+        if self.matched:
+            sheets['card_summary'] = from_cents(self.card_summary)
+            sheets.update(self._exception_chunks())
+            duplicates = self._duplicates()
+            if duplicates is not None:
+                sheets['RRN_Duplicates'] = duplicates
+        sheets.update(carried_sheets or {})
+        if self.bank_rows:
+            sheets['Reconciled_Transactions'] = self._chunks(
+                BANK, convert=lambda df: engine.reconciled_transactions(from_cents(df)))
+        for bank in engine.BANKS:
+            table = f'raw_{bank}'
+            if self.store.has_table(table):
+                sheets[f'{bank}_Raw_Data'] = self.store.chunks(table)
+        return sheets
+
+
+def reconcile_files(kcb=None, equity=None, coop=None, aspire=None, key=None, cache=None,
+                    project=False, chunk_bytes=None, amount_tolerance=engine.AMOUNT_TOLERANCE,
+                    card_window=engine.CARD_WINDOW, diagnostics=None, db_path=None,
+                    matching='cascade'):
+    """Reconcile the given statement files through a SQLite database at ``db_path``.
+
+    Takes the options of ``engine.reconcile_files``; returns a
+    ``SQLiteReconciliation`` (close it to remove a temporary database).
+    """
+    passes = engine.amount_passes(amount_tolerance, card_window, matching)
+    store = SQLiteStore(db_path)
+    try:
+        with stage(diagnostics, 'load_statements') as record:
+            key_df = load(store, kcb, equity, coop, aspire, key, cache=cache, project=project,
+                          chunk_bytes=chunk_bytes, passes=passes, diagnostics=diagnostics)
+            record.out(store.count(BANK) + store.count(ASPIRE))
+        if not store.has_table(BANK) or not store.has_table(ASPIRE):
+            return SQLiteReconciliation(store, key_df)
+
+        with stage(diagnostics, 'create_indexes'):
+            create_indexes(store, passes)
+        with stage(diagnostics, 'match_rrn') as record:
+            match_rrn(store)
+            record.out(store.count(ASPIRE, RESIDUAL[ASPIRE]))
+        with stage(diagnostics, 'match_amounts') as record:
+            match_stats = match_amounts(store, passes)
+            record.out(int(match_stats['Matched'].sum()))
+        with stage(diagnostics, 'card_summary') as record:
+            card_summary = record.out(build_card_summary(store))
+        return SQLiteReconciliation(store, key_df, card_summary, match_stats)
+    except BaseException:
+        store.close()
+        raise
@@ -0,0 +1,142 @@
+"""Read-only, column-projected XLSX statement reader.
+
+``pd.read_excel`` converts every cell of every column and then runs the
+sheet through pandas' Python text parser. ``read_statement`` streams rows
+with openpyxl's read-only mode, keeps only the columns a bank needs and
+builds the frame column by column, converting cell values the same way
+``read_excel`` does (integral floats become ints, blanks become NaN).
+Columns holding text still go through the text parser ``read_excel`` uses,
+so numeric, boolean and NA-like text ('300', 'TRUE', 'N/A') is converted
+as it is there; columns of numbers and dates skip it.
+
+Pass it to ``ParseCache.read`` to have each sheet stored as Parquet the
+first time it is seen; ``engine.load_statements`` does this when given a
+cache.
+"""
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# Columns each statement contributes to the reconciliation
+STATEMENT_COLUMNS = {
+    'KCB': ['TID', 'Card No', 'Trans Date', 'RRN', 'Amount', 'Comm', 'NetPaid', 'Merchant'],
+    'Equity': ['TID', 'Outlet_Name', 'Card_Number', 'TRANS_DATE', 'R_R_N', 'Purchase',
+               'Trans_Amount', 'Commission', 'Settlement_Amount', 'Cash_Back'],
+    'Co-op': ['TRANSACTION DATE', 'TRANSACTION AMOUNT', 'BANK COMM', 'RRN CODE'],
+    'key': ['Col_1', 'Col_2'],
+}
+
+# Header offset of each statement's data table
+STATEMENT_SKIPROWS = {'Co-op': 6}
+
+_ZIP_MAGIC = b'PK\x03\x04'
+
+
+def _convert(value):
+    # Mirrors pandas' openpyxl reader: integral numbers come back as int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _has_text(values):
+    return any(isinstance(value, str) for value in values)
+
+
+def _parse_text(names, columns):
+    # The parser read_excel runs every sheet through, on the text columns only;
+    # it sees blank cells as '' as it does there
+    from pandas.io.parsers import TextParser
+
+    rows = zip(*[['' if value is None else value for value in values] for values in columns])
+    return TextParser([names] + [list(row) for row in rows], header=0).read()
+
+
+def _is_workbook(source):
+    # .xlsx files are zip archives; anything else (.xls) is left to read_excel
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fh:
+            return fh.read(len(_ZIP_MAGIC)) == _ZIP_MAGIC
+    return source.getvalue().startswith(_ZIP_MAGIC)
+
+
+def _column(values):
+    series = pd.Series(values, dtype=object)
+    blank = series.isna()
+    if blank.all():
+        return series.astype(float)
+    if blank.any():
+        series[blank] = np.nan
+    return series.infer_objects()
+
+
+def read_statement(source, columns=None, skiprows=0, sheet_name=0):
+    """Read one sheet of an .xlsx statement into a DataFrame.
+
+    ``columns`` lists the header names to keep (matched after stripping
+    whitespace; absent ones are skipped), ``None`` keeps them all.
+    ``skiprows`` is the number of rows above the header, as in
+    ``read_excel``. Anything that is not a zip archive, a legacy .xls path
+    or upload, falls back to ``pd.read_excel``.
+    """
+    from openpyxl import load_workbook
+
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    elif not isinstance(source, (str, os.PathLike)) and not hasattr(source, 'getvalue'):
+        source = BytesIO(source.read())
+    if not _is_workbook(source):
+        return pd.read_excel(source, skiprows=skiprows, sheet_name=sheet_name,
+                             usecols=lambda c: columns is None or str(c).strip() in columns)
+
+    wb = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+        # Some bank exports declare a wrong sheet dimension; read to the real end
+        ws.reset_dimensions()
+        rows = ws.iter_rows(min_row=skiprows + 1, values_only=True)
+
+        header = next(rows, ())
+        names, seen = [], {}
+        for i, name in enumerate(header):
+            name = f'Unnamed: {i}' if name is None else str(name)
+            # Repeated headers are numbered like read_excel does ('Amount.1')
+            if name in seen:
+                seen[name] += 1
+                name = f'{name}.{seen[name]}'
+            else:
+                seen[name] = 0
+            names.append(name)
+        wanted = columns is None or set(columns)
+        keep = [i for i, name in enumerate(names) if wanted is True or name.strip() in wanted]
+
+        # Gather the kept columns only; rows may be shorter than the header
+        width = max(keep) + 1 if keep else 0
+        cells = [[] for _ in keep]
+        last_row_with_data = -1
+        for row_number, row in enumerate(rows):
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            has_data = False
+            for out, i in zip(cells, keep):
+                value = row[i]
+                if value is not None:
+                    has_data = True
+                out.append(_convert(value))
+            if has_data:
+                last_row_with_data = row_number
+    finally:
+        wb.close()
+
+    # Trailing blank rows are dropped, as read_excel does
+    n_rows = last_row_with_data + 1
+    cells = [values[:n_rows] for values in cells]
+    kept = [names[i] for i in keep]
+    text = [j for j, values in enumerate(cells) if _has_text(values)]
+    parsed = _parse_text([kept[j] for j in text], [cells[j] for j in text]) if text else None
+    return pd.DataFrame({
+        name: parsed[name] if parsed is not None and name in parsed else _column(values)
+        for name, values in zip(kept, cells)
+    })
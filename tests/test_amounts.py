@@ -0,0 +1,51 @@
+"""to_cents rounding against decimal arithmetic."""
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from recon import arrow_backend
+from recon.amounts import decimals, from_cents, to_cents
+
+
+def exact_cents(amount):
+    # Half away from zero on the decimal the float was written as
+    return int((Decimal(repr(amount)) * 100).quantize(Decimal(1), ROUND_HALF_UP))
+
+
+HALF_STEPS = [0.005, 1.005, 2.675, 1.015, 10.125, 123456.785, 12345678.905, -1.005, -0.015]
+
+
+def test_half_cent_steps_round_away_from_zero():
+    assert to_cents(HALF_STEPS).tolist() == [exact_cents(a) for a in HALF_STEPS]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_amounts_equal_decimal_rounding(seed):
+    rng = np.random.default_rng(seed)
+    amounts = np.round(rng.uniform(-1e7, 1e7, 20_000), 3)
+    expected = [exact_cents(a) for a in amounts.tolist()]
+
+    assert to_cents(amounts).tolist() == expected
+    assert arrow_backend.to_cents(pa.array(amounts)).to_pylist() == expected
+
+
+def test_text_and_junk():
+    values = [' 12.30 ', '1e3', '-7', '1,250.50', 'abc', None, np.nan, np.inf, -np.inf]
+
+    cents = to_cents(pd.Series(values, dtype=object))
+
+    assert str(cents.dtype) == 'Int64'
+    assert cents.tolist() == [1230, 100000, -700] + [pd.NA] * 6
+
+
+def test_cents_back_to_shillings():
+    df = pd.DataFrame({'Purchase': pd.array([1230, None], dtype='Int64'), 'REF_NO': [1, 2]})
+
+    shillings = from_cents(df)
+
+    assert shillings['Purchase'].tolist()[0] == 12.3 and np.isnan(shillings['Purchase'][1])
+    assert shillings['REF_NO'].tolist() == [1, 2]
+    assert decimals(1230) == 12.3 and np.isnan(decimals(pd.NA))
@@ -0,0 +1,49 @@
+"""Arrow backend stages against the pandas stages they mirror."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from recon.arrow_backend import drop_duplicates, join_matches
+from recon.matching import consume_matches
+
+
+def random_keys(rng, n, pool):
+    return [f'STORE {k}' for k in rng.integers(0, pool, n)]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_join_matches_equals_consume_matches(seed):
+    rng = np.random.default_rng(seed)
+
+    def keys(n):
+        frame = pd.DataFrame({'branch': np.array(random_keys(rng, n, 8), dtype=object),
+                              'cents': rng.integers(0, 20, n).astype(float)})
+        # Missing keys on either column never match
+        frame.loc[rng.random(n) < 0.1, 'branch'] = None
+        frame.loc[rng.random(n) < 0.1, 'cents'] = np.nan
+        return frame
+
+    left, right = keys(400), keys(350)
+
+    expected = consume_matches(left, right)
+    got = join_matches(left, right)
+
+    assert got.pairs.values.tolist() == expected.pairs.values.tolist()
+    assert (got.left_mask == expected.left_mask).all()
+    assert (got.right_mask == expected.right_mask).all()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_drop_duplicates_keeps_the_first_row_like_pandas(seed):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({'store': random_keys(rng, 500, 6),
+                          'rrn': rng.integers(0, 40, 500).astype(float),
+                          'row': np.arange(500)})
+    frame.loc[rng.random(500) < 0.1, 'rrn'] = np.nan
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    table = table.set_column(0, 'store', table['store'].dictionary_encode())
+
+    got = drop_duplicates(table, ['store', 'rrn'])
+
+    assert got['row'].to_pylist() == frame.drop_duplicates(['store', 'rrn'])['row'].tolist()
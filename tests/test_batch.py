@@ -0,0 +1,79 @@
+"""Batch runs over day directories written by benchmarks.synthetic."""
+import pandas as pd
+
+from benchmarks.synthetic import make_statements, write_statements
+from recon import batch, sqlite_backend
+from recon.batch import UNRECOGNISED, discover_days, run_batch, run_day
+
+
+def write_days(root, days):
+    for seed, day in enumerate(days):
+        write_statements(make_statements(300, seed=seed, stores=8, day=day), root / day, day)
+
+
+def test_discover_days_lists_unrecognised_files_and_shares_the_key(tmp_path):
+    write_days(tmp_path, ['2025-06-11'])
+    day_dir = tmp_path / '2025-06-12'
+    day_dir.mkdir()
+    (day_dir / 'QUICK MART 12.6.2025.xlsx').write_bytes(b'')
+    (day_dir / '~$kcb.xlsx').write_bytes(b'')
+    (day_dir / 'notes.txt').write_text('')
+    (tmp_path / 'card_key.xlsx').write_bytes(b'')
+
+    days = discover_days(str(tmp_path))
+
+    assert sorted(days['2025-06-11']) == ['aspire', 'coop', 'equity', 'kcb', 'key']
+    assert days['2025-06-12'] == {UNRECOGNISED: str(day_dir / 'QUICK MART 12.6.2025.xlsx'),
+                                  'key': str(tmp_path / 'card_key.xlsx')}
+    patterned = discover_days(str(tmp_path), {'kcb': 'kcb|quick mart'})
+    assert patterned['2025-06-12']['kcb'].endswith('QUICK MART 12.6.2025.xlsx')
+
+
+def test_a_failing_day_does_not_stop_the_others(tmp_path):
+    write_days(tmp_path, ['2025-06-11', '2025-06-12', '2025-06-13'])
+    (tmp_path / '2025-06-12' / 'kcb.xlsx').write_bytes(b'not a workbook')
+
+    result = run_batch(discover_days(str(tmp_path)), workers=1)
+
+    assert [d.day for d in result.succeeded] == ['2025-06-11', '2025-06-13']
+    assert [d.day for d in result.failed] == ['2025-06-12']
+    sheets = result.report_sheets()
+    assert sheets['failures']['Day'].tolist() == ['2025-06-12']
+    daily = result.daily_summary()
+    combined = result.combined_summary()
+    assert combined.iloc[-1]['Aspire_Zed'] == daily.loc[daily['STORE_NAME'] != 'TOTAL',
+                                                        'Aspire_Zed'].sum()
+    assert set(sheets['Asp_Recs']['Day']) <= {'2025-06-11', '2025-06-13'}
+
+
+def test_run_day_fails_on_unrecognised_and_ambiguous_files(tmp_path):
+    write_days(tmp_path, ['2025-06-11'])
+    sources = discover_days(str(tmp_path))['2025-06-11']
+
+    unrecognised = run_day('2025-06-11', {**sources, UNRECOGNISED: 'x.xlsx'})
+    ambiguous = run_day('2025-06-11', {**sources, 'kcb': (sources['kcb'], sources['kcb'])})
+
+    assert 'no source pattern matches x.xlsx' in unrecognised.error
+    assert 'several files look like kcb' in ambiguous.error
+
+
+def test_run_day_closes_a_sqlite_result(tmp_path, monkeypatch):
+    write_days(tmp_path, ['2025-06-11'])
+    closed = []
+    close = sqlite_backend.SQLiteReconciliation.close
+    monkeypatch.setattr(sqlite_backend.SQLiteReconciliation, 'close',
+                        lambda self: closed.append(close(self)))
+
+    day = run_day('2025-06-11', discover_days(str(tmp_path))['2025-06-11'], backend='sqlite')
+
+    assert day.ok and len(closed) == 1
+    assert not day.exceptions['Asp_Recs'].empty
+
+
+def test_concat_drops_empty_frames():
+    typed = pd.DataFrame({'Purchase': pd.array([100], dtype='Int64')})
+    empty = pd.DataFrame({'Purchase': pd.Series(dtype=object)})
+
+    assert str(batch._concat([empty, typed])['Purchase'].dtype) == 'Int64'
+    assert list(batch._concat([empty, empty]).columns) == ['Purchase']
+    assert batch._concat([]).empty
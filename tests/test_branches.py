@@ -0,0 +1,64 @@
+"""BranchResolver against the get_branch closure app.py used before it."""
+import numpy as np
+import pandas as pd
+
+from recon.branches import UNKNOWN_BRANCH, BranchResolver, fallback_branch
+
+
+def legacy_get_branch(branch_mapping):
+    # Verbatim copy of the get_branch closure app.py used before BranchResolver
+    def get_branch(store_name):
+        store_name = str(store_name).upper()
+        for key in branch_mapping:
+            if str(key).upper() in store_name:
+                return branch_mapping[key]
+        if "QUICK MART" in store_name and "TILL" not in store_name:
+            parts = store_name.split(",")
+            if len(parts) >= 2:
+                return parts[0].split("QUICK MART")[-1].strip("- ").strip()
+        return "UNKNOWN"
+    return get_branch
+
+
+def test_branch_resolver_equals_get_branch():
+    key = pd.DataFrame({
+        'Col_1': ['QUICKMART KILIMANI', 'quickmart kile', 'QUICKMART KILIMANI 2', 'THIKA RD'],
+        'Col_2': ['KILIMANI', 'KILELESHWA', 'KILIMANI 2', 'THIKA ROAD'],
+    })
+    stores = pd.Series([
+        'QUICKMART KILIMANI 2 TILL 4', 'QuickMart Kileleshwa', 'THIKA RD MALL',
+        'QUICK MART - RUAKA, NAIROBI KE', 'QUICK MART RUAKA TILL 3, NAIROBI',
+        'OTHER MERCHANT', '', None, np.nan, 12345,
+    ], dtype=object)
+    get_branch = legacy_get_branch(dict(zip(key['Col_1'], key['Col_2'])))
+
+    resolved = BranchResolver.from_key(key).resolve(stores)
+
+    assert resolved.tolist() == [get_branch(s) for s in stores]
+    assert resolved.index.equals(stores.index)
+
+
+def test_branch_resolver_equals_get_branch_on_random_stores():
+    rng = np.random.default_rng(0)
+    words = ['QUICKMART', 'QUICK MART', 'TILL', 'EMBAKASI', 'EMBA', 'KAREN', ',', '-', 'KE']
+    key = pd.DataFrame({'Col_1': ['QUICKMART EMBA', 'QUICKMART EMBAKASI', 'KAREN', 'MART'],
+                        'Col_2': ['EMBA', 'EMBAKASI', 'KAREN', 'MART']})
+    stores = pd.Series([' '.join(rng.choice(words, rng.integers(1, 6))) for _ in range(500)])
+    get_branch = legacy_get_branch(dict(zip(key['Col_1'], key['Col_2'])))
+
+    resolved = BranchResolver.from_key(key).resolve(stores)
+
+    assert resolved.tolist() == [get_branch(s) for s in stores]
+
+
+def test_first_key_entry_in_file_order_wins():
+    resolver = BranchResolver({'QUICKMART KILIMANI 2': 'K2', 'QUICKMART KILIMANI': 'K1'})
+
+    assert resolver.resolve_one('quickmart kilimani 2 till 1') == 'K2'
+    assert resolver.resolve_one('QUICKMART KILIMANI TILL 1') == 'K1'
+
+
+def test_fallback_and_unknown():
+    assert fallback_branch('QUICK MART - RUAKA, NAIROBI KE') == 'RUAKA'
+    assert fallback_branch('QUICK MART RUAKA TILL 3, NAIROBI') == UNKNOWN_BRANCH
+    assert BranchResolver({}).resolve_one('OTHER MERCHANT') == UNKNOWN_BRANCH
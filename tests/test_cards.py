@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from recon.cards import DEFAULT_TOKEN_KEY, card_tokens, normalize_cards, resolve_token_key
+
+
+def test_normalize_cards_masks_and_keys_every_row():
+    cards = pd.Series(['4111 1111 1111 1111', '4111111111111111', None, '1234',
+                       '5500-0000-0000-0004'])
+
+    result = normalize_cards(cards)
+
+    assert result['Card_Number'].tolist()[:2] == ['411111******1111'] * 2
+    assert pd.isna(result['Card_Number'][2])
+    assert result['card_check'].tolist() == ['41111111', '41111111', '', '', '55000004']
+    tokens = result['card_token'].to_numpy()
+    assert tokens[0] == tokens[1] != 0
+    assert tokens[2] == tokens[3] == 0
+    assert result.index.equals(cards.index)
+
+
+def test_card_tokens_depend_on_the_key():
+    values = np.array(['41111111', ''], dtype=object)
+
+    default = card_tokens(values)
+    rotated = card_tokens(values, token_key='0123456789abcdef')
+
+    assert default[1] == rotated[1] == 0
+    assert default[0] != rotated[0]
+
+
+def test_token_key_from_the_environment(monkeypatch):
+    monkeypatch.setenv('RECON_CARD_TOKEN_KEY', '0123456789abcdef')
+    assert resolve_token_key() == '0123456789abcdef'
+    monkeypatch.delenv('RECON_CARD_TOKEN_KEY')
+    assert resolve_token_key() == DEFAULT_TOKEN_KEY
+
+
+@pytest.mark.parametrize('key', ['short', '0123456789abcdef0', 'é' * 15])
+def test_token_key_must_be_16_bytes(monkeypatch, key):
+    monkeypatch.setenv('RECON_CARD_TOKEN_KEY', key)
+
+    with pytest.raises(ValueError, match='16 bytes'):
+        card_tokens(np.array(['41111111'], dtype=object))
+
+
+def test_reconcile_files_checks_the_key_first(monkeypatch):
+    from recon import engine
+
+    monkeypatch.setenv('RECON_CARD_TOKEN_KEY', 'short')
+    with pytest.raises(ValueError, match='RECON_CARD_TOKEN_KEY'):
+        engine.reconcile_files(aspire='/does/not/exist.csv')
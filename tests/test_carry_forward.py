@@ -0,0 +1,76 @@
+"""CarryForwardStore across days: closing, re-applying and the report sheets."""
+import pandas as pd
+import pytest
+
+from recon.carry_forward import ASPIRE, BANK, CarryForwardStore
+
+
+def aspire(rows):
+    return pd.DataFrame({'REF_NO': [rrn for rrn, _, _ in rows],
+                         'STORE_NAME': [store for _, store, _ in rows],
+                         'AMOUNT': pd.array([cents for _, _, cents in rows], dtype='Int64')})
+
+
+def kcb(rows):
+    return pd.DataFrame({'Source': 'KCB', 'REF_NO': [rrn for rrn, _, _ in rows],
+                         'branch': [branch for _, branch, _ in rows],
+                         'Purchase': pd.array([cents for _, _, cents in rows], dtype='Int64')})
+
+
+def exceptions(aspire_rows=(), bank_rows=()):
+    return {'Asp_Recs': aspire(aspire_rows), 'kcb_recs': kcb(bank_rows)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CarryForwardStore(str(tmp_path / 'carry.db')) as store:
+        yield store
+
+
+def test_next_day_rows_close_open_items_on_rrn_then_branch_amount(store):
+    store.apply('2025-06-11', exceptions([('512345678901', 'Westlands', 10_000),
+                                          (None, 'Karen', 5_050),
+                                          (None, 'Karen', 700)]))
+
+    result = store.apply('2025-06-12', exceptions(bank_rows=[
+        ('512345678901', 'WEST LANDS', 9_900), (None, 'KAREN', 5_050), (None, 'Thika', 1)]))
+
+    assert result.closed[['Pass', 'Side', 'Opened_Day']].values.tolist() == [
+        ['rrn', BANK, '2025-06-11'], ['branch_amount', BANK, '2025-06-11']]
+    assert (result.new_items, result.opened) == (3, 1)
+    open_items = store.open_items()
+    assert open_items[['Side', 'Opened_Day', 'Amount']].values.tolist() == [
+        [ASPIRE, '2025-06-11', 7.0], [BANK, '2025-06-12', 0.01]]
+    assert open_items['STORE_NAME'].tolist()[0] == 'Karen'
+
+
+def test_reapplying_the_last_day_undoes_it_first(store):
+    store.apply('2025-06-11', exceptions([(None, 'Karen', 5_050)]))
+    store.apply('2025-06-12', exceptions(bank_rows=[(None, 'Karen', 5_050)]))
+
+    again = store.apply('2025-06-12', exceptions(bank_rows=[(None, 'Karen', 100)]))
+
+    assert len(again) == 0
+    assert store.open_items()['Amount'].tolist() == [50.5, 1.0]
+    assert store.applied_days() == ['2025-06-11', '2025-06-12']
+
+
+def test_an_earlier_day_is_refused(store):
+    store.apply('2025-06-12', exceptions([(None, 'Karen', 5_050)]))
+
+    with pytest.raises(ValueError, match='before the last carried-forward day'):
+        store.apply('2025-06-11', exceptions(bank_rows=[(None, 'Karen', 5_050)]))
+    assert store.applied_days() == ['2025-06-12']
+
+
+def test_open_items_sheet_keeps_recent_days_and_the_row_cap(store):
+    for day in range(1, 6):
+        store.apply(f'2025-06-0{day}', exceptions([(None, f'Store {day}', day * 100)] * 3))
+
+    sheets = store.open_sheets(recent_days=2, max_rows=4)
+
+    assert sheets['Open_Items']['Opened_Day'].tolist() == ['2025-06-04'] + ['2025-06-05'] * 3
+    by_day = sheets['Open_Items_By_Day']
+    assert by_day['Items'].tolist() == [3] * 5
+    assert by_day['Amount'].tolist() == [3.0, 6.0, 9.0, 12.0, 15.0]
+    assert len(store.open_items()) == 15
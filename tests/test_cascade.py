@@ -0,0 +1,58 @@
+"""run_cascade with the card + amount window pass ahead of the exact passes."""
+import numpy as np
+import pandas as pd
+
+from recon.cascade import KeyTable, exact_pass, run_cascade, timestamp_key, window_pass
+
+KEYS = {'card': lambda df: df['card'], 'amount': lambda df: df['amount'],
+        'time': lambda df: timestamp_key(df['time'])}
+
+
+def side(rows):
+    return pd.DataFrame(rows, columns=['card', 'amount', 'time'])
+
+
+def cascade(aspire, bank, window='30min'):
+    passes = [window_pass('card_amount_time', ['card', 'amount'], 'time', pd.Timedelta(window)),
+              exact_pass('card_amount', ['card', 'amount'])]
+    return run_cascade(passes, KeyTable(side(aspire), KEYS), KeyTable(side(bank), KEYS))
+
+
+def test_window_pass_pairs_the_nearest_time_within_the_window():
+    aspire = [(1, 500, '2025-06-11 10:00'), (1, 500, '2025-06-11 10:40'),
+              (2, 700, '2025-06-11 09:00'), (3, 900, None)]
+    bank = [(1, 500, '2025-06-11 10:35:00'), (1, 500, '2025-06-11 10:05:00'),
+            (2, 700, '2025-06-11 10:00:00'), (3, 900, '2025-06-11 09:00:00')]
+
+    result = cascade(aspire, bank)
+
+    assert result.pairs[['pass', 'left', 'right']].values.tolist() == [
+        ['card_amount_time', 0, 1], ['card_amount_time', 1, 0],
+        ['card_amount', 2, 2], ['card_amount', 3, 3]]
+    assert result.pairs['diff'].tolist() == [0, 0, 0, 0]
+    assert result.stats['Matched'].tolist() == [2, 2]
+    assert result.stats[['Left_in', 'Right_in']].values.tolist() == [[4, 4], [2, 2]]
+
+
+def test_window_edges_and_time_zones():
+    aspire = [(1, 500, '2025-06-11 10:00'), (2, 500, '2025-06-11 10:00')]
+    bank = [(1, 500, '2025-06-11 10:30:00'), (2, 500, '2025-06-11 10:30:01')]
+
+    result = run_cascade([window_pass('w', 'card', 'time', pd.Timedelta('30min'))],
+                         KeyTable(side(aspire), KEYS), KeyTable(side(bank), KEYS))
+
+    assert result.pairs[['left', 'right']].values.tolist() == [[0, 0]]
+    aware = timestamp_key(pd.Series(pd.to_datetime(['2025-06-11 10:00']).tz_localize('UTC')))
+    assert aware.tolist() == timestamp_key(pd.Series(['2025-06-11 10:00'])).tolist()
+    assert timestamp_key(pd.Series(['not a date', None])).isna().all()
+
+
+def test_without_times_the_rows_fall_through_to_the_exact_pass():
+    rng = np.random.default_rng(0)
+    aspire = [(int(c), 100, None) for c in rng.integers(0, 5, 40)]
+    bank = [(int(c), 100, None) for c in rng.integers(0, 5, 30)]
+
+    result = cascade(aspire, bank)
+
+    assert result.stats['Matched'].tolist()[0] == 0
+    assert (result.left_pass[result.left_mask] == 'card_amount').all()
@@ -0,0 +1,100 @@
+"""RunDiagnostics stage records and the shared tracemalloc session."""
+import pickle
+import threading
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from recon.diagnostics import MB, RunDiagnostics, stage
+
+
+def allocate(mb):
+    # Held until the caller drops it
+    return bytearray(mb * MB)
+
+
+def test_stages_nest_and_record_rows():
+    events = []
+    diagnostics = RunDiagnostics(listener=lambda event, record: events.append(
+        (event, record.name)))
+
+    with diagnostics.run():
+        with stage(diagnostics, 'load', [pd.DataFrame({'a': range(3)})]) as record:
+            with stage(diagnostics, 'read KCB'):
+                pass
+            record.out({'KCB': pd.DataFrame({'a': range(2)}), 'Equity': None})
+        with pytest.raises(ValueError):
+            with stage(diagnostics, 'match'):
+                raise ValueError('boom')
+
+    frame = diagnostics.frame()
+    assert frame['Stage'].tolist() == ['load', '  read KCB', 'match']
+    assert frame[['Rows_in', 'Rows_out']].iloc[0].tolist() == [3, 2]
+    assert frame['Peak_MB'].isna().all()
+    assert events == [('start', 'load'), ('start', 'read KCB'), ('end', 'read KCB'),
+                      ('end', 'load'), ('start', 'match'), ('failed', 'match')]
+    assert diagnostics.seconds >= 0
+    with stage(None, 'nothing') as record:
+        assert record.out(5) == 5
+
+
+def test_traced_stages_record_their_peak_and_stop_tracing():
+    diagnostics = RunDiagnostics(trace_memory=True)
+
+    with diagnostics.run():
+        with stage(diagnostics, 'outer'):
+            with stage(diagnostics, 'inner'):
+                block = allocate(20)
+                del block
+
+    outer, inner = diagnostics.stages
+    assert inner.peak_bytes >= 20 * MB and outer.peak_bytes >= inner.peak_bytes
+    assert not tracemalloc.is_tracing()
+    assert pickle.loads(pickle.dumps(diagnostics)).stages[1].peak_bytes == inner.peak_bytes
+
+
+def test_an_untraced_run_leaves_the_traced_peak_alone():
+    traced, plain = RunDiagnostics(trace_memory=True), RunDiagnostics()
+
+    with traced.run():
+        with stage(traced, 'match'):
+            block = allocate(20)
+            del block
+            with plain.run(), stage(plain, 'elsewhere'):
+                pass
+
+    assert traced.stages[0].peak_bytes >= 20 * MB
+    assert plain.stages[0].peak_bytes is None
+
+
+def test_overlapping_traced_runs_share_one_tracing_session():
+    first_in, second_in, first_out = threading.Event(), threading.Event(), threading.Event()
+    tracing_after_first = []
+    second = RunDiagnostics(trace_memory=True)
+
+    def run_first():
+        with RunDiagnostics(trace_memory=True).run():
+            first_in.set()
+            second_in.wait(5)
+        first_out.set()
+
+    def run_second():
+        first_in.wait(5)
+        with second.run():
+            second_in.set()
+            first_out.wait(5)
+            tracing_after_first.append(tracemalloc.is_tracing())
+            with stage(second, 'match'):
+                block = allocate(10)
+                del block
+
+    threads = [threading.Thread(target=run_first), threading.Thread(target=run_second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert tracing_after_first == [True]
+    assert second.stages[0].peak_bytes >= 10 * MB
+    assert not tracemalloc.is_tracing()
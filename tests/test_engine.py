@@ -0,0 +1,124 @@
+"""Engine stages against the notebook and app.py code they replaced."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from recon import engine
+from recon.matching import FALSE, OKAY
+
+STORES = [' Westlands A', 'WESTLANDS  A', 'Karen B', 'karen b ', 'Thika Road C']
+
+
+def residuals(rng, n_aspire, n_bank):
+    # Open rows after the RRN match, amounts in cents around a few shilling values
+    def amounts(n):
+        cents = rng.choice([10_000, 10_049, 10_050, 10_150, 25_099, 25_100], n)
+        return pd.array(cents, dtype='Int64')
+    aspire = pd.DataFrame({'STORE_NAME': rng.choice(STORES, n_aspire),
+                           'AMOUNT': amounts(n_aspire), 'rrn_check': 0})
+    bank = pd.DataFrame({'branch': rng.choice(STORES, n_bank),
+                         'Purchase': amounts(n_bank), 'Cheked_rows': 'No'})
+    return aspire, bank
+
+
+def check_two(names, cents, compact, rounded):
+    # The notebook's Check_Two strings, built from amounts in shillings
+    names = names.astype(str)
+    names = names.str.replace(r'\s+', '', regex=True) if compact else names.str.strip()
+    shillings = cents.astype(float) / 100
+    shillings = shillings.round() if rounded else shillings
+    return names.str.upper() + shillings.astype(int).astype(str)
+
+
+def notebook_flags(aspire, bank):
+    # check_and_consume for Aspire; Matchable, then match_and_trace for the bank rows
+    available = check_two(bank['branch'], bank['Purchase'], False, False).tolist()
+    aspire_okay = []
+    for val in check_two(aspire['STORE_NAME'], aspire['AMOUNT'], False, False):
+        aspire_okay.append(val in available)
+        if aspire_okay[-1]:
+            available.remove(val)
+
+    matchable = check_two(bank['branch'], bank['Purchase'], True, True).isin(
+        set(check_two(aspire['STORE_NAME'], aspire['AMOUNT'], True, True)))
+    pool = dict.fromkeys(check_two(aspire['STORE_NAME'], aspire['AMOUNT'], True, False))
+    traced = [val in pool and pool.pop(val) is None
+              for val in check_two(bank['branch'], bank['Purchase'], True, False)[~matchable]]
+    bank_okay = matchable.to_numpy().copy()
+    bank_okay[~matchable.to_numpy()] = traced
+    return aspire_okay, bank_okay.tolist()
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_notebook_passes_flag_each_side_as_the_notebook(seed):
+    aspire, bank = residuals(np.random.default_rng(seed), 200, 180)
+
+    newaspire, newbank, stats = engine.match_amounts(aspire, bank,
+                                                     passes=engine.notebook_passes())
+
+    aspire_okay, bank_okay = notebook_flags(aspire, bank)
+    assert newaspire['Amount_check'].tolist() == [OKAY if ok else FALSE for ok in aspire_okay]
+    assert newbank['Amount_check'].tolist() == [OKAY if ok else FALSE for ok in bank_okay]
+    assert newaspire['Amount_diff'].isna().all() and newbank['Amount_diff'].isna().all()
+    assert stats['Pass'].tolist() == ['check_and_consume', 'matchable', 'match_and_trace']
+    assert stats['Matched'].sum() == sum(aspire_okay) + sum(bank_okay)
+
+
+def test_cascade_pairs_both_sides_one_to_one():
+    aspire, bank = residuals(np.random.default_rng(0), 200, 180)
+
+    newaspire, newbank, _ = engine.match_amounts(aspire, bank, card_window=None)
+
+    assert (newaspire['Amount_check'] == OKAY).sum() == (newbank['Amount_check'] == OKAY).sum()
+    assert newaspire['Amount_diff'].abs().max() <= engine.AMOUNT_TOLERANCE
+
+
+def test_amount_passes_rejects_an_unknown_matching():
+    assert engine.amount_passes(matching='notebook')[0].name == 'check_and_consume'
+    with pytest.raises(ValueError):
+        engine.amount_passes(matching='legacy')
+
+
+def per_store_summary(zed, merged, newaspire, newbank):
+    # card_summary one measure at a time, as the app built it before the long frame
+    stores = zed.sort_index()
+    summary = pd.DataFrame({'STORE_NAME': stores.index, 'Aspire_Zed': stores.to_numpy()})
+
+    def add(name, rows, by, amount):
+        totals = rows.groupby(by)[amount].sum()
+        summary[name] = summary['STORE_NAME'].map(totals).fillna(0).astype('Int64')
+    add('kcb_paid', merged[merged['Source'] == 'KCB'], 'branch', 'Purchase')
+    add('equity_paid', merged[merged['Source'] == 'Equity'], 'branch', 'Purchase')
+    bank_false = newbank[newbank['Amount_check'] == FALSE]
+    add('kcb_recs', bank_false[bank_false['Source'] == 'KCB'], 'branch', 'Purchase')
+    add('Equity_recs', bank_false[bank_false['Source'] == 'Equity'], 'branch', 'Purchase')
+    add('Asp_Recs', newaspire[newaspire['Amount_check'] == FALSE], 'STORE_NAME', 'AMOUNT')
+    summary['Gross_Banking'] = summary['kcb_paid'] + summary['equity_paid']
+    summary['Variance'] = summary['Gross_Banking'] - summary['Aspire_Zed']
+    summary['Net_variance'] = (summary['Variance'] - summary['kcb_recs']
+                               - summary['Equity_recs'] + summary['Asp_Recs'])
+    summary.insert(0, 'No', range(1, len(summary) + 1))
+    summary = summary[['No', 'STORE_NAME'] + engine.SUMMARY_COLUMNS]
+    total = {'No': '', 'STORE_NAME': 'TOTAL', **summary[engine.SUMMARY_COLUMNS].sum()}
+    return pd.concat([summary, pd.DataFrame([total])], ignore_index=True)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_card_summary_equals_the_per_measure_sums(seed):
+    rng = np.random.default_rng(seed)
+    n_aspire, n_bank = 400, 350
+    aspire = pd.DataFrame({'STORE_NAME': rng.choice(['Karen', 'Thika', 'Westlands'], n_aspire),
+                           'AMOUNT': pd.array(rng.integers(100, 50_000, n_aspire), 'Int64'),
+                           'Amount_check': rng.choice([OKAY, FALSE], n_aspire)})
+    merged = pd.DataFrame({
+        # Bank-only branches and Co-op rows never reach the summary's sums
+        'branch': rng.choice(['Karen', 'Thika', 'Westlands', 'Ruiru'], n_bank),
+        'Source': rng.choice(['KCB', 'Equity', 'Co-op'], n_bank),
+        'Purchase': pd.array(rng.integers(100, 50_000, n_bank), 'Int64'),
+        'Amount_check': rng.choice([OKAY, FALSE], n_bank)})
+
+    summary = engine.build_card_summary(engine.aspire_zed(aspire), merged, aspire, merged)
+
+    expected = per_store_summary(engine.aspire_zed(aspire), merged, aspire, merged)
+    pd.testing.assert_frame_equal(summary, expected, check_dtype=False)
+    assert summary['STORE_NAME'].tolist() == ['Karen', 'Thika', 'Westlands', 'TOTAL']
@@ -0,0 +1,69 @@
+"""write_sheets output read back with pd.read_excel."""
+import os
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from recon import export
+from recon.export import export_report, write_sheets
+
+
+def frame(n, start=0):
+    return pd.DataFrame({
+        'row': np.arange(start, start + n),
+        'amount': [1.5 * i if i % 3 else np.nan for i in range(start, start + n)],
+        'store': [f'Store {i}' if i % 4 else np.nan for i in range(start, start + n)],
+        'when': pd.date_range('2025-06-11 08:00', periods=n, freq='min') + pd.Timedelta(
+            minutes=start),
+        'ok': [i % 2 == 0 for i in range(start, start + n)],
+    })
+
+
+def test_frames_keep_their_rows_and_values(tmp_path):
+    df = frame(120)
+    path = write_sheets({'Report': df}, str(tmp_path / 'report.xlsx'))
+
+    pd.testing.assert_frame_equal(pd.read_excel(path, sheet_name='Report'), df)
+
+
+def test_chunks_continue_on_numbered_sheets_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, 'EXCEL_MAX_ROWS', 5)
+    chunks = [frame(3), frame(4, 3), frame(0, 7), frame(2, 7)]
+
+    path = write_sheets({'Reconciled_Transactions': iter(chunks)}, str(tmp_path / 'r.xlsx'))
+
+    sheets = pd.read_excel(path, sheet_name=None)
+    assert list(sheets) == ['Reconciled_Transactions', 'Reconciled_Transactions (2)',
+                            'Reconciled_Transactions (3)']
+    assert [len(df) for df in sheets.values()] == [4, 4, 1]
+    stacked = pd.concat(sheets.values(), ignore_index=True)
+    pd.testing.assert_frame_equal(stacked, frame(9))
+
+
+def test_a_frame_over_the_row_limit_is_refused(monkeypatch):
+    monkeypatch.setattr(export, 'EXCEL_MAX_ROWS', 5)
+
+    with pytest.raises(ValueError, match='do not fit'):
+        write_sheets({'Report': frame(5)}, BytesIO())
+
+
+def test_number_formats_keep_cells_numeric(tmp_path):
+    path = write_sheets({'card_summary': frame(4)}, str(tmp_path / 'r.xlsx'),
+                        number_formats={'card_summary': {'amount': '#,##0.00'}})
+
+    ws = openpyxl.load_workbook(path)['card_summary']
+    assert ws['B3'].value == 1.5 and ws['B3'].number_format == '#,##0.00'
+    assert ws['A3'].number_format == 'General'
+
+
+def test_export_report_leaves_out_raw_sheets_on_request():
+    sheets = {'card_summary': frame(2), 'KCB_Raw_Data': frame(2), 'Empty': iter([])}
+
+    path = export_report(sheets, include_raw=False)
+    try:
+        assert list(pd.read_excel(path, sheet_name=None)) == ['card_summary', 'Empty']
+    finally:
+        os.remove(path)
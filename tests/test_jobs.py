@@ -0,0 +1,128 @@
+"""JobManager runs on threads: status, progress and traced jobs taking turns."""
+import threading
+import time
+
+import pytest
+
+from recon.diagnostics import stage
+from recon.jobs import DONE, FAILED, QUEUED, RUNNING, JobManager
+
+
+def wait(job, seconds=10):
+    deadline = time.monotonic() + seconds
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def staged(diagnostics=None, release=None, fail=False):
+    with stage(diagnostics, 'load'):
+        pass
+    with stage(diagnostics, 'match'):
+        with stage(diagnostics, 'exact'):
+            if release is not None:
+                release.wait(5)
+        if fail:
+            raise ValueError('no statements')
+    return 'report'
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(threads=1)
+    yield manager
+    manager.shutdown()
+
+
+def test_a_job_reports_its_stages_and_result(manager):
+    release = threading.Event()
+    job = manager.submit(staged, label='day', stages=['load', 'match', 'export'],
+                         release=release)
+
+    deadline = time.monotonic() + 5
+    while job.current_stage != 'exact' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.status == RUNNING
+    assert job.progress == pytest.approx(1 / 3)
+    assert job.stage_frame()['Stage'].tolist() == ['load', 'match', '  exact']
+    release.set()
+
+    assert wait(job).status == DONE
+    assert (job.result, job.error, job.progress) == ('report', None, 1.0)
+    assert job.stage_frame()['Status'].tolist() == [DONE] * 3
+    assert job.diagnostics.frame()['Stage'].tolist() == ['load', 'match', '  exact']
+    assert manager.get(job.id) is job
+
+
+def test_a_failed_job_keeps_the_error_and_the_failed_stage(manager):
+    job = wait(manager.submit(staged, fail=True))
+
+    assert job.status == FAILED and not job.ok
+    assert job.result is None
+    assert job.error_message == 'ValueError: no statements'
+    assert job.stage_frame()['Status'].tolist() == [DONE, FAILED, DONE]
+
+
+def test_queue_position_counts_queued_jobs_ahead(manager):
+    release = threading.Event()
+    first = manager.submit(staged, release=release)
+    deadline = time.monotonic() + 5
+    while first.status != RUNNING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    second, third = manager.submit(staged), manager.submit(staged)
+
+    assert [manager.queue_position(job) for job in (first, second, third)] == [0, 0, 1]
+    release.set()
+    for job in (first, second, third):
+        assert wait(job).ok
+    assert manager.queue_position(third) == 0
+
+
+def test_prune_drops_old_finished_jobs_and_forget_drops_any(manager):
+    kept = wait(manager.submit(staged))
+    manager.keep_seconds = 0
+    time.sleep(0.01)
+
+    manager.prune()
+    assert manager.jobs == []
+    assert manager.get(kept.id) is None
+
+    release = threading.Event()
+    running = manager.submit(staged, release=release)
+    manager.prune()
+    assert manager.jobs == [running]
+    manager.forget(running.id)
+    assert manager.jobs == []
+    release.set()
+    assert wait(running).ok
+
+
+def test_traced_jobs_run_one_at_a_time():
+    manager = JobManager(threads=4)
+    lock = threading.Lock()
+    running, overlaps = [], []
+
+    def run(diagnostics=None):
+        with lock:
+            running.append(1)
+            overlaps.append(len(running))
+        with stage(diagnostics, 'work'):
+            time.sleep(0.05)
+        with lock:
+            running.pop()
+        return diagnostics.stages[0].peak_bytes
+
+    try:
+        traced = [manager.submit(run, trace_memory=True) for _ in range(3)]
+        for job in traced:
+            assert wait(job).ok
+        assert max(overlaps) == 1
+        assert all(job.result is not None for job in traced)
+
+        overlaps.clear()
+        plain = [manager.submit(run) for _ in range(3)]
+        for job in plain:
+            assert wait(job).ok
+        assert max(overlaps) > 1
+    finally:
+        manager.shutdown()
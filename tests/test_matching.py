@@ -0,0 +1,167 @@
+"""consume_matches and flag_matches against the notebook's loops they replaced,
+and nearest_matches against a brute-force closest-first match.
+
+The notebook's Okay/False flags must stay identical, so each check feeds
+the same keys to a copy of the loop and to the vectorized match.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from recon.matching import FALSE, OKAY, consume_matches, flag_matches, nearest_matches
+
+
+def random_keys(rng, n, pool):
+    return [f'STORE {k}' for k in rng.integers(0, pool, n)]
+
+
+def legacy_consume(left, right):
+    # The notebook's check_and_consume loop, also recording which right row was consumed
+    available = list(right)
+    taken = [False] * len(available)
+    pairs = []
+    for i, val in enumerate(left):
+        if val in available:
+            j = available.index(val)
+            # list.remove drops the first equal entry; find its original position
+            pos = [k for k, t in enumerate(taken) if not t][j]
+            available.remove(val)
+            taken[pos] = True
+            pairs.append((i, pos))
+    return pairs
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_consume_matches_equals_list_remove(seed):
+    rng = np.random.default_rng(seed)
+    left = random_keys(rng, 300, 40)
+    right = random_keys(rng, 250, 40)
+
+    result = consume_matches(pd.Series(left), pd.Series(right))
+
+    pairs = legacy_consume(left, right)
+    assert list(result.pairs.itertuples(index=False, name=None)) == pairs
+    matched = {i for i, _ in pairs}
+    assert result.left_flags().tolist() == [OKAY if i in matched else FALSE
+                                            for i in range(len(left))]
+
+
+def test_consume_matches_multi_column_and_null_keys():
+    left = pd.DataFrame({'branch': ['A', 'A', None, 'B', 'A'], 'cents': [100, 100, 100, 5, 200]})
+    right = pd.DataFrame({'branch': ['A', None, 'B', 'A'], 'cents': [100, 100, 5, 100]})
+
+    result = consume_matches(left, right)
+
+    assert result.pairs.values.tolist() == [[0, 0], [1, 3], [3, 2]]
+    assert result.left_unmatched.tolist() == [2, 4]
+    assert result.right_unmatched.tolist() == [1]
+
+
+def test_consume_matches_with_an_empty_side():
+    result = consume_matches(pd.Series(['A', 'B']), pd.Series([], dtype=object))
+
+    assert len(result) == 0
+    assert result.left_flags().tolist() == [FALSE, FALSE]
+    assert result.right_unmatched.tolist() == []
+
+
+def test_consume_matches_needs_the_same_key_columns():
+    with pytest.raises(ValueError):
+        consume_matches(pd.DataFrame({'a': [1], 'b': [2]}), pd.Series([1]))
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_flag_matches_equals_the_notebook_pools(seed):
+    rng = np.random.default_rng(seed)
+    keys, pool = random_keys(rng, 300, 40), random_keys(rng, 250, 40)
+
+    available = list(pool)
+    removed = []
+    for val in keys:
+        removed.append(val in available)
+        if removed[-1]:
+            available.remove(val)
+    # match_and_trace consumes from a dict, so each distinct key once
+    traced = dict.fromkeys(pool)
+    popped = [traced.pop(val, 0) is None for val in keys]
+
+    assert flag_matches(pd.Series(keys), pd.Series(pool)).tolist() == removed
+    assert flag_matches(pd.Series(keys), pd.Series(pool), 'distinct').tolist() == popped
+    assert (flag_matches(pd.Series(keys), pd.Series(pool), 'any').tolist()
+            == pd.Series(keys).isin(set(pool)).tolist())
+
+
+def test_flag_matches_skips_missing_keys_and_unknown_pools():
+    assert flag_matches(pd.Series(['A', None, 'A']), pd.Series(['A', None])).tolist() == [
+        True, False, False]
+    with pytest.raises(ValueError):
+        flag_matches(pd.Series(['A']), pd.Series(['A']), 'first')
+
+
+def test_nearest_matches_pairs_within_tolerance():
+    result = nearest_matches(pd.Series(['A', 'A', 'A', 'B']), [1000, 1050, 5000, 700],
+                             pd.Series(['A', 'A', 'B', 'B']), [1001, 1049, 700, 800],
+                             tolerance=100)
+
+    pairs = result.pairs.sort_values('left').values.tolist()
+    assert pairs == [[0, 0, -1], [1, 1, 1], [3, 2, 0]]
+    assert result.left_unmatched.tolist() == [2]
+    assert result.right_unmatched.tolist() == [3]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_nearest_matches_is_one_to_one(seed):
+    rng = np.random.default_rng(seed)
+    n = 500
+    left_by, right_by = rng.integers(0, 5, n), rng.integers(0, 5, n)
+    left_values, right_values = rng.integers(0, 10_000, n), rng.integers(0, 10_000, n)
+
+    pairs = nearest_matches(left_by, left_values, right_by, right_values, tolerance=50).pairs
+
+    assert pairs['left'].is_unique and pairs['right'].is_unique
+    left, right = pairs['left'].to_numpy(), pairs['right'].to_numpy()
+    assert (left_by[left] == right_by[right]).all()
+    assert (pairs['diff'].to_numpy() == left_values[left] - right_values[right]).all()
+    assert (pairs['diff'].abs() <= 50).all()
+
+
+def closest_first(left_by, left_values, right_by, right_values, tolerance):
+    # Every row pair within tolerance, taken closest first (lower values on ties)
+    candidates = sorted((abs(lv - rv), min(lv, rv), i, j)
+                        for i, (lb, lv) in enumerate(zip(left_by, left_values))
+                        for j, (rb, rv) in enumerate(zip(right_by, right_values))
+                        if lb == rb and abs(lv - rv) <= tolerance)
+    used_left, used_right, pairs = set(), set(), []
+    for _, _, i, j in candidates:
+        if i not in used_left and j not in used_right:
+            used_left.add(i)
+            used_right.add(j)
+            pairs.append((left_values[i], right_values[j]))
+    return sorted(pairs)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_nearest_matches_equals_closest_first(seed):
+    rng = np.random.default_rng(seed)
+    left_by, right_by = rng.integers(0, 3, 120).tolist(), rng.integers(0, 3, 100).tolist()
+    left_values = rng.integers(0, 2_000, 120).tolist()
+    right_values = rng.integers(0, 2_000, 100).tolist()
+
+    pairs = nearest_matches(pd.Series(left_by), left_values, pd.Series(right_by), right_values,
+                            tolerance=60).pairs
+
+    got = sorted(zip(np.array(left_values)[pairs['left']].tolist(),
+                     np.array(right_values)[pairs['right']].tolist()))
+    assert got == closest_first(left_by, left_values, right_by, right_values, 60)
+
+
+def test_nearest_matches_when_every_group_wants_the_same_partner():
+    # Each right value's nearest left value is the largest one; matching in
+    # rounds of nearest partners paired one group per round here
+    n = 20_000
+    by = pd.Series(['A'] * n)
+
+    pairs = nearest_matches(by, np.arange(n), by, np.arange(n, 2 * n), tolerance=2 * n).pairs
+
+    assert len(pairs) == n
+    assert (pairs['left'] + pairs['right'] == n - 1).all()
@@ -0,0 +1,130 @@
+import logging
+import os
+from io import BytesIO
+
+import pandas as pd
+
+from recon.parse_cache import ParseCache, content_hash
+
+
+def csv_bytes(n, tag='a'):
+    return pd.DataFrame({'RRN': range(n), 'STORE': [f'{tag}{i}' for i in range(n)]}).to_csv(
+        index=False).encode()
+
+
+def counting_reader():
+    calls = []
+
+    def reader(fh, **options):
+        calls.append(options)
+        return pd.read_csv(fh, **options)
+    return reader, calls
+
+
+def test_memory_hit_returns_the_cached_frame_without_parsing(tmp_path):
+    cache = ParseCache(cache_dir=None)
+    reader, calls = counting_reader()
+    data = csv_bytes(10)
+
+    first = cache.read(data, reader)
+    second = cache.read(data, reader)
+
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second is first
+    assert cache.read(data, reader, copy=True) is not first
+
+
+def test_options_are_part_of_the_key():
+    cache = ParseCache(cache_dir=None)
+    reader, calls = counting_reader()
+    data = csv_bytes(10)
+
+    cache.read(data, reader)
+    skipped = cache.read(data, reader, skiprows=[1, 2])
+
+    assert len(calls) == 2
+    assert len(skipped) == 8
+
+
+def test_lru_eviction_keeps_the_byte_budget():
+    reader, _ = counting_reader()
+    uploads = [csv_bytes(200, tag) for tag in 'abc']
+    size = int(pd.read_csv(BytesIO(uploads[0])).memory_usage(deep=True).sum())
+    cache = ParseCache(max_bytes=int(size * 2.5), cache_dir=None)
+
+    cache.read(uploads[0], reader)
+    cache.read(uploads[1], reader)
+    cache.read(uploads[0], reader)      # a is now the most recently used
+    cache.read(uploads[2], reader)      # evicts b
+
+    assert cache.memory_bytes <= cache.max_bytes
+    cache.read(uploads[0], reader)
+    cache.read(uploads[1], reader)
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_frames_over_the_budget_are_not_held():
+    cache = ParseCache(max_bytes=100, cache_dir=None)
+    reader, _ = counting_reader()
+
+    cache.read(csv_bytes(500), reader)
+
+    assert cache.memory_bytes == 0
+
+
+def test_disk_level_serves_a_new_cache(tmp_path):
+    reader, calls = counting_reader()
+    data = csv_bytes(50)
+    expected = ParseCache(cache_dir=str(tmp_path)).read(data, reader)
+
+    cache = ParseCache(cache_dir=str(tmp_path))
+    df = cache.read(data, reader)
+
+    assert len(calls) == 1
+    assert (cache.disk_hits, cache.misses) == (1, 0)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_unreadable_disk_entry_is_logged_and_reparsed(tmp_path, caplog):
+    reader, calls = counting_reader()
+    data = csv_bytes(5)
+    cache = ParseCache(cache_dir=str(tmp_path))
+    cache.read(data, reader)
+    (parquet,) = [name for name in os.listdir(tmp_path) if name.endswith('.parquet')]
+    (tmp_path / parquet).write_bytes(b'not parquet')
+
+    with caplog.at_level(logging.WARNING, logger='recon.parse_cache'):
+        ParseCache(cache_dir=str(tmp_path)).read(data, reader)
+
+    assert len(calls) == 2
+    assert 'dropping unreadable' in caplog.text
+
+
+def test_unwritable_frame_is_logged(tmp_path, caplog):
+    cache = ParseCache(cache_dir=str(tmp_path))
+
+    def mixed(fh):
+        return pd.DataFrame({'RRN': [1, 'x', 2.5]})
+
+    with caplog.at_level(logging.WARNING, logger='recon.parse_cache'):
+        df = cache.read(b'mixed', mixed)
+
+    assert len(df) == 3
+    assert 'could not write' in caplog.text
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.parquet')]
+
+
+def test_content_hash_ignores_the_upload_type(tmp_path):
+    path = tmp_path / 'kcb.csv'
+    path.write_bytes(csv_bytes(3))
+    cache = ParseCache(cache_dir=None)
+    reader, calls = counting_reader()
+
+    cache.read(str(path), reader)
+    with open(path, 'rb') as fh:
+        cache.read(fh, reader)
+    cache.read(path.read_bytes(), reader)
+
+    assert len(calls) == 1
+    assert content_hash(path.read_bytes()) == content_hash(csv_bytes(3))
@@ -0,0 +1,56 @@
+"""normalize_rrns, pandas and Arrow, on the RRN spellings the statements use."""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from recon import arrow_backend
+from recon.rrn import normalize_rrns
+
+
+RRN_SPELLINGS = [
+    ('512345678901', 512345678901),
+    (' 512345678901 ', 512345678901),
+    ('512345678901.0', 512345678901),
+    ('5.12345678901E+11', 512345678901),
+    ('+42', 42),
+    ('0', None),
+    ('-7', None),
+    ('12.5', None),
+    ('', None),
+    ('nan', None),
+    ('N/A', None),
+    (None, None),
+]
+
+
+def test_normalize_rrns_text_spellings():
+    rrns = normalize_rrns(pd.Series([text for text, _ in RRN_SPELLINGS], dtype=object))
+
+    assert str(rrns.dtype) == 'Int64'
+    assert [None if pd.isna(v) else v for v in rrns] == [rrn for _, rrn in RRN_SPELLINGS]
+
+
+def test_normalize_rrns_numbers():
+    floats = normalize_rrns(pd.Series([512345678901.0, 12.5, np.nan, 0.0, -3.0, np.inf]))
+    ints = normalize_rrns(pd.Series([512345678901, 0, -1], dtype=np.int64))
+
+    assert floats.tolist() == [512345678901, pd.NA, pd.NA, pd.NA, pd.NA, pd.NA]
+    assert ints.tolist() == [512345678901, pd.NA, pd.NA]
+
+
+def test_normalize_rrns_mixed_column_matches_per_value():
+    values = pd.Series([512345678901, '512345678901', 5.12345678901e11, 'junk', None],
+                       dtype=object)
+
+    assert normalize_rrns(values).tolist() == [512345678901] * 3 + [pd.NA, pd.NA]
+
+
+def test_arrow_normalize_rrns_equals_pandas():
+    text = [text for text, _ in RRN_SPELLINGS]
+    floats = [512345678901.0, 12.5, None, 0.0, -3.0]
+
+    for values, arrow_values in [(pd.Series(text, dtype=object), pa.array(text, pa.string())),
+                                 (pd.Series(floats, dtype=float), pa.array(floats))]:
+        expected = normalize_rrns(values)
+        got = arrow_backend.normalize_rrns(arrow_values).to_pandas().astype('Int64')
+        assert got.tolist() == expected.tolist()
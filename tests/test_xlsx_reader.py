@@ -0,0 +1,67 @@
+"""read_statement against pd.read_excel on the same workbooks."""
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from recon import xlsx_reader
+from recon.xlsx_reader import read_statement
+
+
+def workbook(path, rows, title_rows=0):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for i in range(title_rows):
+        ws.append([f'Statement title {i}'])
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+TEXT_ROWS = [
+    ['RRN', 'Amount', 'Mixed', 'Flag', 'Text', 'Blank', 'Number'],
+    ['512345678901', '1,250.50', '12', 'TRUE', 'abc', 'N/A', 1.5],
+    ['512345678902', '300', 'x', 'False', ' 7 ', 'NA', 2.0],
+    ['0012', '4.5', 3, 'True', '8', None, None],
+    [512345678904, 7, 2.0, 'False', '9', None, 4],
+]
+
+
+@pytest.mark.parametrize('kind', ['path', 'file', 'bytes'])
+def test_text_typed_numbers_convert_as_read_excel(tmp_path, kind):
+    path = workbook(tmp_path / 'kcb.xlsx', TEXT_ROWS)
+    source = {'path': str(path), 'file': BytesIO(path.read_bytes()),
+              'bytes': path.read_bytes()}[kind]
+
+    df = read_statement(source)
+
+    pd.testing.assert_frame_equal(df, pd.read_excel(path))
+    assert df['RRN'].tolist() == [512345678901, 512345678902, 12, 512345678904]
+    assert df['Amount'].tolist() == ['1,250.50', '300', '4.5', 7]
+
+
+def test_projection_and_skiprows_match_read_excel(tmp_path):
+    path = workbook(tmp_path / 'coop.xlsx', TEXT_ROWS + [[None] * 7, [None] * 7], title_rows=3)
+
+    df = read_statement(path, columns=['Amount', 'Text', 'Missing'], skiprows=3)
+
+    expected = pd.read_excel(path, skiprows=3, usecols=['Amount', 'Text'])
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_files_that_are_not_zip_archives_go_to_read_excel(tmp_path, monkeypatch):
+    calls = []
+
+    def read_excel(source, **options):
+        calls.append(source)
+        return pd.DataFrame({'Amount': [1]})
+    monkeypatch.setattr(xlsx_reader.pd, 'read_excel', read_excel)
+    legacy = tmp_path / 'equity.xls'
+    legacy.write_bytes(b'\xd0\xcf\x11\xe0' + bytes(60))
+
+    read_statement(str(legacy))
+    read_statement(BytesIO(legacy.read_bytes()))
+
+    assert calls[0] == str(legacy) and isinstance(calls[1], BytesIO)